@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Load-time static analysis of feature decls.
+
+# Every default, precondition and constraint (and the bodies of
+# 'WARL_fn' values) is validated before any feature list is checked:
+#     - well-formed ('If' with 3 args, ops are strings, ...)
+#     - ops are known (see RIFFL_Compile.ops), and applied to the right
+#       number of args
+#     - '$FOO' refers to a declared feature, and '$writeval' only occurs
+#       in 'WARL_fn' bodies
+# (Constant sub-expressions are folded when decls are compiled, see
+# RIFFL_Compile.)
+
+# All decls are analyzed together: RD.fdecls and every registered decl
+# family (see RIFFL_Registry).  The result (the errors) is cached on
+# disk, keyed by a hash of the sources of the decls (and of this
+# analysis and the compiler), so later startups just load it, without
+# importing the decl families.
+# The cache is in RIFFL_CACHE_DIR if set (see RIFFL_Cache), else in
+# src/__pycache__.
+
+# ================================================================
+# Imports of Python libraries
+
+import os
+import collections
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Compile as RCo
+import RIFFL_Cache   as RCa
+import RIFFL_Registry as RR
+
+# ================================================================
+# Result of analysis
+#     'errors': list of messages (strings), empty if all decls are ok
+
+Analyzed_decls = collections.namedtuple ("Analyzed_decls", ["errors"])
+
+def analyze_fdecls (fdecls, fdecl_index):
+    errors = []
+    for fdecl in fdecls:
+        (name, descr, default, preconds, constraint) = fdecl
+        exprs = [("default", default)] + [("precondition", p) for p in preconds] + [("constraint", constraint)]
+        for (where, e) in exprs:
+            for msg in expr_errors (e, fdecl_index):
+                errors.append ("fdecl '{0}', {1}: {2}".format (name, where, msg))
+    return Analyzed_decls (errors)
+
+# ----------------------------------------------------------------
+# Number of args taken by each op (None: any number)
+
+def op_arity (op):
+    if op == "Is_WARL_fn":
+        return 2
+    fn = RCo.ops.get (op)
+    if fn == None:
+        return None
+    return fn.__code__.co_argcount
+
+special_refs = ["$this", "$max_XLEN", "$XLEN_code", "$writeval"]
+
+# Error messages for expression 'e'
+
+def expr_errors (e, fdecl_index):
+    errors = []
+    # Stack of (expression, inside a WARL_fn body)
+    stack  = [(e, False)]
+    while len (stack) > 0:
+        (e, in_WARL_fn) = stack.pop ()
+        if type (e) == str:
+            if e == "$writeval":
+                if not in_WARL_fn:
+                    errors.append ("'$writeval' outside a WARL_fn")
+            elif e.startswith ('$') and (e not in special_refs) and (e [1:] not in fdecl_index):
+                errors.append ("reference to undeclared feature '{0}'".format (e))
+            continue
+        if type (e) != list:
+            continue
+
+        (kind, children) = RCo.expr_shape (e)
+        if kind == "bad":
+            errors.append ("malformed expression {0}".format (e))
+            continue
+        op = e [0]
+        if kind == "quote":
+            if (op == "WARL_fn"):
+                if len (e) != 2:
+                    errors.append ("malformed expression {0}".format (e))
+                else:
+                    stack.append ((e [1], True))
+            continue
+        if kind == "apply":
+            if (op not in RCo.ops) and (op != "Is_WARL_fn"):
+                errors.append ("unknown op '{0}'".format (op))
+            elif len (children) != op_arity (op):
+                errors.append ("op '{0}' takes {1} args, given {2}".format (op, op_arity (op), len (children)))
+            if op == "Is_WARL_fn":
+                # The first arg is the name of a CSR field, not an expression
+                children = children [1:]
+        elif (kind in RCo.assoc_ops) and (len (e) < 3):
+            errors.append ("op '{0}' takes at least 2 args, given {1}".format (op, len (e) - 1))
+        for child in children:
+            stack.append ((child, in_WARL_fn))
+    return errors
+
+# ================================================================
+# Analysis of all decls, cached on disk
+
+analyzed_sources = ["RIFFL_Decls.py", "RIFFL_Analyze.py", "RIFFL_Compile.py", "RIFFL_Registry.py"]
+
+analyzed_decls_memo = None
+
+def analyzed_decls ():
+    global analyzed_decls_memo
+    if analyzed_decls_memo != None:
+        return analyzed_decls_memo
+
+    src_dir = os.path.dirname (os.path.abspath (__file__))
+    h = RCa.mk_hash ("analyzed decls")
+    filenames = [os.path.join (src_dir, filename) for filename in analyzed_sources]
+    filenames.extend ([RR.family_source_file (family) for family in RR.families])
+    for filename in filenames:
+        h.update (repr (filename).encode ("utf-8"))
+        if filename != None:
+            with open (filename, 'rb') as stream:
+                h.update (stream.read ())
+    key = h.hexdigest ()
+
+    d = RCa.cache_dir ()
+    if d == None:
+        d = os.path.join (src_dir, "__pycache__")
+    cache_filename = os.path.join (d, "analyzed_" + key + ".pickle")
+
+    analyzed = RCa.read_cache_entry (cache_filename)
+    if analyzed == None:
+        (fdecls, fdecl_index) = RR.all_decls ()
+        analyzed = analyze_fdecls (fdecls, fdecl_index)
+        RCa.write_cache_entry (cache_filename, analyzed)
+    analyzed_decls_memo = analyzed
+    return analyzed
+
+# Raise RCo.Check_error if any decls have errors
+
+def check_decls ():
+    errors = analyzed_decls ().errors
+    if len (errors) > 0:
+        raise RCo.Check_error ("ERROR: errors in feature decls:\n" +
+                               "".join (["    {0}\n".format (msg) for msg in errors]))
+
+# ================================================================
@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+
+usage_line = \
+"Usage:    CMD    [-j <num_jobs>]  [-s <summary.json>]  [-v <verbosity>]  <feature_list.yaml or glob> ...\n"
+
+help_lines = \
+"  Checks many feature-list YAML files in one process, fanning them out\n" \
+"  across a pool of <num_jobs> worker processes (default: number of CPUs).\n" \
+"  Feature decls are loaded (and compiled) once per worker.\n" \
+"  For each consistent input foo.yaml, writes foo_checked.yaml (as RIFFL_Check does).\n" \
+"  Writes a JSON summary of pass/fail per file to <summary.json>\n" \
+"    (default: riffl_batch_summary.json).\n" \
+"  Globs are expanded here (e.g., 'Examples/*.yaml'); files named *_checked.yaml\n" \
+"    that match a glob are skipped, since they are outputs of earlier runs.\n" \
+"  Exit code is 0 if all files pass, 1 otherwise.\n"
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import os
+import io
+import glob
+import json
+import argparse
+import contextlib
+import traceback
+import multiprocessing
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Decls   as RD
+import RIFFL_Compile as RCo
+import RIFFL_Check   as RC
+import RIFFL_Analyze as RA
+
+# ================================================================
+
+def main (argv = None):
+    parser = argparse.ArgumentParser (prog = argv [0], add_help = False)
+    parser.add_argument ("-h", "--help", action = "store_true")
+    parser.add_argument ("-j", "--jobs",    type = int, default = 0)
+    parser.add_argument ("-s", "--summary", default = "riffl_batch_summary.json")
+    parser.add_argument ("-v", "--verbosity", type = int, default = 0)
+    parser.add_argument ("files", nargs = "*")
+    args = parser.parse_args (argv [1:])
+
+    if args.help or (len (args.files) == 0):
+        sys.stdout.write (usage_line.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        sys.stdout.write (help_lines.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        return 0
+
+    try:
+        RA.check_decls ()
+    except RCo.Check_error as exc:
+        exc.write (sys.stderr)
+        return 1
+
+    input_filenames = expand_filenames (args.files)
+    summary = check_files (args.verbosity, input_filenames, args.jobs)
+
+    with open (args.summary, 'w') as stream:
+        json.dump (summary, stream, indent = 2)
+        stream.write ("\n")
+
+    sys.stdout.write ("Checked {0} files; pass {1}; fail {2}; summary in '{3}'\n".format (summary ["n_files"],
+                                                                                        summary ["n_pass"],
+                                                                                        summary ["n_fail"],
+                                                                                        args.summary))
+    for entry in summary ["files"]:
+        if not entry ["pass"]:
+            sys.stdout.write ("  FAIL: {0}\n".format (entry ["file"]))
+
+    if summary ["n_fail"] == 0:
+        return 0
+    else:
+        return 1
+
+# ================================================================
+# Expand globs; drop outputs of earlier runs (foo_checked.yaml) matched by globs
+
+def expand_filenames (patterns):
+    filenames = []
+    for pattern in patterns:
+        if glob.has_magic (pattern):
+            for filename in sorted (glob.glob (pattern)):
+                (base, ext) = os.path.splitext (filename)
+                if not base.endswith ("_checked"):
+                    filenames.append (filename)
+        else:
+            filenames.append (pattern)
+    return filenames
+
+# ================================================================
+# Check 'input_filenames' using a pool of 'n_jobs' workers
+# (0: one per CPU; 1: check in this process, without a pool).
+# Returns the summary, with per-file entries in the order of 'input_filenames'.
+
+def check_files (verbosity, input_filenames, n_jobs = 0):
+    if n_jobs <= 0:
+        n_jobs = os.cpu_count () or 1
+    n_jobs = min (n_jobs, max (1, len (input_filenames)))
+
+    jobs = [(verbosity, filename) for filename in input_filenames]
+    if n_jobs == 1:
+        entries = [check_one_file (job) for job in jobs]
+    else:
+        chunksize = max (1, len (jobs) // (n_jobs * 4))
+        with multiprocessing.Pool (processes = n_jobs, initializer = init_worker) as pool:
+            entries = pool.map (check_one_file, jobs, chunksize)
+
+    n_pass = len ([entry for entry in entries if entry ["pass"]])
+    return {"n_files": len (entries),
+            "n_pass":  n_pass,
+            "n_fail":  len (entries) - n_pass,
+            "files":   entries}
+
+# Worker initialization: compile all decls once, so every file checked
+# by this worker reuses them
+
+def init_worker ():
+    for fdecl in RD.fdecls:
+        RCo.compile_fdecl (fdecl)
+
+# Check one file; returns its summary entry.
+# The checker's messages (stdout and stderr) are captured and kept in the
+# entry for failing files.
+
+def check_one_file (job):
+    (verbosity, input_filename) = job
+    messages = io.StringIO ()
+    error    = None
+    try:
+        with contextlib.redirect_stdout (messages), contextlib.redirect_stderr (messages):
+            (all_pass, state, output_filename) = RC.check_feature_file (verbosity, input_filename)
+    except OSError as exc:
+        (all_pass, state, output_filename) = (False, None, None)
+        error = str (exc)
+    except RCo.Check_error as exc:
+        (all_pass, state, output_filename) = (False, None, None)
+        exc.write (messages)
+        error = str (exc)
+    except Exception as exc:
+        # Unexpected errors are recorded for this file, so the rest of the batch is still checked
+        (all_pass, state, output_filename) = (False, None, None)
+        messages.write (traceback.format_exc ())
+        error = "{0}: {1}".format (type (exc).__name__, exc)
+
+    entry = {"file":   input_filename,
+             "pass":   all_pass,
+             "output": output_filename}
+    if state != None:
+        entry ["n_constraints"] = state.n_checked ()
+        entry ["failing"]       = state.failing_names ()
+    if error != None:
+        entry ["error"] = error
+    if not all_pass:
+        entry ["messages"] = messages.getvalue ()
+    return entry
+
+# ****************************************************************
+# ****************************************************************
+# ****************************************************************
+
+# For non-interactive invocations, call main() and use its return value
+# as the exit code.
+
+if __name__ == '__main__':
+  sys.exit (main (sys.argv))
@@ -0,0 +1,274 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+
+usage_line = \
+"Usage:    CMD    <optional_max_num_decls>\n"
+
+help_lines = \
+"  Benchmarks RIFFL_Check on synthetic feature decls and feature lists\n" \
+"  of increasing size, and prints time per decl for each size.\n" \
+"  Time per decl should stay roughly flat (i.e., checking is linear in\n" \
+"  the number of decls).\n" \
+"  Also times incremental rechecks of a single changed feature, which\n" \
+"  should stay flat as the number of decls grows, explanations of\n" \
+"  failing feature lists (--explain), validation of address maps\n" \
+"  of up to 100k regions, and the memory taken by decls as 5-tuples\n" \
+"  vs. as compact Fdecls (see RIFFL_Fdecl).\n"
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import io
+import time
+import random
+import contextlib
+import tracemalloc
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Decls   as RD
+import RIFFL_Compile as RCo
+import RIFFL_Check   as RC
+import RIFFL_Explain as RE
+import RIFFL_Fdecl   as RF
+
+# ================================================================
+
+def main (argv = None):
+    if ((len (argv) > 2) or
+        ((len (argv) == 2) and ((argv [1] == "--help") or (argv [1] == "-h")))):
+        sys.stdout.write (usage_line.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        sys.stdout.write (help_lines.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        return 0
+
+    max_n_decls = 8000
+    if (len (argv) == 2):
+        max_n_decls = int (argv [1])
+
+    bench_decl_scaling (max_n_decls)
+    sys.stdout.write ("\n")
+    bench_incremental (max_n_decls)
+    sys.stdout.write ("\n")
+    bench_explain (max_n_decls)
+    sys.stdout.write ("\n")
+    bench_address_map (100000)
+    sys.stdout.write ("\n")
+    bench_fdecl_memory (max_n_decls)
+    return 0
+
+# ================================================================
+# Synthetic workloads
+
+# A chain of 'n_decls' boolean features, each with a precondition on
+# an earlier feature and a constraint on its own value.
+# Every other feature is given in the feature list; the rest default.
+
+def mk_synthetic_fdecls (n_decls):
+    fdecls = []
+    for j in range (n_decls):
+        preconds = []
+        if j > 0:
+            preconds = [ ["==", "$F{0}".format (j // 2), "True"] ]
+        fdecls.append (("F{0}".format (j),
+                        "Synthetic feature {0}".format (j),
+                        "True",
+                        preconds,
+                        ["&&", ["Is_bool", "$this"],
+                               ["==", "$this", "True"]]))
+    return fdecls
+
+def mk_synthetic_features (n_decls):
+    return [("F{0}".format (j), True) for j in range (0, n_decls, 2)]
+
+# ================================================================
+# Time a full check for increasing numbers of decls
+
+def bench_decl_scaling (max_n_decls):
+    # 'first' includes compiling the decls (see RIFFL_Compile); 'warm' reuses them
+    sys.stdout.write ("{0:>8}  {1:>10}  {2:>10}  {3:>12}\n".format ("Decls", "First (s)", "Warm (s)", "usec/decl"))
+    n_decls = 250
+    while n_decls <= max_n_decls:
+        fdecls      = mk_synthetic_fdecls (n_decls)
+        fdecl_index = RD.mk_fdecl_index (fdecls)
+        features    = mk_synthetic_features (n_decls)
+
+        times = []
+        for j in range (2):
+            t0 = time.perf_counter ()
+            with contextlib.redirect_stdout (io.StringIO ()):
+                (all_pass, features_out) = RC.check_all_constraints (0, fdecls, features, fdecl_index, n_jobs = 1)
+            t1 = time.perf_counter ()
+            times.append (t1 - t0)
+
+            if not all_pass:
+                sys.stderr.write ("ERROR: synthetic feature list with {0} decls did not pass\n".format (n_decls))
+                return 1
+
+        sys.stdout.write ("{0:>8}  {1:>10.4f}  {2:>10.4f}  {3:>12.2f}\n".format (n_decls,
+                                                                             times [0],
+                                                                             times [1],
+                                                                             times [1] * 1.0e6 / n_decls))
+        n_decls = n_decls * 2
+    return 0
+
+# ================================================================
+# Time incremental rechecks after changing one feature.
+# Changing a leaf of the synthetic chain affects only its own fdecl;
+# changing 'F1' affects every fdecl whose precondition chain reaches it.
+
+def bench_incremental (max_n_decls):
+    sys.stdout.write ("{0:>8}  {1:>10}  {2:>14}  {3:>10}  {4:>14}\n".format ("Decls", "Full (s)",
+                                                                       "Leaf edit (s)", "Rechecked",
+                                                                       "F1 edit (s)"))
+    n_decls = 250
+    while n_decls <= max_n_decls:
+        fdecls      = mk_synthetic_fdecls (n_decls)
+        fdecl_index = RD.mk_fdecl_index (fdecls)
+        features    = mk_synthetic_features (n_decls)
+
+        with contextlib.redirect_stdout (io.StringIO ()):
+            t0 = time.perf_counter ()
+            state = RC.Check_state (0, fdecls, features, fdecl_index, n_jobs = 1)
+            t1 = time.perf_counter ()
+
+            # First recheck builds the dependency graph; time the ones after it
+            state.recheck_feature ("F{0}".format (n_decls - 1), False)
+            t2 = time.perf_counter ()
+            leaf_checks = state.recheck_feature ("F{0}".format (n_decls - 1), True)
+            t3 = time.perf_counter ()
+            state.recheck_feature ("F1", False)
+            state.recheck_feature ("F1", True)
+            t4 = time.perf_counter ()
+
+        sys.stdout.write ("{0:>8}  {1:>10.4f}  {2:>14.6f}  {3:>10}  {4:>14.6f}\n".format (n_decls,
+                                                                                  t1 - t0,
+                                                                                  t3 - t2,
+                                                                                  len (leaf_checks),
+                                                                                  (t4 - t3) / 2))
+        n_decls = n_decls * 2
+    return 0
+
+# ================================================================
+# Time explanations of a failing feature list.
+# Two given features of the synthetic chain (neither in the other's
+# precondition chain) are made False, so their fdecls fail; each is
+# explained by itself.
+
+def bench_explain (max_n_decls):
+    sys.stdout.write ("{0:>8}  {1:>10}  {2:>12}  {3:>10}\n".format ("Decls", "Features", "Explain (s)", "Culprits"))
+    n_decls = 250
+    while n_decls <= max_n_decls:
+        fdecls      = mk_synthetic_fdecls (n_decls)
+        fdecl_index = RD.mk_fdecl_index (fdecls)
+        bad         = ["F{0}".format (n_decls - 4), "F{0}".format (n_decls - 2)]
+        features    = [(fname, fval and (fname not in bad)) for (fname, fval) in mk_synthetic_features (n_decls)]
+
+        t0 = time.perf_counter ()
+        explanations = RE.explain_failures (fdecls, fdecl_index, features)
+        t1 = time.perf_counter ()
+
+        n_culprits = sum ([len (culprits) for (fname, culprits) in explanations])
+        if n_culprits != len (bad):
+            sys.stderr.write ("ERROR: unexpected explanations for {0} decls: {1}\n".format (n_decls, explanations))
+            return 1
+
+        sys.stdout.write ("{0:>8}  {1:>10}  {2:>12.4f}  {3:>10}\n".format (n_decls,
+                                                                        len (features),
+                                                                        t1 - t0,
+                                                                        n_culprits))
+        n_decls = n_decls * 2
+    return 0
+
+# ================================================================
+# Time address map validation for increasing numbers of regions.
+# Regions are shuffled (validation sorts them); every 1000th region
+# overlaps its neighbor.
+
+def mk_synthetic_address_map (n_regions, with_overlaps):
+    regions = []
+    for j in range (n_regions):
+        size = 0x1000
+        if with_overlaps and (j % 1000 == 999):
+            size = 0x2000
+        regions.append (["Region {0}".format (j), j * 0x1000, size, "MEM", "RW"])
+    random.Random (n_regions).shuffle (regions)
+    return ["Address_map"] + regions
+
+def bench_address_map (max_n_regions):
+    sys.stdout.write ("{0:>8}  {1:>14}  {2:>14}  {3:>10}\n".format ("Regions", "Disjoint (s)",
+                                                                  "Overlaps (s)", "Errors"))
+    n_regions = max_n_regions // 8
+    while n_regions <= max_n_regions:
+        amap_ok  = mk_synthetic_address_map (n_regions, False)
+        amap_bad = mk_synthetic_address_map (n_regions, True)
+
+        t0 = time.perf_counter ()
+        errors_ok = RCo.address_map_errors (amap_ok)
+        t1 = time.perf_counter ()
+        errors_bad = RCo.address_map_errors (amap_bad)
+        t2 = time.perf_counter ()
+
+        if len (errors_ok) != 0:
+            sys.stderr.write ("ERROR: synthetic disjoint address map has errors\n")
+            return 1
+
+        sys.stdout.write ("{0:>8}  {1:>14.4f}  {2:>14.4f}  {3:>10}\n".format (n_regions,
+                                                                         t1 - t0,
+                                                                         t2 - t1,
+                                                                         len (errors_bad)))
+        n_regions = n_regions * 2
+    return 0
+
+# ================================================================
+# Memory taken by decls: as 5-tuples (as written), as Fdecls, and as
+# instances of one indexed template (see RIFFL_Fdecl).
+
+synthetic_template = ("F{n}",
+                      "Synthetic feature {n}",
+                      "True",
+                      [ ["==", "$F0", "True"] ],
+                      ["&&", ["Is_bool", "$this"],
+                             ["==", "$this", "True"]])
+
+def bench_fdecl_memory (max_n_decls):
+    sys.stdout.write ("{0:>8}  {1:>12}  {2:>12}  {3:>14}\n".format ("Decls", "Tuples (KB)", "Fdecls (KB)",
+                                                                   "Instances (KB)"))
+    template = RF.mk_fdecl (synthetic_template)
+    n_decls = 250
+    while n_decls <= max_n_decls:
+        tuples_kb    = allocated_kb (lambda: mk_synthetic_fdecls (n_decls))
+        fdecls_kb    = allocated_kb (lambda: RF.mk_fdecls (mk_synthetic_fdecls (n_decls)))
+        instances_kb = allocated_kb (lambda: [RCo.instantiate_fdecl (template, j) for j in range (n_decls)])
+        sys.stdout.write ("{0:>8}  {1:>12.1f}  {2:>12.1f}  {3:>14.1f}\n".format (n_decls,
+                                                                             tuples_kb,
+                                                                             fdecls_kb,
+                                                                             instances_kb))
+        n_decls = n_decls * 2
+    return 0
+
+# KB still allocated by the result of 'f ()', while it is held
+
+def allocated_kb (f):
+    tracemalloc.start ()
+    x = f ()
+    (current, peak) = tracemalloc.get_traced_memory ()
+    tracemalloc.stop ()
+    del x
+    return current / 1024
+
+# ****************************************************************
+# ****************************************************************
+# ****************************************************************
+
+# For non-interactive invocations, call main() and use its return value
+# as the exit code.
+
+if __name__ == '__main__':
+  sys.exit (main (sys.argv))
@@ -0,0 +1,292 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+
+usage_line = \
+"Usage:    CMD    [--save <baseline.json>]  [--compare <baseline.json>]  [--threshold <fraction>]\n"
+
+help_lines = \
+"  Benchmark suite: times the checker on synthetic workloads that scale\n" \
+"  along several axes (number of decls, number of given features,\n" \
+"  expression depth, '$FOO' fan-in, address-map regions, files per batch),\n" \
+"  timing check_all_constraints, YAML loading and output writing.\n" \
+"  Each case runs at a small and a large size; 'Scaling' is the ratio of\n" \
+"  their times divided by the ratio of their sizes (1.0: linear).\n" \
+"  --save:      record the results in <baseline.json>\n" \
+"  --compare:   compare with the results in <baseline.json>; a case regresses\n" \
+"               if its time (large size) exceeds the baseline's by more than\n" \
+"               <fraction> (default 0.3), or its scaling exceeds the baseline's\n" \
+"               by more than <fraction> both relatively and absolutely.\n" \
+"               Exit code is 1 if any case regresses.\n" \
+"  Baselines are specific to a machine (and Python version); record one\n" \
+"  on the machine that runs the comparisons.\n"
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import os
+import io
+import json
+import time
+import platform
+import argparse
+import tempfile
+import contextlib
+import yaml
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Decls   as RD
+import RIFFL_Check   as RC
+import RIFFL_YAML    as RY
+import RIFFL_Batch   as RB
+import RIFFL_Bench   as RBe
+import RIFFL_Registry as RR
+
+# ================================================================
+
+def main (argv = None):
+    parser = argparse.ArgumentParser (prog = argv [0], add_help = False)
+    parser.add_argument ("-h", "--help", action = "store_true")
+    parser.add_argument ("--save")
+    parser.add_argument ("--compare")
+    parser.add_argument ("--threshold", type = float, default = 0.3)
+    args = parser.parse_args (argv [1:])
+
+    if args.help:
+        sys.stdout.write (usage_line.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        sys.stdout.write (help_lines.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        return 0
+
+    baseline = None
+    if args.compare != None:
+        with open (args.compare, 'r') as stream:
+            baseline = json.load (stream)
+        if baseline.get ("format") != baseline_format:
+            sys.stderr.write ("ERROR: {0} has baseline format {1}, not {2}; record a new baseline\n".
+                              format (args.compare, baseline.get ("format"), baseline_format))
+            return 1
+
+    results = run_cases (cases)
+    n_regressions = print_results (results, baseline, args.threshold)
+
+    if args.save != None:
+        with open (args.save, 'w') as stream:
+            json.dump ({"format":  baseline_format,
+                        "python":  platform.python_version (),
+                        "machine": platform.machine (),
+                        "cases":   results},
+                       stream, indent = 2)
+            stream.write ("\n")
+        sys.stdout.write ("Results saved in '{0}'\n".format (args.save))
+
+    if n_regressions > 0:
+        sys.stdout.write ("{0} regressions (threshold {1})\n".format (n_regressions, args.threshold))
+        return 1
+    return 0
+
+# Bump this when the format of baseline files changes
+baseline_format = 2
+
+# ================================================================
+# Synthetic decls: a chain of 'n_decls' boolean features F0, F1, ...,
+# each relevant only if an earlier one is True (as in RIFFL_Bench), with
+#     'depth':  nesting depth of alternating '&&'s and '||'s around '$this'
+#               in the constraint (RIFFL_Compile flattens chains of the
+#               same op, and of 'not's, but not these)
+#     'fan_in': number of earlier features the constraint refers to
+
+def mk_decls (n_decls, depth = 0, fan_in = 0):
+    fdecls = []
+    for j in range (n_decls):
+        preconds = []
+        if j > 0:
+            preconds = [ ["==", "$F{0}".format (j // 2), "True"] ]
+        e = "$this"
+        for k in range (depth):
+            e = ["&&" if (k % 2 == 0) else "||", e, "$this"]
+        constraint = ["&&", ["Is_bool", "$this"],
+                            ["==", e, "True"]]
+        if (j > 0) and (fan_in > 0):
+            refs = ["$F{0}".format (max (0, j - k)) for k in range (1, fan_in + 1)]
+            constraint.append (["||", "$this"] + refs)
+        fdecls.append (("F{0}".format (j), "Synthetic feature {0}".format (j), "True", preconds, constraint))
+    return fdecls
+
+# Synthetic feature list: the first 'n_features' of the chain, all True
+
+def mk_features (n_features):
+    return [("F{0}".format (j), True) for j in range (n_features)]
+
+# A feature list for the standard decls (like Examples/RV32IMU.yaml),
+# with an address map of 'n_regions' regions
+
+def mk_standard_features (n_regions):
+    features = {
+        "User_Spec_Version":             "2.2",
+        "Privilege_Spec_Version":        "1.10",
+        "XLEN":                          32,
+        "MISA_U":                        True,
+        "MSIP_address":                  0x2000000,
+        "MTIME_address":                 0x200BFF8,
+        "MTIMECMP_address":              0x2004000,
+        "MTVEC_is_read_only":            False,
+        "MTVEC_BASE_WARL_fn":            ["WARL_fn", "$writeval"],
+        "MTVEC_MODE_WARL_fn":            ["WARL_fn", 0],
+        "MCAUSE_on_reset":               0,
+        "Reset_PC":                      0x1000,
+        "Traps_on_unaligned_mem_access": True,
+        "WFI_is_nop":                    False,
+        "NMI_address":                   0x200,
+        "CYCLE_defined":                 True,
+        "TIME_defined":                  False,
+        "INSTRET_defined":               True,
+        "address_map":                   RBe.mk_synthetic_address_map (n_regions, False)
+    }
+    return features
+
+# ================================================================
+# Cases: (name, sizes (small, large), function (size) -> seconds)
+
+def time_check (fdecls, features):
+    fdecl_index = RD.mk_fdecl_index (fdecls)
+    with contextlib.redirect_stdout (io.StringIO ()):
+        # The first run compiles the decls; time a warm run
+        # In this process, so that all sizes are timed alike
+        RC.check_all_constraints (0, fdecls, features, fdecl_index, n_jobs = 1)
+        t0 = time.perf_counter ()
+        (all_pass, features_out) = RC.check_all_constraints (0, fdecls, features, fdecl_index, n_jobs = 1)
+        t1 = time.perf_counter ()
+    if not all_pass:
+        raise RuntimeError ("synthetic feature list did not pass")
+    return t1 - t0
+
+def case_check_decls (n_decls):
+    return time_check (mk_decls (n_decls), mk_features (n_decls // 2))
+
+def case_check_features (n_features):
+    return time_check (mk_decls (8000), mk_features (n_features))
+
+def case_check_depth (depth):
+    return time_check (mk_decls (500, depth = depth), mk_features (250))
+
+def case_check_fan_in (fan_in):
+    return time_check (mk_decls (1000, fan_in = fan_in), mk_features (500))
+
+def case_check_address_map (n_regions):
+    features = mk_standard_features (n_regions)
+    (fdecls, fdecl_index) = RR.decls_for (features)
+    return time_check (fdecls, list (features.items ()))
+
+def case_yaml_load (n_regions):
+    stream = io.StringIO ()
+    writer = RY.Feature_writer (stream)
+    writer.write_section ("Known features", list (mk_standard_features (n_regions).items ()))
+    text = stream.getvalue ()
+    t0 = time.perf_counter ()
+    yaml.load (text, Loader = RY.Loader)
+    return time.perf_counter () - t0
+
+def case_output_yaml (n_regions):
+    features = list (mk_standard_features (n_regions).items ())
+    t0 = time.perf_counter ()
+    writer = RY.Feature_writer (io.StringIO ())
+    writer.write_section ("Known features", features)
+    writer.close ()
+    return time.perf_counter () - t0
+
+def case_output_json (n_regions):
+    features = list (mk_standard_features (n_regions).items ())
+    t0 = time.perf_counter ()
+    writer = RY.Feature_writer (io.StringIO (), "json")
+    writer.write_section ("Known features", features)
+    writer.close ()
+    return time.perf_counter () - t0
+
+# Check 'n_files' files (with the standard decls) in one batch, in this process
+
+def case_batch_files (n_files):
+    with tempfile.TemporaryDirectory () as d:
+        filenames = []
+        for j in range (n_files):
+            features = mk_standard_features (16)
+            features ["Reset_PC"] = 0x1000 + (j * 4)
+            filename = os.path.join (d, "hart{0}.yaml".format (j))
+            with open (filename, 'w') as stream:
+                writer = RY.Feature_writer (stream)
+                writer.write_section ("Known features", list (features.items ()))
+            filenames.append (filename)
+        t0 = time.perf_counter ()
+        summary = RB.check_files (0, filenames, 1)
+        t1 = time.perf_counter ()
+    if summary ["n_fail"] != 0:
+        raise RuntimeError ("synthetic batch did not pass")
+    return t1 - t0
+
+cases = [("check.decls",       (2000, 8000),     case_check_decls),
+         ("check.features",    (1000, 4000),     case_check_features),
+         ("check.depth",       (25, 100),        case_check_depth),
+         ("check.fan_in",      (4, 16),          case_check_fan_in),
+         ("check.address_map", (10000, 40000),   case_check_address_map),
+         ("yaml_load.regions", (2500, 10000),    case_yaml_load),
+         ("output.yaml",       (10000, 40000),   case_output_yaml),
+         ("output.json",       (10000, 40000),   case_output_json),
+         ("batch.files",       (8, 32),          case_batch_files)]
+
+# ================================================================
+# Run each case at its sizes; the time of each is the best of 'n_repeats'.
+# Returns dict: name -> {"sizes", "times", "scaling"}
+
+n_repeats = 3
+
+def run_cases (cases):
+    results = {}
+    for (name, sizes, fn) in cases:
+        times = [min ([fn (size) for j in range (n_repeats)]) for size in sizes]
+        scaling = (times [1] / max (times [0], 1.0e-9)) / (sizes [1] / sizes [0])
+        results [name] = {"sizes": list (sizes), "times": times, "scaling": scaling}
+    return results
+
+# Print results (and comparisons with 'baseline', if any); returns the number of regressions
+
+def print_results (results, baseline, threshold):
+    sys.stdout.write ("{0:<20}  {1:>8}  {2:>11}  {3:>8}  {4:>13}  {5:>13}\n".format ("Case", "Size", "Time (s)",
+                                                                              "Scaling", "Baseline (s)",
+                                                                              "Base scaling"))
+    n_regressions = 0
+    for (name, result) in results.items ():
+        line = "{0:<20}  {1:>8}  {2:>11.5f}  {3:>8.2f}".format (name, result ["sizes"][1],
+                                                               result ["times"][1], result ["scaling"])
+        base = None
+        if baseline != None:
+            base = baseline ["cases"].get (name)
+        if (base != None) and (base ["sizes"] == result ["sizes"]):
+            line += "  {0:>13.5f}  {1:>13.2f}".format (base ["times"][1], base ["scaling"])
+            slower   = result ["times"][1] > base ["times"][1] * (1 + threshold)
+            # Small times are noisy, so a scaling must also grow by 'threshold' absolutely
+            steeper  = ((result ["scaling"] > base ["scaling"] * (1 + threshold)) and
+                        (result ["scaling"] > base ["scaling"] + threshold))
+            if slower or steeper:
+                line += "  REGRESSION ({0})".format (", ".join ([x for (x, b) in [("time", slower),
+                                                                                   ("scaling", steeper)] if b]))
+                n_regressions += 1
+        elif baseline != None:
+            line += "  (not in baseline)"
+        sys.stdout.write (line + "\n")
+    return n_regressions
+
+# ****************************************************************
+# ****************************************************************
+# ****************************************************************
+
+# For non-interactive invocations, call main() and use its return value
+# as the exit code.
+
+if __name__ == '__main__':
+  sys.exit (main (sys.argv))
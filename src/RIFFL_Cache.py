@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# On-disk caches, enabled by setting environment variable
+# RIFFL_CACHE_DIR to a directory.
+
+# Two kinds of entries are kept there:
+#     parsed_<hash>.pickle   parsed feature dict of a YAML file, keyed by
+#                            the file's contents (see RIFFL_YAML)
+#     result_<hash>.pickle   outcome of checking a feature list, keyed by
+#                            a fingerprint of the (parsed) input features,
+#                            the feature decls and the checker's source
+#                            (see RIFFL_Check.check_feature_file)
+
+# ================================================================
+# Imports of Python libraries
+
+import os
+import pickle
+import hashlib
+import tempfile
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Decls    as RD
+import RIFFL_Registry as RR
+
+# ================================================================
+
+# Bump this when the format of cached entries changes
+cache_format = "1"
+
+# Directory for cached entries (None: no caching)
+
+def cache_dir ():
+    d = os.environ.get ("RIFFL_CACHE_DIR")
+    if (d == None) or (d == ""):
+        return None
+    return d
+
+def cache_filename (kind, key):
+    return os.path.join (cache_dir (), kind + "_" + key + ".pickle")
+
+# ================================================================
+# Cache entries are pickles, written atomically so that concurrent
+# runs (e.g., batch workers) never see partial entries.
+# A missing or unreadable entry reads as None.
+
+def read_cache_entry (filename):
+    try:
+        with open (filename, 'rb') as stream:
+            return pickle.load (stream)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def write_cache_entry (filename, x):
+    d = os.path.dirname (filename)
+    try:
+        os.makedirs (d, exist_ok = True)
+        (fd, tmp_filename) = tempfile.mkstemp (dir = d, suffix = ".tmp")
+        with os.fdopen (fd, 'wb') as stream:
+            pickle.dump (x, stream, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace (tmp_filename, filename)
+    except OSError:
+        # Caching is an optimization only
+        pass
+
+# ================================================================
+# Fingerprints
+
+def mk_hash (kind):
+    h = hashlib.sha256 ()
+    h.update (("RIFFL " + kind + " " + cache_format + "\n").encode ("utf-8"))
+    return h
+
+# Fingerprint of the feature decls (core, and the sources of all decl
+# families, see RIFFL_Registry) and of the checker itself, so that
+# changing any decl (or the checker's code) invalidates cached results.
+# Computed once per process.
+
+decls_fingerprint_memo = None
+
+# The modules on the check path whose code can change its results
+# (RIFFL_Metrics and RIFFL_Explain are not: runs using them are not cached)
+
+checker_source_files = ["RIFFL_Check.py", "RIFFL_Compile.py", "RIFFL_Decls.py", "RIFFL_YAML.py",
+                        "RIFFL_Registry.py", "RIFFL_Fdecl.py", "RIFFL_Deps.py", "RIFFL_Harts.py",
+                        "RIFFL_Parallel.py", "RIFFL_Cache.py"]
+
+def decls_fingerprint ():
+    global decls_fingerprint_memo
+    if decls_fingerprint_memo == None:
+        h = mk_hash ("decls")
+        h.update (repr (RD.fdecls).encode ("utf-8"))
+        src_dir = os.path.dirname (os.path.abspath (__file__))
+        filenames = [os.path.join (src_dir, filename) for filename in checker_source_files]
+        filenames.extend ([RR.family_source_file (family) for family in RR.families])
+        for filename in filenames:
+            h.update (repr (filename).encode ("utf-8"))
+            if filename != None:
+                with open (filename, 'rb') as stream:
+                    h.update (stream.read ())
+        decls_fingerprint_memo = h.hexdigest ()
+    return decls_fingerprint_memo
+
+# Key for the cached result of checking 'feature_dict' (parsed from
+# 'input_filename') at 'verbosity'; None if caching is disabled.
+# The input is normalized by parsing, so comments and formatting do
+# not matter; the order of features does (it determines output order).
+
+def check_result_key (verbosity, input_filename, feature_dict):
+    if cache_dir () == None:
+        return None
+    h = mk_hash ("result")
+    h.update (decls_fingerprint ().encode ("utf-8"))
+    h.update (repr ((verbosity, input_filename)).encode ("utf-8"))
+    h.update (repr (list (feature_dict.items ())).encode ("utf-8"))
+    return h.hexdigest ()
+
+# ================================================================
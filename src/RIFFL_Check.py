@@ -5,7 +5,8 @@
 # ================================================================
 
 usage_line = \
-"Usage:    CMD    <feature_list.yaml>  <optional_verbosity>\n"
+"Usage:    CMD    <feature_list.yaml>  <optional_verbosity>  <optional --metrics>  <optional --explain>\n" \
+"                 <optional --jobs N>\n"
 
 help_lines = \
 "  Reads a YAML file containing a feature-list for a RISC-V implementation\n" \
@@ -13,27 +14,61 @@ help_lines = \
 "  If consistent, writes an output feature-list to a YAML file consisting of\n" \
 "    - features and values from the input for known features, and\n" \
 "    - features and values omitted in the input that have default values, and\n" \
-"    - features and values from the input that were not recognized (passed through as-is).\n"
+"    - features and values from the input that were not recognized (passed through as-is).\n" \
+"  With --metrics, prints the most expensive fdecls (time, evals, lookups)\n" \
+"    and writes per-fdecl metrics for foo.yaml to foo_metrics.json.\n" \
+"  With --explain, if constraints fail, also prints for each failing fdecl\n" \
+"    a minimal set of input features that by themselves make it fail.\n" \
+"  With --jobs N, large decl sets and many harts with overrides are checked\n" \
+"    on a pool of N worker processes (0: one per CPU).\n"
 
 # ================================================================
 # Imports of Python libraries
 
 import sys
 import os
+import io
+import time
+import contextlib
+import collections
+import collections.abc
 import yaml
 import pprint
 
 # ================================================================
 # Imports of project files
 
-import RIFFL_Decls as RD
+import RIFFL_Decls   as RD
+import RIFFL_Compile as RCo
+import RIFFL_Deps    as RDp
+import RIFFL_Metrics as RM
+import RIFFL_YAML    as RY
+import RIFFL_Cache   as RCa
+import RIFFL_Explain as RE
+import RIFFL_Analyze as RA
+import RIFFL_Registry as RR
+import RIFFL_Harts   as RH
+import RIFFL_Parallel as RP
 
 # ================================================================
 
 def main (argv = None):
     sys.stdout.write ("Use --help or -h for help\n")
 
-    if ((len (argv) == 1) or
+    # Optional --metrics and --explain flags, and --jobs N, anywhere after the command
+    do_metrics = ("--metrics" in argv)
+    do_explain = ("--explain" in argv)
+    argv       = [arg for arg in argv if (arg != "--metrics") and (arg != "--explain")]
+    n_jobs     = 1
+    bad_jobs   = False
+    if ("--jobs" in argv [:-1]):
+        j = argv.index ("--jobs")
+        bad_jobs = not argv [j + 1].isdigit ()
+        if not bad_jobs:
+            n_jobs = int (argv [j + 1])
+        argv   = argv [:j] + argv [j + 2:]
+
+    if (bad_jobs or (len (argv) == 1) or
         (argv [1] == "--help") or (argv [1] == "-h") or
         ((len (argv) != 2) and (len (argv) != 3))):
 
@@ -43,32 +78,165 @@ def main (argv = None):
         sys.stdout.write ("\n")
         return 0
 
-    # Read input feature list from YAML file
-    with open (argv [1], 'r') as stream:
-        try:
-            feature_dict = yaml.load (stream)
-
-        except yaml.YAMLError as exc:
-            sys.stdout.write ("ERROR: unable to open YAML input file: {0}\n".format (argv [1]))
-            sys.stdout.write ("    Exception: "); print (exc)
-            return 0
-    (filename, ext) = os.path.splitext (argv [1])
-    output_feature_filename    = filename + "_checked"    + ext
-
     # Set verbosity if requested
     verbosity = 0
     if (len (argv) == 3):
         verbosity = int (argv [2])
 
+    metrics = None
+    if do_metrics:
+        metrics = RM.Metrics ()
+
+    try:
+        RA.check_decls ()
+        check_feature_file (verbosity, argv [1], metrics, do_explain, n_jobs)
+    except RCo.Check_error as exc:
+        exc.write (sys.stderr)
+        return 1
+
+    if do_metrics:
+        (filename, ext) = os.path.splitext (argv [1])
+        metrics_filename = filename + "_metrics.json"
+        sys.stdout.write ("---------------- Most expensive fdecls (metrics in '{0}')\n".format (metrics_filename))
+        metrics.print_top (sys.stdout, 20)
+        with open (metrics_filename, 'w') as stream:
+            metrics.write_json (stream)
+    return 0
+
+# ================================================================
+# Check the feature list in YAML file 'input_filename' (foo.yaml) against the feature decls
+# (RD.fdecls, and the decl families it needs: see RIFFL_Registry).
+# If constraints are met, write output file foo_checked.yaml.
+# Returns (all_pass, state, output_feature_filename), where 'state' is the
+# Check_state (a Cached_check_state on a result-cache hit; None if the
+# file could not be read) and 'output_feature_filename' is None if
+# nothing was written.
+# 'metrics' is an optional RIFFL_Metrics.Metrics, to collect per-fdecl metrics.
+# If 'explain', failures are explained (see RIFFL_Explain).
+# 'n_jobs' > 1 (0: one per CPU) allows checking on a pool of workers
+# (see Check_state and RIFFL_Harts).
+
+# If RIFFL_CACHE_DIR is set (see RIFFL_Cache), results are cached, keyed
+# by a fingerprint of the parsed input and of the feature decls; on a hit,
+# the checker's messages and foo_checked.yaml are restored from the cache
+# instead of checking again.  Runs collecting metrics or explaining
+# failures are not cached.
+
+def check_feature_file (verbosity, input_filename, metrics = None, explain = False, n_jobs = 1):
+    # Read input feature list from YAML file
+    try:
+        feature_dict = RY.load_feature_list (input_filename)
+
+    except yaml.YAMLError as exc:
+        sys.stdout.write ("ERROR: unable to open YAML input file: {0}\n".format (input_filename))
+        sys.stdout.write ("    Exception: "); print (exc)
+        return (False, None, None)
+
+    check_is_feature_list (input_filename, feature_dict)
+
+    key = None
+    if (metrics == None) and (not explain):
+        key = RCa.check_result_key (verbosity, input_filename, feature_dict)
+    if key == None:
+        return check_feature_dict (verbosity, input_filename, feature_dict, metrics, explain, n_jobs)
+
+    cache_filename = RCa.cache_filename ("result", key)
+    entry = RCa.read_cache_entry (cache_filename)
+    if entry != None:
+        return restore_check_result (entry)
+
+    transcript = io.StringIO ()
+    with contextlib.redirect_stdout (Tee_stream (sys.stdout, transcript)):
+        (all_pass, state, output_feature_filename) = check_feature_dict (verbosity, input_filename, feature_dict,
+                                                                         n_jobs = n_jobs)
+
+    output_text = None
+    if output_feature_filename != None:
+        with open (output_feature_filename, 'r') as stream:
+            output_text = stream.read ()
+    entry = {"all_pass":                all_pass,
+             "transcript":              transcript.getvalue (),
+             "output_feature_filename": output_feature_filename,
+             "output_text":             output_text,
+             "n_checked":               state.n_checked (),
+             "failing":                 state.failing_names ()}
+    RCa.write_cache_entry (cache_filename, entry)
+    return (all_pass, state, output_feature_filename)
+
+# Raise RCo.Check_error unless the document read from 'input_filename'
+# is a mapping (e.g., for an empty YAML file, or one that is just a list)
+
+def check_is_feature_list (input_filename, feature_dict):
+    if not isinstance (feature_dict, collections.abc.Mapping):
+        raise RCo.Check_error ("ERROR: YAML input file is not a feature list: {0}\n".format (input_filename))
+
+# Replay a cached result: messages to stdout, and the output file
+
+def restore_check_result (entry):
+    sys.stdout.write (entry ["transcript"])
+    output_feature_filename = entry ["output_feature_filename"]
+    if output_feature_filename != None:
+        with open (output_feature_filename, 'w') as stream:
+            stream.write (entry ["output_text"])
+    state = Cached_check_state (entry ["n_checked"], entry ["failing"])
+    return (entry ["all_pass"], state, output_feature_filename)
+
+# Summary of a cached check result, standing in for a Check_state
+
+class Cached_check_state:
+    def __init__ (self, n_checked, failing):
+        self.n_checked_     = n_checked
+        self.failing_names_ = failing
+
+    def n_checked (self):
+        return self.n_checked_
+
+    def failing_names (self):
+        return self.failing_names_
+
+    def all_pass (self):
+        return (len (self.failing_names_) == 0)
+
+# Stream that writes to both 'stream1' and 'stream2'
+
+class Tee_stream:
+    def __init__ (self, stream1, stream2):
+        self.stream1 = stream1
+        self.stream2 = stream2
+
+    def write (self, s):
+        self.stream1.write (s)
+        self.stream2.write (s)
+        return len (s)
+
+    def flush (self):
+        self.stream1.flush ()
+        self.stream2.flush ()
+
+# ----------------------------------------------------------------
+# Check 'feature_dict', read from 'input_filename' (see check_feature_file)
+
+def check_feature_dict (verbosity, input_filename, feature_dict, metrics = None, explain = False, n_jobs = 1):
+    check_is_feature_list (input_filename, feature_dict)
+
+    (filename, ext) = os.path.splitext (input_filename)
+    output_feature_filename    = filename + "_checked"    + ext
+
+    # Per-hart overrides are checked after the base (see RIFFL_Harts)
+    (feature_dict, hart_overrides) = RH.split_hart_overrides (feature_dict)
+
+    # Core decls, and the decl families this feature list needs (see RIFFL_Registry)
+    (fdecls, fdecl_index) = RR.decls_for (feature_dict)
+
     # List all feature decls if verbose
     if (verbosity > 1):
         sys.stdout.write ("All feature decls:\n")
-        for fdecl in RD.fdecls:
+        for fdecl in fdecls:
             print_fdecl (fdecl)
         sys.stdout.write ("End of all feature specs\n")
 
     # Split input features into known and unknown features (and convert from dict to list)
-    (known_features, unknown_features) = split_known_and_unknown (RD.fdecls, feature_dict)
+    (known_features, unknown_features) = split_known_and_unknown (fdecl_index, feature_dict)
 
     # Echo feature list, for info
     if (len (known_features) > 0):
@@ -84,55 +252,90 @@ def main (argv = None):
 
     # Check ALL fdecls constraints on known features
     sys.stdout.write ("---------------- Checking all constraints\n")
-    (all_pass, known_features_out) = check_all_constraints (verbosity, RD.fdecls, known_features)
+    # A layered feature list (see RY.load_feature_list) is looked up
+    # through its layers, with its unknown features hidden
+    features = known_features
+    if isinstance (feature_dict, collections.ChainMap):
+        features = feature_dict.new_child (dict.fromkeys ([fname for (fname, fval) in unknown_features]))
+    state = Check_state (verbosity, fdecls, features, fdecl_index, metrics, n_jobs = n_jobs)
+    print_check_summary (state)
+    all_pass           = state.all_pass ()
+    known_features_out = state.features_out ()
+
+    if len (hart_overrides) > 0:
+        sys.stdout.write ("---------------- Checking harts with overrides\n")
+        checker = RH.Hart_checker (verbosity, feature_dict, state)
+        hart_results = RH.check_harts (checker, hart_overrides, n_jobs)
+        RH.print_hart_results (sys.stdout, hart_results)
+        all_pass = all_pass and all ([result.all_pass for result in hart_results])
 
     # If constraints met, write output file (input feature list + defaulted features)
-    if all_pass:
-        sys.stdout.write ("---------------- All constraints ok: writing output file '{0}'\n".
-                          format (output_feature_filename))
-
-        # Split known_features_out into the ones provided in known_features and the rest (i.e., defaults)
-        (given_features_out, default_features_out) = split_given_and_defaults (known_features, known_features_out)
-
-        with open (output_feature_filename, 'w') as stream:
-            sys.stdout.write ("Writing {0} known features\n".format (len (given_features_out)))
-            write_output_features (stream, given_features_out, "Known features")
-
-            if (len (default_features_out) > 0):
-                sys.stdout.write ("Writing {0} known default features\n".format (len (default_features_out)))
-                write_output_features (stream, default_features_out, "Known default features")
-
-            if (len (unknown_features) > 0):
-                sys.stdout.write ("Writing {0} unknown features\n".format (len (unknown_features)))
-                write_output_features (stream, unknown_features, "Unknown features")
-
-        if verbosity > 0:
-            write_output_features (sys.stdout,  known_features_out, "Known features")
-            write_output_features (sys.stdout,  unknown_features, "Unknown features")
-
-    return 0
+    if not all_pass:
+        if explain:
+            sys.stdout.write ("---------------- Explanation of failures\n")
+            explanations = RE.explain_failures (fdecls, fdecl_index, known_features)
+            RE.print_explanations (sys.stdout, explanations)
+        return (all_pass, state, None)
+
+    sys.stdout.write ("---------------- All constraints ok: writing output file '{0}'\n".
+                      format (output_feature_filename))
+
+    # Split known_features_out into the ones provided in known_features and the rest (i.e., defaults)
+    (given_features_out, default_features_out) = split_given_and_defaults (known_features, known_features_out)
+    given_features_out   = [(fname, value_as_expr (fval)) for (fname, fval) in given_features_out]
+    default_features_out = [(fname, value_as_expr (fval)) for (fname, fval) in default_features_out]
+
+    with open (output_feature_filename, 'w') as stream:
+        writer = RY.Feature_writer (stream, RY.output_format (output_feature_filename))
+        sys.stdout.write ("Writing {0} known features\n".format (len (given_features_out)))
+        writer.write_section ("Known features", given_features_out)
+
+        if (len (default_features_out) > 0):
+            sys.stdout.write ("Writing {0} known default features\n".format (len (default_features_out)))
+            writer.write_section ("Known default features", default_features_out)
+
+        if (len (unknown_features) > 0):
+            sys.stdout.write ("Writing {0} unknown features\n".format (len (unknown_features)))
+            writer.write_section ("Unknown features", unknown_features)
+
+        if (len (hart_overrides) > 0):
+            sys.stdout.write ("Writing overrides for {0} harts\n".format (len (hart_overrides)))
+            writer.write_section ("Hart overrides", [(RH.hart_overrides_fname, dict (hart_overrides))])
+        writer.close ()
+
+    if verbosity > 0:
+        write_output_features (sys.stdout,  known_features_out, "Known features")
+        write_output_features (sys.stdout,  unknown_features, "Unknown features")
+
+    return (all_pass, state, output_feature_filename)
+
+# An expression that evaluates to feature value 'v', so that checked
+# features written out can be read back as a feature list: lists made
+# by 'List' are quoted again; WARL_fn and Address_map values are
+# already quoted.
+
+def value_as_expr (v):
+    if type (v) != list:
+        return v
+    if (len (v) > 0) and ((v [0] == "WARL_fn") or (v [0] == "Address_map")):
+        return v
+    return ["List"] + [value_as_expr (x) for x in v]
+
+# Write one titled section of features as typed YAML (see RY.Feature_writer)
 
 def write_output_features (stream, features, title):
-    stream.write ("\n\n# ---------------- {0} ----------------\n\n".format (title))
-    for (name, val) in features:
-        if (type (val) == str) or (type (val) == bool) or (type (val) == list):
-            stream.write ("{0}: '{1}'\n".format (name, val))
-        elif type (val) == int:
-            stream.write ("{0}: {1}\n".format (name, val))
-        else:
-            stream.write ("'{0}':\n".format (name))
-            pprint_at_indent (stream, val, 4)
-    
+    RY.Feature_writer (stream).write_section (title, features)
+
 # ================================================================
 # Split a dict of features into two lists: known and unkown features
 # based on membership (or not) in feature decls
 
-def split_known_and_unknown (fdecls, feature_dict):
+def split_known_and_unknown (fdecl_index, feature_dict):
     known   = []
     unknown = []
     for name in iter (feature_dict.keys()):
         val = feature_dict [name]
-        fs = select_fdecl (fdecls, name)
+        fs = select_fdecl (fdecl_index, name)
         if fs == None:
             unknown.append ((name, val))
         else:
@@ -144,10 +347,11 @@ def split_known_and_unknown (fdecls, feature_dict):
 # and those that were not (and are therefore defaults)
 
 def split_given_and_defaults (flist1, flist2):
+    fval_index1 = mk_fval_index (flist1)
     given    = []
     defaults = []
     for (name,val) in flist2:
-        e = select_fval (flist1, name)
+        e = select_fval (fval_index1, name)
         if e != None:
             given.append ((name, val))
         else:
@@ -171,56 +375,233 @@ def fdecl_constraint (fdecl): return fdecl [4]
 # ================================================================
 # Check all constraints
 
-#     'fdecls': feature decl list
-#     'flist':  feature list
+#     'fdecls':      feature decl list
+#     'features':    feature list (or a layered one: see 'mk_fval_index')
+#     'fdecl_index': optional index of 'fdecls' by name (e.g., RD.fdecl_index);
+#                    built here if not supplied
+#     'metrics':     optional RIFFL_Metrics.Metrics, to collect per-fdecl
+#                    times and evaluation counts
+#     'n_jobs':      for a large decl set, number of worker processes to check
+#                    it on (default 1: in this process; 0: one per CPU; see
+#                    RIFFL_Parallel)
 
 # Iterate over 'fdecls', checking each one's preconds and constraints.
+# Each fdecl's default, preconds and constraint are compiled once
+# (see RIFFL_Compile) and reused across calls.
 # Returns a boolean ('all constraints met')
 # and a full feature list (original feature plus omitted defaults)
 
-def check_all_constraints (verbosity, fdecls, features):
-    n_constraints = 0
-    n_pass        = 0
-    features_out  = []
-    for fdecl in fdecls:
-        n_constraints = n_constraints + 1
-        (ok, feature_out) = check_fdecl_constraint (verbosity, fdecls, features, fdecl)
-        if ok:
-            n_pass = n_pass + 1
-            if feature_out != None:
-                features_out.append (feature_out)
+def check_all_constraints (verbosity, fdecls, features, fdecl_index = None, metrics = None, n_jobs = 1):
+    state = Check_state (verbosity, fdecls, features, fdecl_index, metrics, n_jobs = n_jobs)
+    print_check_summary (state)
+    return (state.all_pass (), state.features_out ())
 
+def print_check_summary (state):
+    n_constraints = len (state.outcomes)
+    n_pass        = n_constraints - len (state.failing)
     print ("Num constraints checked {0}; pass {1}; fail {2}".format (n_constraints, n_pass, n_constraints - n_pass))
-    all_pass = (n_pass == n_constraints)
-    return (all_pass, features_out)
+
+# ================================================================
+# The outcome of checking all fdecls against one feature list.
+# The outcome (ok, feature_out) of each fdecl is kept, so that when a
+# single feature changes ('recheck_feature'), only the fdecls that
+# depend on it (see RIFFL_Deps) are re-evaluated.
+
+# Diagnostics (failed constraints, and given features that are not
+# relevant) are printed as they are found, unless 'quiet'; they are also
+# kept (see 'diagnostics_list').
+
+# Errors while checking an fdecl (e.g., a reference to an undeclared
+# feature) raise RCo.Check_error, unless 'errors_fail', in which case
+# the fdecl just fails, with an "error" diagnostic.
+
+# 'n_jobs' > 1 (0: one per CPU) allows the initial check of a large
+# decl set to be done on a pool of workers (see RIFFL_Parallel), with
+# the same outcomes and diagnostics.
+
+class Check_state:
+    def __init__ (self, verbosity, fdecls, features, fdecl_index = None, metrics = None, quiet = False,
+                  errors_fail = False, n_jobs = 1):
+        if fdecl_index == None:
+            fdecl_index = RD.mk_fdecl_index (fdecls)
+        self.verbosity   = verbosity
+        self.fdecls      = fdecls
+        self.fdecl_index = fdecl_index
+        self.quiet       = quiet
+        self.errors_fail = errors_fail
+        self.env         = RCo.Env (verbosity, fdecl_index, mk_fval_index (features), metrics)
+        self.outcomes    = {}
+        self.diagnostics = {}         # Diagnostic of each fdecl that has one
+        self.failing     = set ()     # names of fdecls whose check failed
+        self.defaulted   = set ()     # names of features that took default values
+        self.deps        = None       # Dep_graph, built on first recheck
+        self.positions   = None       # position of each fdecl in 'fdecls'
+
+        # Large decl sets are checked on a pool of workers (see RIFFL_Parallel)
+        n_jobs = RP.n_jobs_for (self, n_jobs)
+        if n_jobs > 1:
+            RP.check_in_parallel (self, n_jobs)
+        else:
+            for fdecl in fdecls:
+                self.check_fdecl (fdecl)
+
+    def check_fdecl (self, fdecl):
+        fname = fdecl_name (fdecl)
+        try:
+            (ok, feature_out, diagnostic) = check_fdecl_constraint (self.verbosity, self.env, fdecl)
+        except evaluation_errors as exc:
+            if not self.errors_fail:
+                raise
+            diagnostic = Diagnostic ("error", fname, fdecl_descr (fdecl), None, [], [str (exc)])
+            (ok, feature_out) = (False, None)
+        self.record_outcome (fname, ok, feature_out, diagnostic)
+
+    # Record the outcome of checking fdecl 'fname', printing its
+    # diagnostic (if any) unless quiet
+    def record_outcome (self, fname, ok, feature_out, diagnostic):
+        self.outcomes [fname] = (ok, feature_out)
+        if diagnostic != None:
+            self.diagnostics [fname] = diagnostic
+            if not self.quiet:
+                print_diagnostic (sys.stdout, diagnostic)
+        else:
+            self.diagnostics.pop (fname, None)
+        if ok:
+            self.failing.discard (fname)
+        else:
+            self.failing.add (fname)
+        if ok and (feature_out != None) and (select_fval (self.env.fval_index, fname) == None):
+            self.defaulted.add (fname)
+        else:
+            self.defaulted.discard (fname)
+
+    def all_pass (self):
+        return (len (self.failing) == 0)
+
+    def n_checked (self):
+        return len (self.outcomes)
+
+    # Names of failing fdecls, in fdecl order
+    def failing_names (self):
+        return [fdecl_name (fdecl) for fdecl in self.fdecls if fdecl_name (fdecl) in self.failing]
+
+    # Diagnostics, in fdecl order
+    def diagnostics_list (self):
+        return [self.diagnostics [fdecl_name (fdecl)] for fdecl in self.fdecls
+                if fdecl_name (fdecl) in self.diagnostics]
+
+    # Full feature list (given features plus omitted defaults), in fdecl order
+    def features_out (self):
+        features_out = []
+        for fdecl in self.fdecls:
+            (ok, feature_out) = self.outcomes [fdecl_name (fdecl)]
+            if ok and (feature_out != None):
+                features_out.append (feature_out)
+        return features_out
+
+    # Change the value of feature 'fname' to 'fval' (None: remove it, so
+    # it takes its default) and recheck only the affected fdecls.
+    # Returns the names of the rechecked fdecls, in fdecl order.
+    def recheck_feature (self, fname, fval):
+        return self.recheck_features ([(fname, fval)])
+
+    # As 'recheck_feature', for a list of (fname, fval) changes at once;
+    # each affected fdecl is rechecked once.
+    def recheck_features (self, changes):
+        for (fname, fval) in changes:
+            if select_fdecl (self.fdecl_index, fname) == None:
+                raise RCo.Check_error ("ERROR: recheck of undeclared feature {0}\n".format (fname))
+        self.init_deps ()
+
+        env = self.env
+        for (fname, fval) in changes:
+            # None also hides a value in a lower layer of a layered feature list
+            env.fval_index [fname] = fval
+            env.given_fns.pop (fname, None)
+            self.deps.set_value_expr (fname, fval)
+
+        values = set ()
+        checks = set ()
+        for (fname, fval) in changes:
+            (values1, checks1) = self.deps.affected (fname)
+            values.update (values1)
+            checks.update (checks1)
+        for x in values:
+            env.values.pop (x, None)
+
+        checks = sorted ([x for x in checks if x in self.positions], key = lambda x: self.positions [x])
+        for x in checks:
+            self.check_fdecl (self.fdecl_index [x])
+        return checks
+
+    def init_deps (self):
+        if self.deps == None:
+            self.deps      = RDp.Dep_graph (self.fdecl_index, self.env.fval_index)
+            self.positions = dict ([(fdecl_name (fdecl), j) for (j, fdecl) in enumerate (self.fdecls)])
+
+    # A copy of this state that can be rechecked independently (e.g.,
+    # for one hart, see RIFFL_Harts).  The fdecls, their compiled forms
+    # and the dependency graph's check dependencies are shared; outcomes
+    # and feature values are copied.
+    def fork (self):
+        self.init_deps ()
+        state = Check_state.__new__ (Check_state)
+        state.__dict__.update (self.__dict__)
+        state.env         = self.env.fork ()
+        state.outcomes    = dict (self.outcomes)
+        state.diagnostics = dict (self.diagnostics)
+        state.failing     = set (self.failing)
+        state.defaulted   = set (self.defaulted)
+        state.deps        = self.deps.copy ()
+        return state
 
 # ================================================================
 # Check the constraint on a particular feature decl
 
-#     'fdecls': feature decl list
-#     'flist':  feature list
-#     'fdecl':  feature decl whose default/precond/constraint we are currently eval'ing
+#     'env':   evaluation environment (RCo.Env) for the feature list
+#     'fdecl': feature decl whose default/precond/constraint we are currently eval'ing
+
+# Returns (ok, feature_out, diagnostic), where 'diagnostic' is None or a
+# Diagnostic (below) explaining a failed constraint or an irrelevant feature.
+
+# Expressions (or chains of '$FOO' references) nested too deeply for
+# Python's recursion limit raise RCo.Check_error.
 
-def check_fdecl_constraint (verbosity, fdecls, flist, fdecl):
+def check_fdecl_constraint (verbosity, env, fdecl):
+    try:
+        return check_fdecl_constraint1 (verbosity, env, fdecl)
+    except RecursionError:
+        env.depth = 0
+        raise RCo.Check_error ("ERROR: expressions nested too deeply to evaluate, checking fdecl '{0}'\n".
+                               format (fdecl_name (fdecl)))
+
+def check_fdecl_constraint1 (verbosity, env, fdecl):
     if (verbosity > 0):
         sys.stdout.write ("Checking fdecl\n")
         print_fdecl (fdecl)
 
-    prefix = ""
+    cfdecl = RCo.compile_fdecl (fdecl, env.mode)
+
+    metrics = env.metrics
+    if metrics != None:
+        rec = metrics.start_fdecl (fdecl_name (fdecl))
+        t0  = time.perf_counter ()
 
     # Eval this feature's value from flist
-    v = eval (verbosity, prefix, fdecls, flist, fdecl, "$this")
+    v = env.value (fdecl_name (fdecl))
+    if metrics != None:
+        t1 = time.perf_counter ()
     debug_print (verbosity, "Feature value: {0}\n".format (v))
 
     # Check if all preconds of this fdecl are True (i.e., is it relevant?)
     # Collect all the False preconds, for informative message
     false_preconds = []
     preconds = True
-    for precond in fdecl_preconds (fdecl):
+    for (precond, precond_fn) in zip (fdecl_preconds (fdecl), cfdecl.preconds):
         debug_print (verbosity, "---- Checking precondition:\n")
         if (verbosity > 0): pprint.pprint (precond, indent = 4)
 
-        precond_v = eval (verbosity, prefix, fdecls, flist, fdecl, precond)
+        precond_v = precond_fn (env)
 
         if precond_v:
             debug_print (verbosity, "Precondition is TRUE\n")
@@ -229,299 +610,117 @@ def check_fdecl_constraint (verbosity, fdecls, flist, fdecl):
             preconds = False
             false_preconds.append (precond)
 
+    if metrics != None:
+        t2 = time.perf_counter ()
+        rec.value_time   += t1 - t0
+        rec.precond_time += t2 - t1
+
     # Check if constraint of this fdecl is True
     # If so, collect this feature-out
     constraint  = fdecl_constraint (fdecl)
     feature_out = None
+    diagnostic  = None
     debug_print (verbosity, "---- Checking constraint:")
     if (verbosity > 0): pprint.pprint (constraint, indent = 4)
     if preconds:
-        x           = eval (verbosity, prefix, fdecls, flist, fdecl, constraint)
+        x           = cfdecl.constraint (env)
         feature_out = (fdecl_name (fdecl), v)
+        if metrics != None:
+            rec.constraint_time += time.perf_counter () - t2
         if x:
             debug_print (verbosity, "Constraint evaluates TRUE\n")
         else:
-            sys.stdout.write ("Constraint evaluates FALSE for fdecl '{0}' ({1})\n".format (fdecl_name (fdecl),
-                                                                                           fdecl_descr (fdecl)))
-            sys.stdout.write ("  Feature value is {0}\n".format (v))
-            sys.stdout.write ("  Constraint is: ")
-            pprint.pprint (fdecl_constraint (fdecl), indent = 4)
+            details = []
+            if (type (v) == list) and (len (v) > 0) and (v [0] == "Address_map"):
+                details = RCo.address_map_errors (v)
+            diagnostic = Diagnostic ("constraint_false", fdecl_name (fdecl), fdecl_descr (fdecl),
+                                     v, [constraint], details)
 
     else:
         x = True
         debug_print (verbosity, "Constraint trivially TRUE\n")
 
-        v1 = select_fval (flist, fdecl_name (fdecl))
+        v1 = select_fval (env.fval_index, fdecl_name (fdecl))
         if v1 != None:
-            sys.stdout.write ("Feature '{0}':{1}    is not relevant\n".format (fdecl_name (fdecl), v1))
-            sys.stdout.write ("  The following preconditions are false\n")
-            for precond in false_preconds:
-                pprint_at_indent (sys.stdout, precond, 4)
-
-    return (x, feature_out)
-
-# ================================================================
-# Eval-Apply
-
-# Eval expression 'e' in context of 'fdecls', 'flist', 'fdecl'
-#     'fdecls': feature decl list
-#     'flist':  feature list
-#     'fdecl':  feature decl whose default/precond/constraint we are currently eval'ing
-
-def eval (verbosity, prefix, fdecls, flist, fdecl, e):
-    debug_trace (verbosity, prefix + "==> Eval ", e)
-    prefix_ret  = prefix + "<== Eval "
-    prefix_next = prefix + "    "
-
-    # Leaf term: Special variable '$this' (value of current feature)
-    if e == "$this":
-        fname  = fdecl_name (fdecl)
-        v_expr = select_fval (flist, fname)
-        if (v_expr == None):
-            v_expr = fdecl_default (fdecl)
-        v = eval (verbosity, prefix_next, fdecls, flist, fdecl, v_expr)
-        return debug_trace (verbosity, prefix_ret, v)
-
-    # Leaf term: Special variable '$max_XLEN' (max unsigned integer of width XLEN)
-    if e == "$max_XLEN":
-        v = select_fval (flist, "XLEN")
-        if (v == None):
-            sys.stderr.write ("ERROR: evaluating '$max_XLEN': XLEN has not been specified\n")
-            sys.exit (1)
-        if (v == 32):
-            return debug_trace (verbosity, prefix_ret, 0xFFFFFFFF)
-        elif (v == 64):
-            return debug_trace (verbosity, prefix_ret, 0xFFFFFFFFFFFFFFFF)
-        else:
-            sys.stderr.write ("ERROR: evaluating '$max_XLEN': XLEN ({0}) is not 32 or 64\n".format (v))
-            sys.exit (1)
-
-    # Leaf term: Special variable '$<feature>'
-
-    if (type (e) == str) and e.startswith ('$'):
-        fname_x  = e [1:]
-        v_expr_x = select_fval (flist, fname_x)
-        if (v_expr_x == None):
-            fdecl_x = select_fdecl (fdecls, fname_x)
-            v_expr_x = fdecl_default (fdecl_x)
-        result = eval (verbosity, prefix_next, fdecls, flist, fdecl, v_expr_x)
-        return debug_trace (verbosity, prefix_ret, result)
-
-    if e == "True":  return debug_trace (verbosity, prefix_ret, True)
-    if e == "False":  return debug_trace (verbosity, prefix_ret, False)
-
-    # Leaf term: Constants
-    if e == None:        return debug_trace (verbosity, prefix_ret, e)
-    if type (e) == int:  return debug_trace (verbosity, prefix_ret, e)
-    if type (e) == str:  return debug_trace (verbosity, prefix_ret, e)
-    if type (e) == bool: return debug_trace (verbosity, prefix_ret, e)
-
-    # Assertion check that it's not a leaf term
-    if type (e) != list:
-        sys.stderr.write ("INTERNAL ERROR: unknown form of expression\n")
-        pprint.pprint (e, indent = 4)
-        sys.exit (1)
-
-    op = e [0]
-    e_args = e [1:]
-
-    if op == "If":
-        v_cond = eval (verbosity, prefix_next, fdecls, flist, fdecl, e_args [0])
-        if v_cond == True:
-            v1 = eval (verbosity, prefix_next, fdecls, flist, fdecl, e_args [1])
-            return debug_trace (verbosity, prefix_ret, v1)
-        else:
-            v2 = eval (verbosity, prefix_next, fdecls, flist, fdecl, e_args [2])
-            return debug_trace (verbosity, prefix_ret, v2)
-
-    if op in ["||"]:
-        result = False
-        for e_arg in e_args:
-            result = eval (verbosity, prefix_next, fdecls, flist, fdecl, e_arg)
-            if result: break
-        return debug_trace (verbosity, prefix_ret, result)
+            diagnostic = Diagnostic ("not_relevant", fdecl_name (fdecl), fdecl_descr (fdecl),
+                                     v1, false_preconds, [])
 
-    if op in ["&&"]:
-        result = True
-        for e_arg in e_args:
-            result = eval (verbosity, prefix_next, fdecls, flist, fdecl, e_arg)
-            if not result: break
-        return debug_trace (verbosity, prefix_ret, result)
+    return (x, feature_out, diagnostic)
 
-    if op.upper() == "LIST":
-        result = []
-        for e_arg in e_args:
-            result_j = eval (verbosity, prefix_next, fdecls, flist, fdecl, e_arg)
-            result.append (result_j)
-        return debug_trace (verbosity, prefix_ret, result)
+# Errors that can arise while checking an fdecl: RCo.Check_error, and
+# ops applied to values of the wrong type, etc.
 
-    if op == "Address_map":
-        result = e
-        return debug_trace (verbosity, prefix_ret, result)
-
-    if op == "WARL_fn":
-        return debug_trace (verbosity, prefix_ret, e)
-
-    # Ordinary application: eval args, apply op to args
-    v_args = [eval (verbosity, prefix_next, fdecls, flist, fdecl, e_arg) for e_arg in e_args]
-    return apply (verbosity, prefix, fdecls, flist, fdecl, op, v_args)
-
-# Apply 'op' to 'v_args' in context of 'fdecls', 'flist', 'fdecl'
-
-def apply (verbosity, prefix, fdecls, flist, fdecl, op, v_args):
-    debug_trace (verbosity, prefix + "    Apply: " + op + " ", v_args)
-    prefix_next = prefix + "    "
-
-    if   op == "Is_bool":        result = (type (v_args [0]) == bool)
-    elif op == "Is_int":         result = (type (v_args [0]) == int)
-    elif op == "Is_string":      result = (type (v_args [0]) == str)
-    elif op == "Is_address_map": result = is_address_map (v_args [0])
-    elif op == "Are_hartids":    result = are_hartids (v_args [0])
-
-    elif op == "~":              result = (~ v_args [0])
-    elif op == "&":              result = (v_args [0] &  v_args [1])
-    elif op == "|":              result = (v_args [0] |  v_args [1])
-    elif op == "^":              result = (v_args [0] ^  v_args [1])
-
-    elif op == "!=":             result = (v_args [0] != v_args [1])
-    elif op == "==":             result = (v_args [0] == v_args [1])
-
-    elif op == "<":              result = (v_args [0] <  v_args [1])
-    elif op == "<=":             result = (v_args [0] <= v_args [1])
-    elif op == ">":              result = (v_args [0] >= v_args [1])
-    elif op == ">=":             result = (v_args [0] >  v_args [1])
-
-    elif op == "+":              result = (v_args [0] +  v_args [1])
-    elif op == "-":              result = (v_args [0] -  v_args [1])
-    elif op == "neg":            result = (0 - v_args [0])
-
-    elif op == "not":            result = (not v_args [0])
-
-    elif op == "In":             result = (v_args [0] in  v_args [1])
-    elif op == "Range":          result = range (v_args [0], v_args [1])
-    elif op == "Is_power_of_2":  result = is_power_of_2 (v_args [0])
-
-    elif op == "XLEN_code":      result = XLEN_code (v_args [0])
-
-    elif op == "Is_WARL_fn":  result = is_WARL_fn (verbosity, v_args [0], v_args [1])
-
-    else:
-        sys.stderr.write ("ERROR: unknown form of expression\n")
-        pprint.pprint ([op] + v_args, indent = 4)
-        sys.exit (1)
-
-    return debug_trace (verbosity, prefix, result)
-
-# ----------------------------------------------------------------
-# is_address_map: xs must be
-# - non-empty list of 5-lists (base:int, size:int, addr_type:str, addr_ops:str, description:str)
-# - base and sizes are all positive
-# - addr_type is string MEM or IO
-# - addr_ops  is string RO, RW or WO
-# - addr ranges are disjoint
-
-def is_address_map (xs):
-    if (xs == None):
-        return False
-    else:
-        # TODO: see above checks
-        return True
-
-# ----------------------------------------------------------------
-# xs must be a non-empty list of increasing (not necessarily contiguous) integers starting with 0
-
-def are_hartids (xs):
-    if xs == []: return False
-    if xs [0] != 0: return False
-    last_x = xs [0]
-    for x in xs [1:]:
-        if last_x >= x : return False
-        last_x = x
-    return True
+evaluation_errors = (RCo.Check_error, TypeError, ValueError, KeyError, IndexError, ZeroDivisionError)
 
 # ----------------------------------------------------------------
-
-def XLEN_code (xlen):
-    if xlen == 32:
-        return 1
-    elif xlen == 64:
-        return 2
-    elif xlen == 128:
-        return 3
+# Diagnostics
+#     'kind':    "constraint_false": the constraint of fdecl 'fname' is false
+#                    ('exprs': [the constraint]; 'details': any address map errors)
+#                "not_relevant": feature 'fname' is given but not relevant
+#                    ('exprs': the false preconditions)
+#                "error": checking fdecl 'fname' raised an error
+#                    ('details': [the error message]; see Check_state 'errors_fail')
+#     'value':   the feature's value
+
+Diagnostic = collections.namedtuple ("Diagnostic", ["kind", "fname", "descr", "value", "exprs", "details"])
+
+def print_diagnostic (stream, diagnostic):
+    if diagnostic.kind == "constraint_false":
+        stream.write ("Constraint evaluates FALSE for fdecl '{0}' ({1})\n".format (diagnostic.fname,
+                                                                               diagnostic.descr))
+        stream.write ("  Feature value is {0}\n".format (diagnostic.value))
+        stream.write ("  Constraint is: ")
+        stream.write (RCo.pformat_expr (diagnostic.exprs [0], 4) + "\n")
+        if (type (diagnostic.value) == list) and (len (diagnostic.value) > 0) and (diagnostic.value [0] == "Address_map"):
+            stream.write ("  Address map errors:\n")
+            for err in diagnostic.details:
+                stream.write ("    {0}\n".format (err))
+    elif diagnostic.kind == "error":
+        stream.write ("Error while checking fdecl '{0}' ({1})\n".format (diagnostic.fname, diagnostic.descr))
+        stream.write ("  {0}\n".format (diagnostic.details [0]))
     else:
-        return 0
+        stream.write ("Feature '{0}':{1}    is not relevant\n".format (diagnostic.fname, diagnostic.value))
+        stream.write ("  The following preconditions are false\n")
+        for precond in diagnostic.exprs:
+            pprint_at_indent (stream, precond, 4)
 
-# ----------------------------------------------------------------
-# Checks that y is a legal WARL_fn for field x
-# TODO: this needs to be fleshed out for all the different WARL fields
-
-def is_WARL_fn (verbosity, x, y):
-    if (verbosity > 0):
-        sys.stdout.write ("TODO: check legality of WARL_fn for {0}\n".format (x))
-        pprint_at_indent (sys.stdout, y, 8)
-    return True
-
-# ----------------------------------------------------------------
-# x must be a power of 2 (has exactly 1 bit set)
-
-def is_power_of_2 (x):
-    if x == 0: return False
-
-    # Shift out zero lsbs
-    while (x & 0x1 == 0):
-        x = x >> 1
-
-    # Shift out the non-zero lsb (which should be the only non-zero bit)
-    x = x >> 1
+# ================================================================
+# Select feature decl with given name from index of feature decls
+# (see RD.mk_fdecl_index), if present; else return None
 
-    # The remaining bits should be 0
-    return (x == 0)
+def select_fdecl (fdecl_index, name):
+    return fdecl_index.get (name)
 
 # ================================================================
-# Select feature decl with given name from list of feature decls
-
-def select_fdecl (fdecls, name):
-    fdecls1 = [fdecl for fdecl in fdecls if fdecl_name (fdecl) == name]
-    if len (fdecls1) == 0:
-        return None
-    elif len (fdecls1) == 1:
-        return fdecls1 [0]
-    else:
-        print ("INTERNAL ERROR: more than one feature decl with this name:", name)
-        for fdecl in fdecls1:
-            print ("    ", fdecl)
+# Index a feature list by feature name.
+# Built once per feature list; duplicate entries are reported here.
+# A layered feature list (a ChainMap, see RY.load_feature_list) is
+# its own index: it gets a new front layer, for changes by rechecks.
+# A value of None in an index means the feature is not given.
+
+def mk_fval_index (flist):
+    if isinstance (flist, collections.ChainMap):
+        return flist.new_child ()
+    fval_index = {}
+    for (fname, val) in flist:
+        if fname in fval_index:
+            raise RCo.Check_error ("ERROR: feature list has duplicate entry for feature {0}\n".format (fname),
+                                   flist)
+        fval_index [fname] = val
+    return fval_index
 
 # ================================================================
-# Select value of feature with 'fname' from feature list, if present;
+# Select value of feature with 'fname' from feature list index, if present;
 # else return None
 
-def select_fval (flist, fname):
-    # DEBUG: sys.stdout.write ("select_fval {0} from ".format (fname)); print (flist)
-
-    flist1 = [val for (n,val) in flist if (fname == n) ]
-
-    if len (flist1) == 0:
-        result = None
-    elif len (flist1) == 1:
-        result = flist1 [0]
-    else:
-        sys.stderr.write ("ERROR: feature list has duplicate entry for feature {0}\n".format (fname))
-        pprint_at_indent (sys.stderr, flist, 4)
-        sys.exit (1)
-
-    # sys.stdout.write ("select_fval <= ".format (fname)); print (result)
-    return result
+def select_fval (fval_index, fname):
+    return fval_index.get (fname)
 
 # ================================================================
 
 def debug_print (verbosity, s):
     if verbosity > 0: sys.stdout.write (s)
 
-def debug_trace (verbosity, prefix, e):
-    if (verbosity > 1):
-        sys.stdout.write (prefix); print (e)    
-    return e
-
 def print_fdecl (fdecl):
     sys.stdout.write ("Feature Constraint\n")
     sys.stdout.write ("  Feature: {0}\n".format (fdecl_name (fdecl)))
@@ -535,7 +734,7 @@ def print_fdecl (fdecl):
     pprint_at_indent (sys.stdout, fdecl_constraint (fdecl), 4)
 
 def pprint_at_indent (stream, x, indent_n):
-    s = pprint.pformat (x, indent = indent_n)
+    s = RCo.pformat_expr (x, indent_n)
     for line in s.splitlines ():
         stream.write ("        {0}\n".format (line))
 
@@ -0,0 +1,803 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Compiler for RIFFL S-expressions.
+
+# Each expression (a feature's default, preconditions and constraint,
+# or a value given in a feature list) is compiled once into a Python
+# closure 'f (env)', where 'env' is an 'Env' (below) that supplies
+# the values of features.  Ops are resolved to Python functions at
+# compile time, and sub-expressions with constant arguments are folded.
+
+# Expressions can also be compiled in an instrumented 'mode':
+#     "trace": print each node's expression and value (verbosity > 1)
+#     "count": count evaluated nodes and op applications (see RIFFL_Metrics)
+
+# Chains of associative ops ('&&', '||', '+', '&', '|', '^') and of
+# 'not', and nested 'If's, are flattened into single nodes, and the
+# compiler itself walks expressions with an explicit stack, so long
+# generated chains do not hit Python's recursion limit.  Other deeply
+# nested expressions can still exceed it when evaluated; the checker
+# reports that as a Check_error.
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import heapq
+import pprint
+import collections
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Fdecl as RF
+
+# ================================================================
+# Primitive ops, each a Python function of fixed arity
+
+def is_bool   (x): return (type (x) == bool)
+def is_int    (x): return (type (x) == int)
+def is_string (x): return (type (x) == str)
+
+ops = {
+    "Is_bool":        is_bool,
+    "Is_int":         is_int,
+    "Is_string":      is_string,
+    "Is_address_map": lambda x: is_address_map (x),
+    "Are_hartids":    lambda x: are_hartids (x),
+
+    "~":              lambda x: (~ x),
+    "&":              lambda x, y: (x &  y),
+    "|":              lambda x, y: (x |  y),
+    "^":              lambda x, y: (x ^  y),
+
+    "!=":             lambda x, y: (x != y),
+    "==":             lambda x, y: (x == y),
+
+    "<":              lambda x, y: (x <  y),
+    "<=":             lambda x, y: (x <= y),
+    ">":              lambda x, y: (x >  y),
+    ">=":             lambda x, y: (x >= y),
+
+    "+":              lambda x, y: (x +  y),
+    "-":              lambda x, y: (x -  y),
+    "neg":            lambda x: (0 - x),
+
+    "not":            lambda x: (not x),
+
+    "In":             lambda x, y: (x in y),
+    "Range":          lambda x, y: range (x, y),
+    "Is_power_of_2":  lambda x: is_power_of_2 (x),
+
+    "XLEN_code":      lambda x: XLEN_code (x),
+}
+
+# Binary ops whose nested chains can be flattened into one n-ary node
+
+assoc_ops = ["+", "&", "|", "^"]
+
+# ================================================================
+# Evaluation environment: the values of features for one check run
+
+#     'fdecl_index': feature decls, indexed by name
+#     'fval_index':  feature values (unevaluated expressions), indexed by name
+#     'metrics':     optional RIFFL_Metrics.Metrics, to collect counts
+
+# Each feature's value is evaluated at most once per Env, and cached.
+# Features whose values are being evaluated are kept on a stack, so that
+# cyclic '$FOO' references are reported instead of recursing forever.
+
+class Env:
+    def __init__ (self, verbosity, fdecl_index, fval_index, metrics = None):
+        self.verbosity   = verbosity
+        self.fdecl_index = fdecl_index
+        self.fval_index  = fval_index
+        self.metrics     = metrics
+        if metrics != None:
+            self.mode = "count"
+        elif verbosity > 1:
+            self.mode = "trace"
+        else:
+            self.mode = None
+        self.depth       = 0
+        # Compiled forms of the values given in 'fval_index'
+        self.given_fns   = {}
+        # Resolved feature values, and features currently being resolved
+        self.values      = {}
+        self.resolving   = []
+        # Index of the instance of an indexed fdecl being evaluated
+        # (see 'instantiate_fdecl')
+        self.index       = None
+
+    # Compiled expression for the value of feature 'fname':
+    # the value given in the feature list, if any; else its default
+    def value_fn (self, fname):
+        f = self.given_fns.get (fname)
+        if f != None:
+            return f
+        v_expr = self.fval_index.get (fname)
+        if v_expr != None:
+            f = compile_expr (v_expr, fname, self.mode)
+            self.given_fns [fname] = f
+            return f
+        fdecl = self.fdecl_index.get (fname)
+        if fdecl == None:
+            report_error ("ERROR: reference to undeclared feature '${0}'\n".format (fname))
+        return compile_fdecl (fdecl, self.mode).default
+
+    # Value of feature 'fname'
+    def value (self, fname):
+        if self.metrics != None:
+            self.metrics.current.n_lookups += 1
+        if fname in self.values:
+            return self.values [fname]
+        if fname in self.resolving:
+            cycle = self.resolving [self.resolving.index (fname):] + [fname]
+            report_error ("ERROR: cyclic feature reference: {0}\n".format (
+                " -> ".join (["$" + x for x in cycle])))
+
+        self.resolving.append (fname)
+        try:
+            v = self.value_fn (fname) (self)
+        finally:
+            self.resolving.pop ()
+        self.values [fname] = v
+        return v
+
+    # A copy whose feature values can be changed without affecting this
+    # one (decls and compiled forms are shared)
+    def fork (self):
+        env = Env.__new__ (Env)
+        env.__dict__.update (self.__dict__)
+        env.fval_index = dict (self.fval_index)
+        env.given_fns  = dict (self.given_fns)
+        env.values     = dict (self.values)
+        env.resolving  = []
+        return env
+
+    # Value attempted to be written; only defined when executing
+    # WARL functions (see RIFFL_WARL)
+    def writeval (self):
+        report_error ("ERROR: '$writeval' used outside a WARL function\n")
+
+    # Max unsigned integer of width XLEN
+    def max_XLEN (self):
+        v = self.value ("XLEN")
+        if (v == None):
+            report_error ("ERROR: evaluating '$max_XLEN': XLEN has not been specified\n")
+        if (v == 32):
+            return 0xFFFFFFFF
+        elif (v == 64):
+            return 0xFFFFFFFFFFFFFFFF
+        else:
+            report_error ("ERROR: evaluating '$max_XLEN': XLEN ({0}) is not 32 or 64\n".format (v))
+
+# ================================================================
+# Compiled fdecls
+
+Compiled_fdecl = collections.namedtuple ("Compiled_fdecl",
+                                         ["name", "default", "preconds", "constraint"])
+
+# Each fdecl is compiled once (per mode) and the result is cached,
+# until the fdecl goes away (see RIFFL_Fdecl.Fdecl_memo).
+
+# fdecl -> dict mode -> Compiled_fdecl
+compiled_fdecls = RF.Fdecl_memo ()
+
+def compile_fdecl (fdecl, mode = None):
+    cfdecls = compiled_fdecls.get (fdecl)
+    if cfdecls == None:
+        cfdecls = {}
+        compiled_fdecls.set (fdecl, cfdecls)
+    cfdecl = cfdecls.get (mode)
+    if cfdecl != None:
+        return cfdecl
+
+    name = fdecl [0]
+    instance = fdecl_instances.get (fdecl)
+    if instance != None:
+        # Share the compiled template, evaluated at this instance's index
+        (template, n) = instance
+        ctemplate = compile_fdecl (template, mode)
+        cfdecl = Compiled_fdecl (name,
+                                 bind_index (ctemplate.default, n),
+                                 [bind_index (f, n) for f in ctemplate.preconds],
+                                 bind_index (ctemplate.constraint, n))
+    else:
+        cfdecl = Compiled_fdecl (name,
+                                 compile_expr (fdecl [2], name, mode),
+                                 [compile_expr (precond, name, mode) for precond in fdecl [3]],
+                                 compile_expr (fdecl [4], name, mode))
+    cfdecls [mode] = cfdecl
+    return cfdecl
+
+# ----------------------------------------------------------------
+# Indexed fdecls (see RIFFL_Registry): a template fdecl, in which
+# 'index_placeholder' stands for an index n, as a whole string (for the
+# int n) or inside strings (e.g., "MHPM{n}_exists", "$MHPM{n}_exists"),
+# declares one feature per n.
+
+# 'instantiate_fdecl' makes the ordinary fdecl for one n (used in
+# diagnostics, output, analysis, etc.), but all instances of a template
+# share its compiled form (compiled once, with the placeholders looked up
+# in 'env.index'), so declaring many instances costs little more than
+# declaring one.  They also share the template's sub-expressions that
+# do not mention n, and its description (see RIFFL_Fdecl).
+
+index_placeholder = RF.index_placeholder
+
+# instance fdecl -> (template fdecl, n)
+fdecl_instances = RF.Fdecl_memo ()
+
+def instantiate_fdecl (template, n):
+    fdecl = RF.Fdecl (subst_index (template [0], n),
+                      (template [1], n),
+                      subst_index (template [2], n),
+                      subst_index (template [3], n),
+                      subst_index (template [4], n))
+    fdecl_instances.set (fdecl, (template, n))
+    return fdecl
+
+# 'x' with the placeholder replaced by 'n' ('x' itself if it has none)
+
+def subst_index (x, n):
+    if type (x) == str:
+        if x == index_placeholder:
+            return n
+        if index_placeholder in x:
+            return sys.intern (x.replace (index_placeholder, str (n)))
+        return x
+    if type (x) == list:
+        ys = [subst_index (y, n) for y in x]
+        for (y, x_y) in zip (ys, x):
+            if y is not x_y:
+                return ys
+        return x
+    return x
+
+# 'f (env)', evaluated with 'env.index' set to 'n'
+
+def bind_index (f, n):
+    def f_indexed (env):
+        saved = env.index
+        env.index = n
+        try:
+            return f (env)
+        finally:
+            env.index = saved
+    return f_indexed
+
+# ================================================================
+# Compile expression 'e' into a closure 'f (env)'
+#     'this_name': the feature that "$this" refers to
+#     'consts':    optional dict of feature values that are known at compile
+#                  time (e.g., a checked feature list); references to them
+#                  are replaced by their values, and folded
+
+def compile_expr (e, this_name, mode = None, consts = None):
+    # Post-order walk with an explicit stack.
+    # Each stack entry is (e, None) on the way down
+    # and (e, shape) on the way up, once its children have been pushed.
+    # Each result is a pair of nodes (plain, instrumented) (the same
+    # node if no 'mode'): constants are folded using the plain nodes, so
+    # folding is as in uninstrumented code, and only nodes that survive
+    # folding are instrumented.
+    results = []
+    stack   = [(e, None)]
+    while len (stack) > 0:
+        (e, shape) = stack.pop ()
+        if shape == None:
+            shape = expr_shape (e)
+            stack.append ((e, shape))
+            for child in reversed (shape [1]):
+                stack.append ((child, None))
+        else:
+            (kind, children) = shape
+            n_children = len (children)
+            if n_children == 0:
+                arg_results = []
+            else:
+                arg_results = results [- n_children:]
+                del results [- n_children:]
+            plain = mk_node (kind, e, [r [0] for r in arg_results], this_name, consts)
+            if mode == None:
+                node = plain
+            elif mode == "trace":
+                node = mk_node (kind, e, [r [1] for r in arg_results], this_name, consts)
+                node = (traced (e, node [0]), False, None)
+            elif plain [1]:
+                # Folded: counted as one evaluation of the constant
+                node = (counted (kind, e, plain [0]), True, plain [2])
+            else:
+                node = mk_node (kind, e, [r [1] for r in arg_results], this_name, consts)
+                node = (counted (kind, e, node [0]), False, None)
+            results.append ((plain, node))
+    (f, is_const, v) = results [0][1]
+    return f
+
+# ----------------------------------------------------------------
+# The shape of an expression: (kind, children), where children are
+# the sub-expressions to compile (after flattening chains)
+
+def expr_shape (e):
+    if type (e) != list:
+        return ("leaf", [])
+    if (len (e) == 0) or (type (e [0]) != str):
+        return ("bad", [])
+
+    op     = e [0]
+    e_args = e [1:]
+
+    if op == "If":
+        if len (e) != 4:
+            return ("bad", [])
+        # Flatten nested Ifs (in either branch) into one decision tree;
+        # children are its conditions and leaves, in pre-order
+        # (for an else-chain: [c1, t1, c2, t2, ..., else])
+        children = []
+        pending  = [e]
+        while len (pending) > 0:
+            e = pending.pop ()
+            if is_if (e):
+                children.append (e [1])
+                pending.extend ([e [3], e [2]])
+            else:
+                children.append (e)
+        return ("If", children)
+
+    if (op == "not") and (len (e) == 2):
+        # Flatten a chain of 'not's: the child is the innermost arg
+        while is_not (e):
+            e = e [1]
+        return ("not", [e])
+
+    if (op == "&&") or (op == "||") or (op in assoc_ops):
+        return (op, flatten_chain (op, e_args))
+
+    if op.upper () == "LIST":
+        return ("List", e_args)
+
+    if (op == "Address_map") or (op == "WARL_fn"):
+        return ("quote", [])
+
+    return ("apply", e_args)
+
+def is_if (e):
+    return (type (e) == list) and (len (e) == 4) and (e [0] == "If")
+
+def is_not (e):
+    return (type (e) == list) and (len (e) == 2) and (e [0] == "not")
+
+# Args of nested applications of the same op, in left-to-right order
+
+def flatten_chain (op, e_args):
+    args    = []
+    pending = list (reversed (e_args))
+    while len (pending) > 0:
+        e = pending.pop ()
+        if (type (e) == list) and (len (e) > 0) and (e [0] == op):
+            pending.extend (reversed (e [1:]))
+        else:
+            args.append (e)
+    return args
+
+# ----------------------------------------------------------------
+# Make a node from compiled children.
+# A node is a triple (f, is_const, v): closure, and whether it always
+# returns the constant 'v'.
+
+def mk_const (v):
+    return ((lambda env: v), True, v)
+
+def mk_node (kind, e, arg_nodes, this_name, consts):
+    if kind == "leaf":    return mk_leaf (e, this_name, consts)
+    if kind == "bad":     return mk_bad (e)
+    if kind == "quote":   return mk_const (e)
+    if kind == "If":      return mk_if (e, arg_nodes)
+    if kind == "not":     return mk_not (e, arg_nodes)
+    if kind == "&&":      return mk_and (arg_nodes)
+    if kind == "||":      return mk_or (arg_nodes)
+    if kind == "List":    return mk_list (arg_nodes)
+    if kind in assoc_ops: return mk_assoc (kind, arg_nodes)
+    return mk_apply (e [0], arg_nodes)
+
+def mk_leaf (e, this_name, consts):
+    if consts == None:
+        consts = {}
+
+    # Leaves of the template of an indexed fdecl that depend on the index
+    if (type (e) == str) and (type (this_name) == str) and (index_placeholder in this_name):
+        if e == index_placeholder:
+            return ((lambda env: env.index), False, None)
+        if e == "$this":
+            e = "$" + this_name
+        if (index_placeholder in e) and e.startswith ('$'):
+            fname = e [1:]
+            return ((lambda env: env.value (fname.replace (index_placeholder, str (env.index)))), False, None)
+        if index_placeholder in e:
+            return ((lambda env: e.replace (index_placeholder, str (env.index))), False, None)
+
+    # Special variable '$this' (value of current feature)
+    if e == "$this":
+        if this_name in consts:
+            return mk_const (consts [this_name])
+        return ((lambda env: env.value (this_name)), False, None)
+
+    # Special variable '$max_XLEN' (max unsigned integer of width XLEN)
+    if e == "$max_XLEN":
+        if consts.get ("XLEN") in [32, 64]:
+            return mk_const ((1 << consts ["XLEN"]) - 1)
+        return ((lambda env: env.max_XLEN ()), False, None)
+
+    # Special variable '$XLEN_code' (encoding of XLEN in MISA.MXL, MSTATUS.SXL/UXL)
+    if e == "$XLEN_code":
+        if "XLEN" in consts:
+            return mk_const (XLEN_code (consts ["XLEN"]))
+        return ((lambda env: XLEN_code (env.value ("XLEN"))), False, None)
+
+    # Special variable '$writeval' (value attempted to be written, in WARL functions)
+    if e == "$writeval":
+        return ((lambda env: env.writeval ()), False, None)
+
+    # Special variable '$<feature>'
+    if (type (e) == str) and e.startswith ('$'):
+        fname = e [1:]
+        if fname in consts:
+            return mk_const (consts [fname])
+        return ((lambda env: env.value (fname)), False, None)
+
+    if e == "True":  return mk_const (True)
+    if e == "False": return mk_const (False)
+
+    # Constants
+    if (e == None) or (type (e) in [int, str, bool]):
+        return mk_const (e)
+
+    return mk_bad (e)
+
+def mk_bad (e):
+    def f (env):
+        report_error ("ERROR: unknown form of expression\n", e)
+    return (f, False, None)
+
+# The decision tree of nested Ifs 'e' (see 'expr_shape') is evaluated
+# in a loop over a table, whose entries are [cond, then_k, else_k] for an
+# If (then_k, else_k: positions of its branches) and [leaf] otherwise.
+
+def mk_if (e, arg_nodes):
+    table   = []
+    nodes   = iter (arg_nodes)
+    # Stack of (expression, entry and slot to patch with its position)
+    pending = [(e, None, None)]
+    while len (pending) > 0:
+        (e, entry, slot) = pending.pop ()
+        if entry != None:
+            entry [slot] = len (table)
+        if is_if (e):
+            entry = [next (nodes), None, None]
+            pending.extend ([(e [3], entry, 2), (e [2], entry, 1)])
+        else:
+            entry = [next (nodes)]
+        table.append (entry)
+
+    # Fold constant conditions
+    def resolve (k):
+        while (len (table [k]) == 3) and table [k][0][1]:
+            if table [k][0][2] == True:
+                k = table [k][1]
+            else:
+                k = table [k][2]
+        return k
+
+    k_root = resolve (0)
+    if len (table [k_root]) == 1:
+        return table [k_root][0]
+    table = [[entry [0][0]] if len (entry) == 1 else [entry [0][0], resolve (entry [1]), resolve (entry [2])]
+             for entry in table]
+    def f (env):
+        entry = table [k_root]
+        while len (entry) == 3:
+            if entry [0] (env) == True:
+                entry = table [entry [1]]
+            else:
+                entry = table [entry [2]]
+        return entry [0] (env)
+    return (f, False, None)
+
+# A chain of n 'not's of 'e'
+
+def mk_not (e, arg_nodes):
+    n = 0
+    while is_not (e):
+        n = n + 1
+        e = e [1]
+    f0 = arg_nodes [0][0]
+    if n % 2 == 1:
+        f = lambda env: (not f0 (env))
+    else:
+        f = lambda env: (not (not f0 (env)))
+    return fold_if_const (f, arg_nodes)
+
+def mk_and (arg_nodes):
+    if all_const (arg_nodes):
+        result = True
+        for node in arg_nodes:
+            result = node [2]
+            if not result: break
+        return mk_const (result)
+
+    fs = [node [0] for node in arg_nodes]
+    def f (env):
+        result = True
+        for f_arg in fs:
+            result = f_arg (env)
+            if not result: break
+        return result
+    return (f, False, None)
+
+def mk_or (arg_nodes):
+    if all_const (arg_nodes):
+        result = False
+        for node in arg_nodes:
+            result = node [2]
+            if result: break
+        return mk_const (result)
+
+    fs = [node [0] for node in arg_nodes]
+    def f (env):
+        result = False
+        for f_arg in fs:
+            result = f_arg (env)
+            if result: break
+        return result
+    return (f, False, None)
+
+def mk_list (arg_nodes):
+    if all_const (arg_nodes):
+        vs = [node [2] for node in arg_nodes]
+        # A fresh list each time, since callers may hold on to it
+        return ((lambda env: list (vs)), True, vs)
+
+    fs = [node [0] for node in arg_nodes]
+    return ((lambda env: [f_arg (env) for f_arg in fs]), False, None)
+
+def mk_assoc (op, arg_nodes):
+    if len (arg_nodes) == 2:
+        return mk_apply (op, arg_nodes)
+
+    fn = ops [op]
+    fs = [node [0] for node in arg_nodes]
+    def f (env):
+        result = fs [0] (env)
+        for f_arg in fs [1:]:
+            result = fn (result, f_arg (env))
+        return result
+    return fold_if_const (f, arg_nodes)
+
+def mk_apply (op, arg_nodes):
+    # Is_WARL_fn reports its TODO note at higher verbosity, so it takes 'env'
+    if op == "Is_WARL_fn":
+        fs = [node [0] for node in arg_nodes]
+        return ((lambda env: is_WARL_fn (env.verbosity, fs [0] (env), fs [1] (env))), False, None)
+
+    fn = ops.get (op)
+    if fn == None:
+        def f_bad (env):
+            report_error ("ERROR: unknown form of expression\n",
+                          [op] + [f_arg (env) for (f_arg, is_const, v) in arg_nodes])
+        return (f_bad, False, None)
+
+    if len (arg_nodes) == 1:
+        f0 = arg_nodes [0][0]
+        f  = lambda env: fn (f0 (env))
+    elif len (arg_nodes) == 2:
+        f0 = arg_nodes [0][0]
+        f1 = arg_nodes [1][0]
+        f  = lambda env: fn (f0 (env), f1 (env))
+    else:
+        fs = [node [0] for node in arg_nodes]
+        f  = lambda env: fn (* [f_arg (env) for f_arg in fs])
+    return fold_if_const (f, arg_nodes)
+
+def all_const (arg_nodes):
+    for node in arg_nodes:
+        if not node [1]:
+            return False
+    return True
+
+# If all args are constant, evaluate now.
+# If evaluation fails, leave it to be reported when it is run.
+
+def fold_if_const (f, arg_nodes):
+    if all_const (arg_nodes):
+        try:
+            return mk_const (f (None))
+        except Exception:
+            pass
+    return (f, False, None)
+
+# ----------------------------------------------------------------
+# Tracing (verbosity > 1)
+
+def traced (e, f):
+    def f_traced (env):
+        prefix = "    " * env.depth
+        sys.stdout.write (prefix + "==> Eval "); print (e)
+        env.depth = env.depth + 1
+        v = f (env)
+        env.depth = env.depth - 1
+        sys.stdout.write (prefix + "<== Eval "); print (v)
+        return v
+    return f_traced
+
+# ----------------------------------------------------------------
+# Counting (see RIFFL_Metrics); counts are charged to 'env.metrics.current'
+
+def counted (kind, e, f):
+    if (kind == "apply") or (kind == "not") or (kind in assoc_ops):
+        op = e [0]
+        def f_counted (env):
+            rec = env.metrics.current
+            rec.n_eval += 1
+            rec.n_apply [op] = rec.n_apply.get (op, 0) + 1
+            return f (env)
+    else:
+        def f_counted (env):
+            env.metrics.current.n_eval += 1
+            return f (env)
+    return f_counted
+
+# ----------------------------------------------------------------
+
+# Errors in feature lists or decls (references to undeclared features,
+# cyclic references, malformed expressions, ...) raise Check_error.
+#     'msg':  message, as printed by the scripts (ending in a newline)
+#     'expr': the offending expression, if any
+
+class Check_error (Exception):
+    def __init__ (self, msg, expr = None):
+        Exception.__init__ (self, msg.rstrip ("\n"))
+        self.msg  = msg
+        self.expr = expr
+
+    # Pickled with its expression (e.g., from worker processes)
+    def __reduce__ (self):
+        return (Check_error, (self.msg, self.expr))
+
+    def write (self, stream):
+        stream.write (self.msg)
+        if self.expr != None:
+            stream.write ("    {0}\n".format (pformat_expr (self.expr, 4)))
+
+def report_error (msg, e = None):
+    raise Check_error (msg, e)
+
+# 'e' pretty-printed, unless it is nested too deeply to print
+
+def pformat_expr (e, indent_n):
+    try:
+        return pprint.pformat (e, indent = indent_n)
+    except RecursionError:
+        return "<expression nested too deeply to print>"
+
+# ================================================================
+# Helper functions for ops
+
+# ----------------------------------------------------------------
+# is_address_map: xs must be ["Address_map", region, ..., region], with
+# - at least one region
+# - each region a 5-list [name:str, base:int, size:int, addr_type:str, addr_ops:str]
+# - base non-negative and size positive
+# - addr_type is string MEM or IO
+# - addr_ops  is string RO, RW or WO
+# - addr ranges are disjoint
+
+def is_address_map (xs):
+    return (len (address_map_errors (xs)) == 0)
+
+# All problems with address map 'xs': every malformed region, and every
+# pair of overlapping regions.
+# Overlaps are found by sorting regions by base and sweeping, keeping a
+# heap (by end address) of the regions that are still open, so this is
+# O(n log n + number of overlapping pairs) for n regions.
+
+def address_map_errors (xs):
+    if (type (xs) != list) or (len (xs) == 0) or (xs [0] != "Address_map"):
+        return ["not of the form ['Address_map', region, ...]"]
+    regions = xs [1:]
+    if len (regions) == 0:
+        return ["address map has no regions"]
+
+    errors    = []
+    intervals = []
+    for (j, region) in enumerate (regions):
+        region_errors = address_map_region_errors (region)
+        if len (region_errors) > 0:
+            for err in region_errors:
+                errors.append ("region {0}: {1}: {2}".format (j, err, region))
+        else:
+            intervals.append ((region [1], region [1] + region [2], j))
+
+    intervals.sort ()
+    open_regions = []    # heap of (end, j) of regions containing the current base
+    for (base, end, j) in intervals:
+        while (len (open_regions) > 0) and (open_regions [0][0] <= base):
+            heapq.heappop (open_regions)
+        for (end_k, k) in sorted (open_regions, key = lambda x: x [1]):
+            errors.append ("regions {0} and {1} overlap: {2} and {3}".format (k, j, regions [k], regions [j]))
+        heapq.heappush (open_regions, (end, j))
+    return errors
+
+def address_map_region_errors (region):
+    if (type (region) != list) or (len (region) != 5):
+        return ["not a 5-list [name, base, size, MEM/IO, RO/RW/WO]"]
+    (name, base, size, addr_type, addr_ops) = region
+    errors = []
+    if type (name) != str:
+        errors.append ("name is not a string")
+    if (type (base) != int) or (base < 0):
+        errors.append ("base is not a non-negative integer")
+    if (type (size) != int) or (size <= 0):
+        errors.append ("size is not a positive integer")
+    if addr_type not in ["MEM", "IO"]:
+        errors.append ("type is not MEM or IO")
+    if addr_ops not in ["RO", "RW", "WO"]:
+        errors.append ("ops is not RO, RW or WO")
+    return errors
+
+# ----------------------------------------------------------------
+# xs must be a non-empty list of increasing (not necessarily contiguous) integers starting with 0
+
+def are_hartids (xs):
+    if xs == []: return False
+    if xs [0] != 0: return False
+    last_x = xs [0]
+    for x in xs [1:]:
+        if last_x >= x : return False
+        last_x = x
+    return True
+
+# ----------------------------------------------------------------
+
+def XLEN_code (xlen):
+    if xlen == 32:
+        return 1
+    elif xlen == 64:
+        return 2
+    elif xlen == 128:
+        return 3
+    else:
+        return 0
+
+# ----------------------------------------------------------------
+# Checks that y is a legal WARL_fn for field x
+# TODO: this needs to be fleshed out for all the different WARL fields
+
+def is_WARL_fn (verbosity, x, y):
+    if (verbosity > 0):
+        sys.stdout.write ("TODO: check legality of WARL_fn for {0}\n".format (x))
+        s = pprint.pformat (y, indent = 8)
+        for line in s.splitlines ():
+            sys.stdout.write ("        {0}\n".format (line))
+    return True
+
+# ----------------------------------------------------------------
+# x must be a power of 2 (has exactly 1 bit set)
+
+def is_power_of_2 (x):
+    if x == 0: return False
+
+    # Shift out zero lsbs
+    while (x & 0x1 == 0):
+        x = x >> 1
+
+    # Shift out the non-zero lsb (which should be the only non-zero bit)
+    x = x >> 1
+
+    # The remaining bits should be 0
+    return (x == 0)
+
+# ================================================================
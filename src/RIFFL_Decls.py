@@ -9,11 +9,13 @@
 
 # Each feature declaration has the form:
 #
-#   mk_fdecl (<feature identifier>
-#             <text brief description of feature>
-#             <default value ('None', if this feature must be specified)>
-#             <pre-conditions (for this feature to be relevant)>,
-#             <constraint> )
+#   (<feature identifier>
+#    <text brief description of feature>
+#    <default value ('None', if this feature must be specified)>
+#    <pre-conditions (for this feature to be relevant)>,
+#    <constraint> )
+#
+# and is converted to a compact RIFFL_Fdecl.Fdecl once all are declared.
 
 # The constraint restricts the allowed values for a feature.
 # It is a Boolean-valued expression that must evaluate True.
@@ -24,13 +26,13 @@
 # ================================================================
 # Imports of Python libraries
 
-import sys
 import pprint
 
 # ================================================================
 # Imports of project libraries
 
-# --
+import RIFFL_Fdecl   as RF
+import RIFFL_Compile as RCo
 
 # ================================================================
 # RISC-V ISA feature decls
@@ -366,34 +368,10 @@ fdecls.extend ([
 
 # ================================================================
 # Features: Hardware Performance Monitor CSRs
+# (MHPM<n>_exists and MHPMEVENT<n>_WARL_fn, for n in 3..31, are an
+# indexed decl family: see RIFFL_Decls_HPM and RIFFL_Registry)
 
 fdecls.extend ([
-    ("MHPM3_exists",
-     "mhpmcounter3 exists and mhpmevent3 can be written",
-     "False",
-     [],
-     ["Is_bool", "$this"]),
-
-    ("MHPMEVENT3_WARL_fn",
-     "WARL function to transform values written to MHPMEVENT3",
-     None,
-     [ ["==", "$MHPM3_exists", "True"] ],
-     ["Is_WARL_fn", "MHPMEVENT3", "$this"]),
-
-    ("MHPM4_exists",
-     "mhpmcounter4 exists and mhpmevent4 can be written",
-     "False",
-     [],
-     ["Is_bool", "$this"]),
-
-    ("MHPMEVENT4_WARL_fn",
-     "WARL function to transform values written to MHPMEVENT4",
-     None,
-     [ ["==", "$MHPM4_exists", "True"] ],
-     ["Is_WARL_fn", "MHPMEVENT4", "$this"]),
-
-    # ... TODO: and so on for HPMs 5..31
-
     ("MCOUNTEREN_WARL_fn",
      "WARL function to transform values written to MCOUNTEREN",
      ["WARL_fn", 0],
@@ -435,71 +413,6 @@ fdecls.extend ([
      ["Is_int", "$this"])
 ])
 
-# ================================================================
-# Features: SATP WARL functions
-
-fdecls.extend ([
-    ("SATP_MODE_WARL_fn",
-     "WARL function to transform values written to SATP.MODE",
-     None,
-     [ ["==", "$MISA_S", "True"] ],
-     ["Is_WARL_fn", "SATP_MODE", "$this"])
-])
-
-fdecls.extend ([
-    ("SATP_ASID_WARL_fn",
-     "WARL function to transform values written to SATP.ASID",
-     ["WARL_fn", 0],
-     [ ["==", "$MISA_S", "True"] ],
-     ["Is_WARL_fn", "SATP_ASID", "$this"])
-])
-
-fdecls.extend ([
-    ("SATP_PPN_WARL_fn",
-     "WARL function to transform values written to SATP.PPN",
-     None,
-     [ ["==", "$MISA_S", "True"] ],
-     ["Is_WARL_fn", "SATP_PPN", "$this"])
-])
-
-# ================================================================
-# Features: Virtual memory schemes
-
-fdecls.extend ([
-    ("Sv32",
-     "Virtual Memory (address-translation) scheme Sv32 (requires RV32, S)",
-     "True",
-     [ ["==", "$XLEN", 32],
-       ["==", "$MISA_S", "True"] ],
-     ["==", "$this", "True" ]),
-
-    ("Sv39",
-     "Virtual Memory (address-translation) scheme Sv39 (requires RV64, S)",
-     "True",
-     [ ["==", "$XLEN", 64],
-       ["==", "$MISA_S", "True"] ],
-     ["==", "$this", "True" ]),
-
-    ("Sv48",
-     "Virtual Memory (address-translation) scheme Sv48 (requires RV64, S, Sv39)",
-     "False",
-     [ ["==", "$XLEN", 64],
-       ["==", "$Sv39", "True" ] ],
-     ["Is_bool", "$this"]),
-
-    ("PTE_A_trap",
-     "Trap when PTE.A is zero",
-     None,
-     [ ["==", "$MISA_S", "True"] ],
-     ["Is_bool", "$this"]),
-
-    ("PTE_D_trap",
-     "Trap when PTE.D is zero on a store access",
-     None,
-     [ ["==", "$MISA_S", "True"] ],
-     ["Is_bool", "$this"])
-])
-
 # ================================================================
 # Features: misc. implementation choices
 
@@ -529,11 +442,15 @@ fdecls.extend ([
      [],
      ["Is_int", "$this"]),
 
+    # (PMPCFG<n> and PMPADDR<n>, for n < Num_PMP_registers, are an
+    # indexed decl family: see RIFFL_Decls_PMP and RIFFL_Registry)
     ("Num_PMP_registers",
      "Number of Physical Memory Protection Registers implemented",
      0,
      [],
-     ["Is_int", "$this"]),
+     ["&&", ["Is_int", "$this"],
+            ["<=", 0, "$this"],
+            ["<=", "$this", 64]]),
 
     ("CYCLE_defined",
      "CYCLE CSR is defined (else causes Machine-mode trap; can be emulated)",
@@ -573,3 +490,41 @@ fdecls.extend ([
 ])
 
 # ================================================================
+# Widths (in bits) of CSR fields governed by WARL functions, keyed by
+# field name (the WARL_fn feature name without its '_WARL_fn' suffix).
+# Each width is an expression, since some widths depend on XLEN.
+# Fields not listed here (e.g., MEPC, MIP, MEDELEG) are XLEN bits wide.
+
+WARL_field_widths = {
+    "MISA_MXL":    2,
+    "MSTATUS_SXL": 2,
+    "MSTATUS_UXL": 2,
+    "MTVEC_MODE":  2,
+    "STVEC_MODE":  2,
+    "UTVEC_MODE":  2,
+    "SATP_MODE":   ["If", ["==", "$XLEN", 32], 1, 4],
+    "SATP_ASID":   ["If", ["==", "$XLEN", 32], 9, 16],
+    "MCOUNTEREN":  32,
+    "SCOUNTEREN":  32
+}
+
+# ================================================================
+# Index of fdecls by feature name (keep this at the end of the file,
+# after all 'fdecls.extend' calls).
+# Built once at load time; duplicate feature names raise RCo.Check_error.
+
+def mk_fdecl_index (fdecls):
+    index = {}
+    for fdecl in fdecls:
+        name = fdecl [0]
+        if name in index:
+            raise RCo.Check_error ("INTERNAL ERROR: more than one feature decl with this name: {0}\n".format (name) +
+                                   "    {0}\n".format (pprint.pformat (index [name])) +
+                                   "    {0}\n".format (pprint.pformat (fdecl)))
+        index [name] = fdecl
+    return index
+
+fdecls      = RF.mk_fdecls (fdecls)
+fdecl_index = mk_fdecl_index (fdecls)
+
+# ================================================================
@@ -0,0 +1,30 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# RISC-V feature declarations: Hardware Performance Monitor counters
+# mhpmcounter3..31 and their event selectors mhpmevent3..31.
+
+# An indexed decl family (see RIFFL_Registry): each template below
+# declares one feature per n in 3..31, with "{n}" replaced by n (see
+# RIFFL_Compile.instantiate_fdecl).  Only the n's that a feature list
+# needs are expanded.
+
+# ================================================================
+
+fdecls = [
+    ("MHPM{n}_exists",
+     "mhpmcounter{n} exists and mhpmevent{n} can be written",
+     "False",
+     [],
+     ["Is_bool", "$this"]),
+
+    ("MHPMEVENT{n}_WARL_fn",
+     "WARL function to transform values written to MHPMEVENT{n}",
+     None,
+     [ ["==", "$MHPM{n}_exists", "True"] ],
+     ["Is_WARL_fn", "MHPMEVENT{n}", "$this"])
+]
+
+# ================================================================
@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# RISC-V feature declarations: Physical Memory Protection entries.
+
+# An indexed decl family (see RIFFL_Registry): each template below
+# declares one feature per PMP entry n in 0..63, with "{n}" replaced by
+# n (see RIFFL_Compile.instantiate_fdecl).  Only entries
+# 0..Num_PMP_registers-1 (and any others a feature list mentions) are
+# expanded.
+
+# ================================================================
+
+fdecls = [
+    ("PMPCFG{n}",
+     "Value of pmp{n}cfg (PMP entry {n} configuration: L, A, X, W, R) on reset",
+     0,
+     [ ["<", "{n}", "$Num_PMP_registers"] ],
+     ["&&", ["Is_int", "$this"],
+            ["<=", 0, "$this"],
+            ["<", "$this", 0x100],
+            ["==", ["&", "$this", 0x60], 0],      # bits 6:5 are reserved
+            ["!=", ["&", "$this", 0x3], 0x2]]),   # W=1, R=0 is reserved
+
+    ("PMPADDR{n}",
+     "Value of pmpaddr{n} (PMP entry {n} address, bits 33:2 (RV32) or 55:2 (RV64)) on reset",
+     0,
+     [ ["<", "{n}", "$Num_PMP_registers"] ],
+     ["&&", ["Is_int", "$this"],
+            ["<=", 0, "$this"],
+            ["<=", "$this", ["If", ["==", "$XLEN", 32], 0xFFFFFFFF, 0x3FFFFFFFFFFFFF]]])
+]
+
+# ================================================================
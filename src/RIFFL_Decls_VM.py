@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# RISC-V feature declarations: virtual memory (SATP, Sv32/39/48, PTEs).
+# A decl family (see RIFFL_Registry), loaded only for feature lists
+# with the 'S' extension or XLEN 64, or that mention one of these
+# features.
+# Same form as the decls in RIFFL_Decls.
+
+# ================================================================
+
+fdecls = []
+
+# ================================================================
+# Features: SATP WARL functions
+
+fdecls.extend ([
+    ("SATP_MODE_WARL_fn",
+     "WARL function to transform values written to SATP.MODE",
+     None,
+     [ ["==", "$MISA_S", "True"] ],
+     ["Is_WARL_fn", "SATP_MODE", "$this"])
+])
+
+fdecls.extend ([
+    ("SATP_ASID_WARL_fn",
+     "WARL function to transform values written to SATP.ASID",
+     ["WARL_fn", 0],
+     [ ["==", "$MISA_S", "True"] ],
+     ["Is_WARL_fn", "SATP_ASID", "$this"])
+])
+
+fdecls.extend ([
+    ("SATP_PPN_WARL_fn",
+     "WARL function to transform values written to SATP.PPN",
+     None,
+     [ ["==", "$MISA_S", "True"] ],
+     ["Is_WARL_fn", "SATP_PPN", "$this"])
+])
+
+# ================================================================
+# Features: Virtual memory schemes
+
+fdecls.extend ([
+    ("Sv32",
+     "Virtual Memory (address-translation) scheme Sv32 (requires RV32, S)",
+     "True",
+     [ ["==", "$XLEN", 32],
+       ["==", "$MISA_S", "True"] ],
+     ["==", "$this", "True" ]),
+
+    ("Sv39",
+     "Virtual Memory (address-translation) scheme Sv39 (requires RV64, S)",
+     "True",
+     [ ["==", "$XLEN", 64],
+       ["==", "$MISA_S", "True"] ],
+     ["==", "$this", "True" ]),
+
+    ("Sv48",
+     "Virtual Memory (address-translation) scheme Sv48 (requires RV64, S, Sv39)",
+     "False",
+     [ ["==", "$XLEN", 64],
+       ["==", "$Sv39", "True" ] ],
+     ["Is_bool", "$this"]),
+
+    ("PTE_A_trap",
+     "Trap when PTE.A is zero",
+     None,
+     [ ["==", "$MISA_S", "True"] ],
+     ["Is_bool", "$this"]),
+
+    ("PTE_D_trap",
+     "Trap when PTE.D is zero on a store access",
+     None,
+     [ ["==", "$MISA_S", "True"] ],
+     ["Is_bool", "$this"])
+])
+
+# ================================================================
@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Dependencies between features, derived from the '$FOO' references
+# in fdecls' defaults, preconditions and constraints, and in the values
+# given in a feature list.
+
+# ================================================================
+# Imports of Python libraries
+
+import collections
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Fdecl as RF
+
+# ================================================================
+# Names of features referenced by expression 'e'
+#     'this_name': the feature that "$this" refers to
+
+# The bodies of 'WARL_fn' and 'Address_map' are not evaluated by the
+# checker, so references inside them (e.g., "$writeval") are not
+# dependencies.
+
+def expr_refs (e, this_name):
+    refs  = set ()
+    stack = [e]
+    while len (stack) > 0:
+        e = stack.pop ()
+        if type (e) == str:
+            if e == "$this":
+                refs.add (this_name)
+            elif (e == "$max_XLEN") or (e == "$XLEN_code"):
+                refs.add ("XLEN")
+            elif e == "$writeval":
+                pass
+            elif e.startswith ('$'):
+                refs.add (e [1:])
+        elif (type (e) == list) and (len (e) > 0):
+            if (e [0] == "WARL_fn") or (e [0] == "Address_map"):
+                continue
+            stack.extend (e [1:])
+    return refs
+
+# Features referenced by the preconditions and constraint of 'fdecl'.
+# Checking an fdecl also depends on its own value.
+
+def fdecl_check_refs (fdecl):
+    fname = fdecl [0]
+    refs  = set ([fname])
+    for precond in fdecl [3]:
+        refs.update (expr_refs (precond, fname))
+    refs.update (expr_refs (fdecl [4], fname))
+    return refs
+
+# Features referenced anywhere in 'fdecl' (default, preconditions, constraint)
+
+def fdecl_refs (fdecl):
+    refs = fdecl_check_refs (fdecl)
+    refs.update (expr_refs (fdecl [2], fdecl [0]))
+    return refs
+
+# As 'fdecl_refs', as a frozenset, computed once per fdecl (decls do not
+# change), until the fdecl goes away (see RIFFL_Fdecl.Fdecl_memo).
+
+fdecl_refs_memo = RF.Fdecl_memo ()
+
+def fdecl_refs_memoized (fdecl):
+    refs = fdecl_refs_memo.get (fdecl)
+    if refs != None:
+        return refs
+    refs = frozenset (fdecl_refs (fdecl))
+    fdecl_refs_memo.set (fdecl, refs)
+    return refs
+
+# ================================================================
+# Dependency graph for one feature list
+
+#     'fdecl_index': feature decls, indexed by name
+#     'fval_index':  feature values (unevaluated expressions), indexed by name
+
+# For each feature X:
+#     value_users [X]: features whose value expression refers to X
+#     check_users [X]: fdecls whose preconditions or constraint refer to X
+
+class Dep_graph:
+    def __init__ (self, fdecl_index, fval_index):
+        self.fdecl_index = fdecl_index
+        self.value_refs  = {}
+        self.value_users = collections.defaultdict (set)
+        self.check_users = collections.defaultdict (set)
+
+        for (fname, fdecl) in fdecl_index.items ():
+            for ref in fdecl_check_refs (fdecl):
+                self.check_users [ref].add (fname)
+            self.set_value_expr (fname, fval_index.get (fname))
+
+    # Record the value expression of feature 'fname' (None: its default)
+    def set_value_expr (self, fname, v_expr):
+        if v_expr == None:
+            v_expr = self.fdecl_index [fname][2]
+        for ref in self.value_refs.get (fname, set ()):
+            self.value_users [ref].discard (fname)
+        refs = expr_refs (v_expr, fname)
+        refs.discard (fname)
+        self.value_refs [fname] = refs
+        for ref in refs:
+            self.value_users [ref].add (fname)
+
+    # A copy whose value expressions can be changed independently
+    # (the check dependencies, which never change, are shared)
+    def copy (self):
+        g = Dep_graph.__new__ (Dep_graph)
+        g.fdecl_index = self.fdecl_index
+        g.check_users = self.check_users
+        g.value_refs  = dict (self.value_refs)
+        g.value_users = collections.defaultdict (set)
+        for (x, users) in self.value_users.items ():
+            g.value_users [x] = set (users)
+        return g
+
+    # Features whose values may change when the value of 'fname' changes,
+    # and fdecls that must then be rechecked
+    def affected (self, fname):
+        values  = set ([fname])
+        pending = [fname]
+        while len (pending) > 0:
+            x = pending.pop ()
+            for y in self.value_users.get (x, ()):
+                if y not in values:
+                    values.add (y)
+                    pending.append (y)
+
+        checks = set ()
+        for x in values:
+            checks.update (self.check_users.get (x, ()))
+        return (values, checks)
+
+# ================================================================
+# Partition 'fdecls' into connected components of the reference graph:
+# fdecls are connected if one refers to the other (in its default,
+# preconditions or constraint, or in its value given in 'fval_index'),
+# or both refer to the same feature.  Checking an fdecl evaluates only
+# features in its component.
+# Returns a list of components, each a list of positions in 'fdecls'
+# (in order), ordered by their first position.
+
+def fdecl_components (fdecls, fval_index):
+    # Union-find over feature names
+    parent = {}
+
+    def find (x):
+        root = x
+        while parent.setdefault (root, root) != root:
+            root = parent [root]
+        while x != root:
+            next_x = parent [x]
+            parent [x] = root
+            x = next_x
+        return root
+
+    for fdecl in fdecls:
+        fname  = fdecl [0]
+        refs   = fdecl_refs_memoized (fdecl)
+        v_expr = fval_index.get (fname)
+        if v_expr != None:
+            refs = refs.union (expr_refs (v_expr, fname))
+        root = find (fname)
+        for ref in refs:
+            root_ref = find (ref)
+            if root_ref != root:
+                parent [root_ref] = root
+
+    components = collections.OrderedDict ()
+    for (j, fdecl) in enumerate (fdecls):
+        components.setdefault (find (fdecl [0]), []).append (j)
+    return list (components.values ())
+
+# ================================================================
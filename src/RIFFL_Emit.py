@@ -0,0 +1,344 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+
+usage_line = \
+"Usage:    CMD    <feature_list.yaml>  <optional_verbosity>\n"
+
+help_lines = \
+"  Checks a YAML feature-list (like RIFFL_Check) and, if consistent, writes\n" \
+"  the checked feature list for foo.yaml as\n" \
+"    - a C header foo_config.h, and\n" \
+"    - a Python module foo_config.py\n" \
+"  with typed values (no YAML parsing needed to use them):\n" \
+"    - bools, ints and strings become #defines / Python constants,\n" \
+"    - lists of ints (e.g., Hartids) and address maps become static tables / tuples,\n" \
+"    - WARL functions become functions of the write value.\n"
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import os
+import yaml
+import keyword
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Check   as RC
+import RIFFL_Compile as RCo
+import RIFFL_Deps    as RDp
+import RIFFL_WARL    as RW
+import RIFFL_YAML    as RY
+import RIFFL_Analyze as RA
+import RIFFL_Registry as RR
+import RIFFL_Harts   as RH
+
+# ================================================================
+
+def main (argv = None):
+    sys.stdout.write ("Use --help or -h for help\n")
+
+    if ((len (argv) == 1) or
+        (argv [1] == "--help") or (argv [1] == "-h") or
+        ((len (argv) != 2) and (len (argv) != 3))):
+
+        sys.stdout.write (usage_line.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        sys.stdout.write (help_lines.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        return 0
+
+    verbosity = 0
+    if (len (argv) == 3):
+        verbosity = int (argv [2])
+
+    input_filename = argv [1]
+    try:
+        feature_dict = RY.load_feature_list (input_filename)
+    except yaml.YAMLError as exc:
+        sys.stdout.write ("ERROR: unable to open YAML input file: {0}\n".format (input_filename))
+        sys.stdout.write ("    Exception: "); print (exc)
+        return 1
+
+    try:
+        RC.check_is_feature_list (input_filename, feature_dict)
+        # One config is written per feature list, so per-hart overrides cannot be expressed
+        if RH.hart_overrides_fname in feature_dict:
+            raise RCo.Check_error ("ERROR: {0} is not supported: emit each hart's feature list separately\n".
+                                   format (RH.hart_overrides_fname))
+        (fdecls, fdecl_index) = RR.decls_for (feature_dict)
+        (known_features, unknown_features) = RC.split_known_and_unknown (fdecl_index, feature_dict)
+        RA.check_decls ()
+        (all_pass, known_features_out) = RC.check_all_constraints (verbosity, fdecls, known_features, fdecl_index)
+    except RCo.Check_error as exc:
+        exc.write (sys.stderr)
+        return 1
+    if not all_pass:
+        sys.stdout.write ("---------------- Some constraints failed: nothing written\n")
+        return 1
+    features = known_features_out + unknown_features
+
+    (filename, ext) = os.path.splitext (input_filename)
+    base = os.path.basename (filename) + "_config"
+
+    C_filename = filename + "_config.h"
+    sys.stdout.write ("---------------- Writing C header '{0}'\n".format (C_filename))
+    with open (C_filename, 'w') as stream:
+        write_C_header (stream, features, base, input_filename)
+
+    py_filename = filename + "_config.py"
+    sys.stdout.write ("---------------- Writing Python module '{0}'\n".format (py_filename))
+    with open (py_filename, 'w') as stream:
+        write_Python_module (stream, features, input_filename)
+    return 0
+
+# ================================================================
+# WARL functions, specialized to a feature list.
+
+# All sub-expressions of a WARL function body that do not mention
+# "$writeval" are evaluated (with RIFFL_WARL), leaving an expression
+# tree whose leaves are "$writeval" and constants:
+#     ["const", v] | "$writeval" | [op, arg, ...]
+# Returns None if the body cannot be specialized this way (e.g., an
+# op with "$writeval" arguments that has no C/Python counterpart).
+
+WARL_unary_ops  = ["~", "neg", "not"]
+WARL_binary_ops = ["&", "|", "^", "+", "-", "==", "!=", "<", "<=", ">", ">=", "&&", "||"]
+
+def specialize_WARL_body (fname, body, features):
+    env = RW.WARL_env (features)
+
+    def spec (e):
+        if not RW.mentions_writeval (e):
+            # Features that were not relevant have no value in 'features'
+            if not RDp.expr_refs (e, fname).issubset (features.keys ()):
+                return None
+            v = RCo.compile_expr (e, fname, None, features) (env)
+            if (type (v) != int) and (type (v) != bool):
+                return None
+            return ["const", v]
+        if e == "$writeval":
+            return e
+        if type (e) != list:
+            return None
+        op   = e [0]
+        args = [spec (arg) for arg in e [1:]]
+        if None in args:
+            return None
+        if (op == "If") and (len (args) == 3):
+            return [op] + args
+        if (op in WARL_unary_ops) and (len (args) == 1):
+            return [op] + args
+        if (op in WARL_binary_ops) and (len (args) >= 2):
+            # Left-associate chains, e.g., ["&", a, b, c]
+            x = args [0]
+            for y in args [1:]:
+                x = [op, x, y]
+            return x
+        return None
+
+    return spec (body)
+
+# WARL functions in 'features': list of (fname, specialized body or None)
+
+def WARL_fn_bodies (features):
+    feature_dict = dict (features)
+    bodies = []
+    for (fname, fval) in features:
+        if RW.is_WARL_fn_value (fval):
+            bodies.append ((fname, specialize_WARL_body (fname, fval [1], feature_dict)))
+    return bodies
+
+# ----------------------------------------------------------------
+# Address maps: ["Address_map", [name, base, size, "MEM"/"IO", "RO"/"RW"/"WO"], ...]
+
+def is_address_map_value (fval):
+    return (type (fval) == list) and (len (fval) > 0) and (fval [0] == "Address_map")
+
+def is_int_list_value (fval):
+    return (type (fval) == list) and all ([type (x) == int for x in fval])
+
+# ================================================================
+# C header
+
+C_access_codes = {"RO": 1, "WO": 2, "RW": 3}
+
+def write_C_header (stream, features, base, input_filename):
+    guard = "RIFFL_" + C_name (base).upper () + "_H"
+    stream.write ("// Generated by RIFFL_Emit.py from '{0}'; do not edit.\n\n".format (input_filename))
+    stream.write ("#ifndef {0}\n#define {0}\n\n".format (guard))
+    stream.write ("#include <stdint.h>\n\n")
+
+    stream.write ("// ---------------- Scalar features\n\n")
+    for (fname, fval) in features:
+        name = "RIFFL_" + C_name (fname)
+        if type (fval) == bool:
+            stream.write ("#define {0}  {1}\n".format (name, int (fval)))
+        elif type (fval) == int:
+            stream.write ("#define {0}  {1}\n".format (name, C_int_literal (fval)))
+        elif type (fval) == str:
+            stream.write ("#define {0}  {1}\n".format (name, C_string_literal (fval)))
+        elif fval == None:
+            stream.write ("// {0}: none\n".format (name))
+
+    stream.write ("\n// ---------------- Tables\n\n")
+    stream.write ("typedef struct {\n"
+                  "    const char *name;\n"
+                  "    uint64_t    base;\n"
+                  "    uint64_t    size;\n"
+                  "    int         is_mem;    // 1: MEM, 0: IO\n"
+                  "    int         access;    // 1: RO, 2: WO, 3: RW\n"
+                  "} RIFFL_Region;\n\n")
+    for (fname, fval) in features:
+        name = "RIFFL_" + C_name (fname)
+        if RW.is_WARL_fn_value (fval):
+            continue
+        elif is_address_map_value (fval):
+            regions = fval [1:]
+            stream.write ("#define {0}_N  {1}\n".format (name, len (regions)))
+            stream.write ("static const RIFFL_Region {0} [] = {{\n".format (name))
+            for [rname, rbase, rsize, rkind, raccess] in regions:
+                stream.write ("    {{{0}, {1}, {2}, {3}, {4}}},\n".format (C_string_literal (rname),
+                                                                          C_int_literal (rbase),
+                                                                          C_int_literal (rsize),
+                                                                          int (rkind == "MEM"),
+                                                                          C_access_codes.get (raccess, 0)))
+            stream.write ("};\n\n")
+        elif is_int_list_value (fval):
+            stream.write ("#define {0}_N  {1}\n".format (name, len (fval)))
+            stream.write ("static const uint64_t {0} [] = {{{1}}};\n\n".format (
+                name, ", ".join ([C_int_literal (x) for x in fval])))
+        elif type (fval) == list:
+            stream.write ("// {0}: not representable in C: {1}\n\n".format (name, C_comment (repr (fval))))
+
+    stream.write ("// ---------------- WARL functions (arithmetic is on uint64_t)\n\n")
+    for (fname, body) in WARL_fn_bodies (features):
+        fn_name = "riffl_" + C_name (fname)
+        if body == None:
+            stream.write ("// {0}: not representable in C\n\n".format (fn_name))
+            continue
+        stream.write ("static inline uint64_t {0} (uint64_t writeval)\n".format (fn_name))
+        stream.write ("{\n")
+        stream.write ("    (void) writeval;\n")
+        stream.write ("    return {0};\n".format (C_expr (body)))
+        stream.write ("}\n\n")
+
+    stream.write ("#endif  // {0}\n".format (guard))
+
+def C_expr (e):
+    if e == "$writeval":
+        return "writeval"
+    op = e [0]
+    if op == "const":
+        return C_int_literal (int (e [1]))
+    elif op == "If":
+        return "({0} ? {1} : {2})".format (C_expr (e [1]), C_expr (e [2]), C_expr (e [3]))
+    elif op == "~":
+        return "(~ {0})".format (C_expr (e [1]))
+    elif op == "neg":
+        return "(0 - {0})".format (C_expr (e [1]))
+    elif op == "not":
+        return "(! {0})".format (C_expr (e [1]))
+    else:
+        return "({0} {1} {2})".format (C_expr (e [1]), op, C_expr (e [2]))
+
+def C_name (s):
+    return "".join ([c if (c.isalnum () or c == '_') else '_' for c in s])
+
+def C_int_literal (n):
+    if (n >= 0) and (n < (1 << 31)):
+        return str (n)
+    elif n >= 0:
+        return "0x{0:X}ULL".format (n)
+    else:
+        return "({0}LL)".format (n)
+
+def C_string_literal (s):
+    s = s.replace ('\\', '\\\\').replace ('"', '\\"').replace ('\n', '\\n')
+    return '"' + s + '"'
+
+def C_comment (s):
+    return s.replace ("\n", " ").replace ("*/", "* /")
+
+# ================================================================
+# Python module
+# Feature values are bound to Python names identical to the feature
+# names: bools, ints, strings and None as-is, lists as (nested) tuples,
+# address maps as a tuple of Region tuples, and WARL functions as
+# functions of the write value (None if not representable).
+
+def write_Python_module (stream, features, input_filename):
+    stream.write ("# Generated by RIFFL_Emit.py from '{0}'; do not edit.\n\n".format (input_filename))
+    stream.write ("import collections\n\n")
+    stream.write ("Region = collections.namedtuple ('Region', ['name', 'base', 'size', 'kind', 'access'])\n\n")
+
+    stream.write ("# ---------------- Feature values\n\n")
+    for (fname, fval) in features:
+        if RW.is_WARL_fn_value (fval) or (not is_Python_name (fname)):
+            continue
+        if is_address_map_value (fval):
+            stream.write ("{0} = (\n".format (fname))
+            for region in fval [1:]:
+                stream.write ("    Region {0},\n".format (repr (tuple (region))))
+            stream.write (")\n")
+        else:
+            stream.write ("{0} = {1}\n".format (fname, repr (Python_value (fval))))
+
+    stream.write ("\n# ---------------- WARL functions\n\n")
+    for (fname, body) in WARL_fn_bodies (features):
+        if not is_Python_name (fname):
+            continue
+        if body == None:
+            stream.write ("{0} = None    # not representable\n\n".format (fname))
+            continue
+        stream.write ("def {0} (writeval):\n".format (fname))
+        stream.write ("    return {0}\n\n".format (Python_expr (body)))
+
+    # All features, including any whose names are not Python identifiers
+    stream.write ("features = {\n")
+    for (fname, fval) in features:
+        if is_Python_name (fname):
+            stream.write ("    {0}: {1},\n".format (repr (fname), fname))
+        elif not RW.is_WARL_fn_value (fval):
+            stream.write ("    {0}: {1},\n".format (repr (fname), repr (Python_value (fval))))
+    stream.write ("}\n")
+
+def is_Python_name (s):
+    return s.isidentifier () and (not keyword.iskeyword (s))
+
+def Python_value (v):
+    if type (v) == list:
+        return tuple ([Python_value (x) for x in v])
+    return v
+
+Python_op_names = {"&&": "and", "||": "or"}
+
+def Python_expr (e):
+    if e == "$writeval":
+        return "writeval"
+    op = e [0]
+    if op == "const":
+        return repr (e [1])
+    elif op == "If":
+        return "({1} if {0} else {2})".format (Python_expr (e [1]), Python_expr (e [2]), Python_expr (e [3]))
+    elif op == "~":
+        return "(~ {0})".format (Python_expr (e [1]))
+    elif op == "neg":
+        return "(- {0})".format (Python_expr (e [1]))
+    elif op == "not":
+        return "(not {0})".format (Python_expr (e [1]))
+    else:
+        return "({0} {1} {2})".format (Python_expr (e [1]), Python_op_names.get (op, op), Python_expr (e [2]))
+
+# ****************************************************************
+# ****************************************************************
+# ****************************************************************
+
+# For non-interactive invocations, call main() and use its return value
+# as the exit code.
+if __name__ == '__main__':
+  sys.exit (main (sys.argv))
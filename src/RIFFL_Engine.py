@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Embeddable checker.
+
+# An 'Engine' holds a set of feature decls, compiled once, and checks
+# any number of feature lists against them in-process, returning a
+# structured 'Check_result':
+
+#     engine = RIFFL_Engine.Engine ()
+#     result = engine.check ({"XLEN": 32, "MISA_I": True, ...})
+#     if not result.all_pass:
+#         for d in result.diagnostics: ...
+
+# By default the decls are RD.fdecls plus the decl families each feature
+# list needs (see RIFFL_Registry); a family is compiled the first time
+# it is needed.
+
+# A feature list's 'Hart_overrides' section is checked as in
+# RIFFL_Check (see RIFFL_Harts), in this process.
+
+# Nothing is printed.  Errors in the feature decls (see RIFFL_Analyze)
+# or in a feature list (references to undeclared features, cycles,
+# malformed expressions, unreadable YAML, ...) raise
+# RIFFL_Compile.Check_error.
+
+# ================================================================
+# Imports of Python libraries
+
+import io
+import collections.abc
+import yaml
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Check   as RC
+import RIFFL_Compile as RCo
+import RIFFL_YAML    as RY
+import RIFFL_Analyze as RA
+import RIFFL_Registry as RR
+import RIFFL_Harts   as RH
+
+# ================================================================
+
+class Engine:
+    #     'fdecls': feature decls (default: None, i.e., from the registry)
+    def __init__ (self, fdecls = None):
+        if fdecls == None:
+            RA.check_decls ()
+            fdecl_index = None
+            for fdecl in RR.decls_of_families ([]) [0]:
+                RCo.compile_fdecl (fdecl)
+        else:
+            fdecl_index = {}
+            for fdecl in fdecls:
+                fname = RC.fdecl_name (fdecl)
+                if fname in fdecl_index:
+                    raise RCo.Check_error ("ERROR: more than one feature decl with this name: {0}\n".format (fname))
+                fdecl_index [fname] = fdecl
+            errors = RA.analyze_fdecls (fdecls, fdecl_index).errors
+            if len (errors) > 0:
+                raise RCo.Check_error ("ERROR: errors in feature decls:\n" +
+                                       "".join (["    {0}\n".format (msg) for msg in errors]))
+            for fdecl in fdecls:
+                RCo.compile_fdecl (fdecl)
+        self.fdecls      = fdecls
+        self.fdecl_index = fdecl_index
+
+    # Check a feature list: a dict (or other mapping, e.g., a layered
+    # feature list), or a list of (name, value) pairs.
+    #     'metrics': optional RIFFL_Metrics.Metrics, to collect per-fdecl metrics
+    def check (self, features, metrics = None):
+        hart_overrides = []
+        if isinstance (features, collections.abc.Mapping):
+            (features, hart_overrides) = RH.split_hart_overrides (features)
+            features = list (features.items ())
+        elif RH.hart_overrides_fname in [fname for (fname, fval) in features]:
+            hart_overrides = RH.split_hart_overrides (dict (features)) [1]
+            features = [(fname, fval) for (fname, fval) in features if fname != RH.hart_overrides_fname]
+        if self.fdecls == None:
+            decls = None
+            (fdecls, fdecl_index) = RR.decls_for (dict (features))
+        else:
+            decls = (self.fdecls, self.fdecl_index)
+            (fdecls, fdecl_index) = decls
+        known   = []
+        unknown = []
+        for (fname, fval) in features:
+            if RC.select_fdecl (fdecl_index, fname) == None:
+                unknown.append ((fname, fval))
+            else:
+                known.append ((fname, fval))
+
+        try:
+            state = RC.Check_state (0, fdecls, known, fdecl_index, metrics, quiet = True)
+        except (TypeError, ValueError, KeyError, IndexError, ZeroDivisionError) as exc:
+            # Ops applied to values of the wrong type, etc.
+            raise RCo.Check_error ("ERROR: evaluating feature list: {0}\n".format (exc)) from exc
+
+        hart_results = []
+        if len (hart_overrides) > 0:
+            checker = RH.Hart_checker (0, dict (features), state, decls)
+            hart_results = RH.check_harts (checker, hart_overrides)
+        return Check_result (state, known, unknown, hart_results)
+
+    # Check the feature list in YAML file 'filename'
+    def check_file (self, filename, metrics = None):
+        try:
+            feature_dict = RY.load_feature_list (filename)
+        except yaml.YAMLError as exc:
+            raise RCo.Check_error ("ERROR: unable to open YAML input file: {0}\n".format (filename)) from exc
+        if not isinstance (feature_dict, collections.abc.Mapping):
+            raise RCo.Check_error ("ERROR: YAML input file is not a feature list: {0}\n".format (filename))
+        return self.check (feature_dict, metrics)
+
+# ================================================================
+# Result of checking one feature list
+#     'all_pass':    all constraints met
+#     'features':    resolved known features (given values and defaults),
+#                    list of (name, value) in fdecl order
+#     'given':       the subset of 'features' given in the input
+#     'defaults':    the subset of 'features' that took default values
+#     'unknown':     features in the input with no decl, as given
+#     'failing':     names of fdecls whose constraint failed, in fdecl order
+#     'diagnostics': RIFFL_Check.Diagnostic's, in fdecl order
+#     'n_checked':   number of fdecls checked
+#     'harts':       RIFFL_Harts.Hart_result's of the harts with overrides
+#                    (see RIFFL_Harts), in order of hartid; 'all_pass'
+#                    requires all of them to pass too
+#     'state':       the RIFFL_Check.Check_state of the base (e.g., for 'recheck_feature')
+
+class Check_result:
+    def __init__ (self, state, known_features, unknown_features, hart_results = []):
+        self.state       = state
+        self.all_pass    = state.all_pass () and all ([result.all_pass for result in hart_results])
+        self.features    = state.features_out ()
+        (self.given, self.defaults) = RC.split_given_and_defaults (known_features, self.features)
+        self.unknown     = unknown_features
+        self.failing     = state.failing_names ()
+        self.diagnostics = state.diagnostics_list ()
+        self.n_checked   = state.n_checked ()
+        self.harts       = hart_results
+
+    # JSON-compatible dict (features as objects, in order)
+    def to_json (self):
+        return {"all_pass":    self.all_pass,
+                "n_checked":   self.n_checked,
+                "features":    dict (self.features),
+                "defaults":    [fname for (fname, fval) in self.defaults],
+                "unknown":     dict (self.unknown),
+                "failing":     self.failing,
+                "diagnostics": [diagnostic._asdict () for diagnostic in self.diagnostics],
+                "harts":       [hart_result_json (result) for result in self.harts]}
+
+    # Diagnostics as text, as RIFFL_Check.py prints them
+    def diagnostics_text (self):
+        stream = io.StringIO ()
+        for diagnostic in self.diagnostics:
+            RC.print_diagnostic (stream, diagnostic)
+        if len (self.harts) > 0:
+            RH.print_hart_results (stream, self.harts)
+        return stream.getvalue ()
+
+def hart_result_json (result):
+    d = result._asdict ()
+    d ["diagnostics"] = [diagnostic._asdict () for diagnostic in result.diagnostics]
+    return d
+
+# ================================================================
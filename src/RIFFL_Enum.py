@@ -0,0 +1,244 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+
+usage_line = \
+"Usage:    CMD    <base_feature_list.yaml or ->  <feature> ...\n"
+
+help_lines = \
+"  Enumerates all valid configurations of the given features (e.g., XLEN MISA_S\n" \
+"  MISA_U Sv39 Sv48 PTE_A_trap PTE_D_trap), with all other features taken from\n" \
+"  the base feature list ('-': none) or their defaults.\n" \
+"  A configuration is valid if all constraints are met; each of the given\n" \
+"  features is in it if and only if it is relevant.\n" \
+"  Prints each valid configuration as one line of JSON (omitted features are\n" \
+"  absent), followed by a count.\n" \
+"  The values tried for each feature come from its constraint: Is_bool,\n" \
+"  ['In', '$this', ['List', ...]] or ['==', '$this', x].\n"
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import json
+import yaml
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Decls   as RD
+import RIFFL_Compile as RCo
+import RIFFL_Deps    as RDp
+import RIFFL_Check   as RC
+import RIFFL_YAML    as RY
+import RIFFL_Analyze as RA
+import RIFFL_Registry as RR
+import RIFFL_Harts   as RH
+
+# ================================================================
+
+def main (argv = None):
+    if ((len (argv) < 3) or
+        (argv [1] == "--help") or (argv [1] == "-h")):
+
+        sys.stdout.write (usage_line.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        sys.stdout.write (help_lines.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        return 0
+
+    base = {}
+    if argv [1] != "-":
+        try:
+            base = RY.load_feature_list (argv [1])
+        except yaml.YAMLError as exc:
+            sys.stdout.write ("ERROR: unable to open YAML input file: {0}\n".format (argv [1]))
+            sys.stdout.write ("    Exception: "); print (exc)
+            return 1
+
+    n_configs = 0
+    try:
+        RA.check_decls ()
+        for config in enumerate_configs (argv [2:], base):
+            sys.stdout.write (json.dumps (config) + "\n")
+            n_configs += 1
+    except RCo.Check_error as exc:
+        exc.write (sys.stderr)
+        return 1
+    sys.stdout.write ("Num valid configurations: {0}\n".format (n_configs))
+    return 0
+
+# ================================================================
+# Generate all valid configurations of features 'chosen'.
+#     'base':    dict of other features (default: none); features not in
+#                'base' or 'chosen' take their defaults
+#     'domains': optional dict: feature -> list of values to try, for
+#                features whose constraint does not give them (see 'fdecl_domain')
+
+# Yields dicts: feature -> value, for the features in 'chosen' that are
+# relevant; chosen features that are not relevant are absent.  (Omitting
+# a relevant feature just selects its default, so is not a different
+# configuration.)
+
+# Features are assigned in fdecl order, by backtracking.  The check is
+# kept up to date incrementally (Check_state.recheck_feature), and each
+# fdecl's outcome is examined as soon as it no longer depends on any
+# unassigned chosen feature, so a failing precondition or constraint
+# prunes every extension of the partial assignment.
+
+def enumerate_configs (chosen, base = None, domains = None, fdecls = None, fdecl_index = None):
+    if fdecls == None:
+        # Every decl family, since the chosen features may enable any of them
+        (fdecls, fdecl_index) = RR.all_decls ()
+    elif fdecl_index == None:
+        fdecl_index = RD.mk_fdecl_index (fdecls)
+    if base == None:
+        base = {}
+    if RH.hart_overrides_fname in base:
+        raise RCo.Check_error ("ERROR: {0} is not supported: enumerate each hart's feature list separately\n".
+                               format (RH.hart_overrides_fname))
+    if domains == None:
+        domains = {}
+
+    positions = dict ([(RC.fdecl_name (fdecl), j) for (j, fdecl) in enumerate (fdecls)])
+    for fname in chosen:
+        if fname not in positions:
+            raise RCo.Check_error ("ERROR: enumerating undeclared feature {0}\n".format (fname))
+    order = sorted (set (chosen), key = lambda fname: positions [fname])
+
+    option_lists = []
+    for fname in order:
+        domain = domains.get (fname)
+        if domain == None:
+            domain = fdecl_domain (fdecl_index [fname])
+        if domain == None:
+            raise RCo.Check_error ("ERROR: cannot enumerate values of feature {0}; supply a domain\n".format (fname))
+        option_lists.append (domain)
+
+    # Start with all chosen features omitted
+    known = [(fname, fval) for (fname, fval) in base.items ()
+             if (fname in fdecl_index) and (fname not in order)]
+    state = RC.Check_state (0, fdecls, known, fdecl_index, None, quiet = True, errors_fail = True)
+
+    (checks_at, relevance_known_at) = mk_schedule (fdecls, fdecl_index, state, order)
+    chosen = set (order)
+    if not checks_ok (state, checks_at [-1], chosen, {}):
+        return
+
+    assignment = {}
+
+    def search (k):
+        if k == len (order):
+            yield dict (assignment)
+            return
+
+        fname = order [k]
+        options = [None] + option_lists [k]
+        if relevance_known_at [fname] < k:
+            # Preconditions depend only on assigned features: try just
+            # omitting it if it is not relevant, else just its values
+            state.recheck_feature (fname, None)
+            (ok, feature_out) = state.outcomes [fname]
+            diagnostic = state.diagnostics.get (fname)
+            if (diagnostic != None) and (diagnostic.kind == "error"):
+                pass
+            elif feature_out == None:
+                options = [None]
+            else:
+                options = option_lists [k]
+
+        for fval in options:
+            state.recheck_feature (fname, fval)
+            if fval != None:
+                assignment [fname] = fval
+            if checks_ok (state, checks_at [k], chosen, assignment):
+                yield from search (k + 1)
+            assignment.pop (fname, None)
+        state.recheck_feature (fname, None)
+
+    yield from search (0)
+
+# ----------------------------------------------------------------
+# When can each fdecl's outcome be trusted?
+# Returns (checks_at, relevance_known_at), where
+#     checks_at [k]:  fdecls whose check depends on no chosen feature after
+#                     order [k] (checks_at [-1]: on no chosen feature at all)
+#     relevance_known_at [fname]:  position in 'order' of the last chosen
+#                     feature that the preconditions of 'fname' depend on (-1: none)
+
+# Dependencies are computed with chosen features at their defaults; a
+# given (constant) value depends on nothing, so this over-approximates.
+
+def mk_schedule (fdecls, fdecl_index, state, order):
+    deps = RDp.Dep_graph (fdecl_index, state.env.fval_index)
+    last_check   = {}
+    last_precond = dict ([(fname, -1) for fname in order])
+    for (k, fname) in enumerate (order):
+        (values, checks) = deps.affected (fname)
+        for x in checks:
+            last_check [x] = k
+        for y in order:
+            fdecl = fdecl_index [y]
+            for precond in RC.fdecl_preconds (fdecl):
+                if not values.isdisjoint (RDp.expr_refs (precond, y)):
+                    last_precond [y] = k
+
+    checks_at = dict ([(k, []) for k in range (-1, len (order))])
+    for fdecl in fdecls:
+        fname = RC.fdecl_name (fdecl)
+        checks_at [last_check.get (fname, -1)].append (fname)
+    return (checks_at, last_precond)
+
+# All fdecls 'fnames' pass, and each of them that is a chosen feature
+# is given (in 'assignment') if and only if it is relevant
+
+def checks_ok (state, fnames, chosen, assignment):
+    for fname in fnames:
+        (ok, feature_out) = state.outcomes [fname]
+        if not ok:
+            return False
+        if fname in assignment:
+            diagnostic = state.diagnostics.get (fname)
+            if (diagnostic != None) and (diagnostic.kind == "not_relevant"):
+                return False
+        elif (fname in chosen) and (feature_out != None):
+            return False
+    return True
+
+# ----------------------------------------------------------------
+# Values allowed by the constraint of 'fdecl', if it has one of the forms
+#     ["Is_bool", "$this"]
+#     ["In", "$this", ["List", x, ...]]
+#     ["==", "$this", x]
+# else None
+
+def fdecl_domain (fdecl):
+    constraint = RC.fdecl_constraint (fdecl)
+    if (type (constraint) != list) or (len (constraint) < 2) or (constraint [1] != "$this"):
+        return None
+    op = constraint [0]
+    if (op == "Is_bool") and (len (constraint) == 2):
+        return [False, True]
+    if (op == "In") and (len (constraint) == 3):
+        xs = constraint [2]
+        if (type (xs) == list) and (len (xs) > 0) and (xs [0] == "List"):
+            return [domain_value (x) for x in xs [1:]]
+    if (op == "==") and (len (constraint) == 3):
+        return [domain_value (constraint [2])]
+    return None
+
+def domain_value (x):
+    if x == "True":  return True
+    if x == "False": return False
+    return x
+
+# ****************************************************************
+# ****************************************************************
+# ****************************************************************
+
+# For non-interactive invocations, call main() and use its return value
+# as the exit code.
+if __name__ == '__main__':
+  sys.exit (main (sys.argv))
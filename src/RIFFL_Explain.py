@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Explanations of failing feature lists.
+
+# For each failing fdecl, finds a minimal set of input features that
+# by themselves (all other input features omitted, i.e., at their
+# defaults) still make that fdecl's constraint false.  The set is
+# 1-minimal: omitting any one of its features makes the failure go away.
+
+# Uses delta debugging (Zeller and Hildebrandt's 'ddmin') over the
+# input features.  Each trial subset is checked incrementally
+# (Check_state.recheck_feature): only the fdecls affected by the
+# features added or omitted since the previous trial are re-evaluated.
+
+# Used by 'RIFFL_Check.py --explain'.
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Check as RC
+
+# ================================================================
+# Explain every failing fdecl of feature list 'features' (known features only).
+# Returns a list, in fdecl order, of (fname, culprits), where 'culprits'
+# is a minimal list of (feature name, value) pairs from 'features'.
+
+def explain_failures (fdecls, fdecl_index, features):
+    state = RC.Check_state (0, fdecls, features, fdecl_index, None, quiet = True, errors_fail = True)
+    targets = [(diagnostic.fname, diagnostic.kind) for diagnostic in state.diagnostics_list ()
+               if not state.outcomes [diagnostic.fname][0]]
+
+    trial = Trial (state, features)
+    explanations = []
+    for (target, kind) in targets:
+        def test (subset):
+            trial.set_subset (subset)
+            diagnostic = state.diagnostics.get (target)
+            return (diagnostic != None) and (diagnostic.kind == kind)
+
+        culprits = ddmin ([fname for (fname, fval) in features], test)
+        explanations.append ((target, [(fname, fval) for (fname, fval) in features if fname in culprits]))
+    return explanations
+
+# ----------------------------------------------------------------
+# The feature list currently being checked is a subset of 'features'
+
+class Trial:
+    def __init__ (self, state, features):
+        self.state    = state
+        self.features = features
+        self.given    = set ([fname for (fname, fval) in features])
+
+    def set_subset (self, subset):
+        subset = set (subset)
+        for (fname, fval) in self.features:
+            if (fname in subset) and (fname not in self.given):
+                self.state.recheck_feature (fname, fval)
+                self.given.add (fname)
+            elif (fname not in subset) and (fname in self.given):
+                self.state.recheck_feature (fname, None)
+                self.given.discard (fname)
+
+# ----------------------------------------------------------------
+# Delta debugging: a 1-minimal sublist of 'items' for which 'test' is
+# True ('test (items)' is assumed True).  Results of 'test' are cached.
+
+def ddmin (items, test):
+    cache = {}
+    def cached_test (xs):
+        key = frozenset (xs)
+        if key not in cache:
+            cache [key] = test (xs)
+        return cache [key]
+
+    if cached_test ([]):
+        return []
+
+    n = 2
+    while len (items) >= 2:
+        chunks  = split (items, n)
+        reduced = False
+        # Try each chunk by itself
+        for chunk in chunks:
+            if cached_test (chunk):
+                (items, n, reduced) = (chunk, 2, True)
+                break
+        # Try omitting each chunk
+        if not reduced:
+            for chunk in chunks:
+                complement = [x for x in items if x not in chunk]
+                if cached_test (complement):
+                    (items, n, reduced) = (complement, max (n - 1, 2), True)
+                    break
+        if not reduced:
+            if n >= len (items):
+                break
+            n = min (len (items), 2 * n)
+    return items
+
+# Split 'xs' into 'n' nearly equal, contiguous chunks
+
+def split (xs, n):
+    chunks = []
+    start  = 0
+    for j in range (n):
+        end = start + (len (xs) - start) // (n - j)
+        chunks.append (xs [start:end])
+        start = end
+    return [chunk for chunk in chunks if len (chunk) > 0]
+
+# ================================================================
+
+def print_explanations (stream, explanations):
+    for (fname, culprits) in explanations:
+        if len (culprits) == 0:
+            stream.write ("Fdecl '{0}' fails even if no input features are given\n".format (fname))
+            continue
+        stream.write ("Fdecl '{0}' fails because of input features:\n".format (fname))
+        for (culprit, fval) in culprits:
+            stream.write ("  {0}: {1}\n".format (culprit, fval))
+
+# ================================================================
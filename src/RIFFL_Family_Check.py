@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+
+usage_line = \
+"Usage:    CMD    [<feature_list.yaml> ...]\n"
+
+help_lines = \
+"  Regression check for the decl registry (see RIFFL_Registry): checks\n" \
+"  that loading only the decl families a feature list needs gives the same\n" \
+"  result as loading all of them (i.e., the same checked features, the same\n" \
+"  failing fdecls and the same diagnostics; only the number of constraints\n" \
+"  checked may differ).\n" \
+"  Each feature list (default: Examples/*.yaml) is checked as given, as each\n" \
+"  hart's feature list (see RIFFL_Harts), with XLEN 32 and 64, each with\n" \
+"  and without the S extension, and with a feature name that is not a\n" \
+"  string (YAML '1: 2').\n" \
+"  Exit code is 1 if any result differs.\n"
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import os
+import glob
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Check   as RC
+import RIFFL_YAML    as RY
+import RIFFL_Registry as RR
+import RIFFL_Harts   as RH
+
+# ================================================================
+
+def main (argv = None):
+    if (len (argv) > 1) and ((argv [1] == "--help") or (argv [1] == "-h")):
+        sys.stdout.write (usage_line.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        sys.stdout.write (help_lines.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        return 0
+
+    input_filenames = argv [1:]
+    if len (input_filenames) == 0:
+        src_dir = os.path.dirname (os.path.abspath (__file__))
+        input_filenames = sorted (glob.glob (os.path.join (src_dir, "..", "Examples", "*.yaml")))
+
+    n_checked    = 0
+    n_mismatches = 0
+    for input_filename in input_filenames:
+        for (variant, feature_dict) in variants (RY.load_feature_list (input_filename)):
+            n_checked += 1
+            mismatch = compare_families (feature_dict)
+            if mismatch != None:
+                n_mismatches += 1
+                sys.stdout.write ("MISMATCH: {0} {1}: {2}\n".format (input_filename, variant, mismatch))
+    sys.stdout.write ("Checked {0} feature lists; {1} mismatches\n".format (n_checked, n_mismatches))
+    return (1 if n_mismatches > 0 else 0)
+
+# ================================================================
+# Variants of feature list 'feature_dict' to check: list of (name, feature dict)
+
+variant_overrides = [("RV32 with S",    {"XLEN": 32, "MISA_S": True}),
+                     ("RV32 without S", {"XLEN": 32, "MISA_S": False}),
+                     ("RV64 with S",    {"XLEN": 64, "MISA_S": True}),
+                     ("RV64 without S", {"XLEN": 64, "MISA_S": False}),
+                     ("with an integer feature name", {1: 2})]
+
+def variants (feature_dict):
+    (base, hart_overrides) = RH.split_hart_overrides (feature_dict)
+    # Omitted features of a layered feature list are None
+    base = dict ([(fname, fval) for (fname, fval) in base.items () if fval != None])
+
+    result = [("as given", base)]
+    for (hartid, overrides) in hart_overrides:
+        result.append (("hart {0}".format (hartid), overlay (base, overrides)))
+    for (name, overrides) in variant_overrides:
+        result.append ((name, overlay (base, overrides)))
+    return result
+
+def overlay (base, overrides):
+    d = dict (base)
+    for (fname, fval) in overrides.items ():
+        if fval == None:
+            d.pop (fname, None)
+        else:
+            d [fname] = fval
+    return d
+
+# ================================================================
+# Check 'feature_dict' with the decl families it needs, and with all
+# decl families (indexed families with the same instances).
+# Returns None if the results are the same, else a description of the difference.
+
+def compare_families (feature_dict):
+    fams   = RR.families_for (feature_dict)
+    needed = dict ([(family.name, indices) for (family, indices) in fams])
+    all_fams = []
+    for family in RR.families:
+        if family.name in needed:
+            all_fams.append ((family, needed [family.name]))
+        elif family.indices == None:
+            all_fams.append ((family, None))
+
+    result1 = check_result (feature_dict, RR.decls_of_families (fams))
+    result2 = check_result (feature_dict, RR.decls_of_families (all_fams))
+    for (field, x1, x2) in zip (["outcome", "features", "failing", "diagnostics"], result1, result2):
+        if x1 == x2:
+            continue
+        if (type (x1) == list) and (type (x2) == list):
+            only1 = [x for x in x1 if x not in x2]
+            only2 = [x for x in x2 if x not in x1]
+            return "{0} differ: only with needed families: {1}; only with all families: {2}".format (field, only1, only2)
+        return "{0} differ: {1} vs. {2} (all families)".format (field, x1, x2)
+    return None
+
+# (outcome, checked features, failing fdecls, diagnostics) of checking 'feature_dict' against 'decls';
+# the outcome is "pass", "fail" or an error message
+
+def check_result (feature_dict, decls):
+    (fdecls, fdecl_index) = decls
+    known = [(fname, fval) for (fname, fval) in feature_dict.items () if fname in fdecl_index]
+    try:
+        state = RC.Check_state (0, fdecls, known, fdecl_index, quiet = True)
+    except RC.evaluation_errors as exc:
+        return (str (exc), None, None, None)
+    outcome = ("pass" if state.all_pass () else "fail")
+    return (outcome, state.features_out (), state.failing_names (), state.diagnostics_list ())
+
+# ****************************************************************
+# ****************************************************************
+# ****************************************************************
+
+# For non-interactive invocations, call main() and use its return value
+# as the exit code.
+
+if __name__ == '__main__':
+  sys.exit (main (sys.argv))
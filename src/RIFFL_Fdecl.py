@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Compact representation of feature decls.
+
+# Decls are written as 5-tuples (name, descr, default, preconds,
+# constraint) (see RIFFL_Decls), and 'mk_fdecls' converts them to
+# 'Fdecl' objects, which take less memory:
+#     - '__slots__', so no per-object dict
+#     - feature names (and the '$FOO' references to them) are interned
+#     - equal sub-expressions are shared (one list object), within a
+#       module's decls
+#     - an instance of an indexed decl template (see
+#       RIFFL_Compile.instantiate_fdecl) shares the template's
+#       sub-expressions that do not mention the index, and keeps no
+#       description of its own: it is made from the template's when
+#       asked for (e.g., for a diagnostic)
+
+# An Fdecl can also be indexed, unpacked and printed like the 5-tuple,
+# so code that handles decls works with either (e.g., with synthetic
+# decls, or decls given to RIFFL_Engine).
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import weakref
+
+# ================================================================
+# In templates of indexed decls, stands for the index
+
+index_placeholder = "{n}"
+
+# ================================================================
+
+class Fdecl:
+    # 'descr_src': the description, or (template description, index)
+    __slots__ = ("name", "default", "preconds", "constraint", "descr_src", "__weakref__")
+
+    def __init__ (self, name, descr_src, default, preconds, constraint):
+        self.name       = sys.intern (name)
+        self.descr_src  = descr_src
+        self.default    = default
+        self.preconds   = preconds
+        self.constraint = constraint
+
+    @property
+    def descr (self):
+        if type (self.descr_src) == tuple:
+            (template_descr, n) = self.descr_src
+            return template_descr.replace (index_placeholder, str (n))
+        return self.descr_src
+
+    def as_tuple (self):
+        return (self.name, self.descr, self.default, self.preconds, self.constraint)
+
+    def __getitem__ (self, j):
+        if j == 0: return self.name
+        if j == 2: return self.default
+        if j == 3: return self.preconds
+        if j == 4: return self.constraint
+        return self.as_tuple () [j]
+
+    def __len__ (self):
+        return 5
+
+    def __iter__ (self):
+        return iter (self.as_tuple ())
+
+    def __repr__ (self):
+        return repr (self.as_tuple ())
+
+    def __reduce__ (self):
+        return (Fdecl, (self.name, self.descr_src, self.default, self.preconds, self.constraint))
+
+# ================================================================
+# Fdecls from a list of 5-tuples.
+# Equal sub-expressions (by value and type, so 1 and True differ) are
+# made into one shared list.
+
+def mk_fdecls (tuples):
+    shared = {}
+    return [mk_fdecl (t, shared) for t in tuples]
+
+def mk_fdecl (t, shared = None):
+    if shared == None:
+        shared = {}
+    (name, descr, default, preconds, constraint) = t
+    return Fdecl (name, descr,
+                  share_expr (default, shared),
+                  [share_expr (precond, shared) for precond in preconds],
+                  share_expr (constraint, shared))
+
+# Returns (shared copy of e).  'shared': key -> shared copy.
+# Post-order walk with an explicit stack (as in RIFFL_Compile.compile_expr),
+# so deeply nested expressions do not hit Python's recursion limit.
+
+def share_expr (e, shared):
+    results = []
+    # Each stack entry is (e, False) on the way down, (e, True) on the way up
+    stack   = [(e, False)]
+    while len (stack) > 0:
+        (e, children_done) = stack.pop ()
+        if type (e) == str:
+            if e.startswith ('$'):
+                e = sys.intern (e)
+            results.append (e)
+        elif type (e) != list:
+            results.append (e)
+        elif not children_done:
+            stack.append ((e, True))
+            for x in reversed (e):
+                stack.append ((x, False))
+        else:
+            n    = len (e)
+            args = results [len (results) - n:]
+            del results [len (results) - n:]
+            key  = tuple ([expr_key (x) for x in args])
+            e_shared = shared.get (key)
+            if e_shared == None:
+                e_shared = args
+                shared [key] = e_shared
+            results.append (e_shared)
+    return results [0]
+
+# Children are already shared, so lists are keyed by identity
+
+def expr_key (x):
+    if type (x) == list:
+        return ("list", id (x))
+    return (type (x).__name__, x)
+
+# ================================================================
+# Memo of values computed from fdecls (e.g., their compiled forms, see
+# RIFFL_Compile), which do not change.  Keyed by id, for fast lookups.
+# Fdecls are held weakly: an fdecl's entry is removed when it goes away
+# (before its id can be reused).  Other decls (e.g., plain 5-tuples,
+# which cannot be weakly referenced) are held by their entries, so their
+# ids stay valid; at most 'max_strong' of them are kept, the oldest
+# dropped first.
+
+class Fdecl_memo:
+    def __init__ (self, max_strong = 65536):
+        # id (fdecl) -> (weak reference to fdecl, or fdecl, value)
+        self.entries    = {}
+        # ids of the entries that hold their decl, oldest first
+        self.strong_ids = {}
+        self.max_strong = max_strong
+
+    def get (self, fdecl):
+        entry = self.entries.get (id (fdecl))
+        if entry == None:
+            return None
+        return entry [1]
+
+    def set (self, fdecl, value):
+        entries = self.entries
+        key     = id (fdecl)
+        try:
+            ref = weakref.ref (fdecl, lambda r: entries.pop (key, None))
+        except TypeError:
+            strong_ids = self.strong_ids
+            strong_ids.pop (key, None)
+            if len (strong_ids) >= self.max_strong:
+                oldest = next (iter (strong_ids))
+                del strong_ids [oldest]
+                del entries [oldest]
+            strong_ids [key] = None
+            ref = fdecl
+        entries [key] = (ref, value)
+
+# ================================================================
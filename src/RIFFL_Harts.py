@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Per-hart feature lists.
+
+# A feature list for a multi-hart system (see 'Hartids') can give, in
+# a section 'Hart_overrides', the features whose values differ on
+# particular harts:
+
+#     Hartids: [List, 0, 1, 2, 3]
+#     MISA_S:  True
+#     Sv39:    True
+#     ...
+#     Hart_overrides:
+#         3: {MISA_S: False, Sv39: null}
+
+# The feature list of each hart is the rest of the file (the base)
+# overlaid with that hart's overrides (null: omitted on that hart, so it
+# takes its default).  Harts without overrides have the base feature list.
+
+# The base is checked once.  Each hart with overrides starts from a
+# fork of the base's Check_state (the fdecls, their compiled forms and
+# the check dependencies are shared; outcomes and feature values are
+# copied) and rechecks only the fdecls that depend, directly or through
+# other features' values, on its overridden features (see RIFFL_Deps).
+# A hart whose overrides need decl families that the base does not
+# (see RIFFL_Registry) is checked in full instead.
+
+# If asked to (see 'check_harts'), harts are checked on a pool of
+# worker processes when there are enough of them to pay for starting
+# the pool.
+
+# Used by RIFFL_Check and RIFFL_Engine (and so RIFFL_Server).
+
+# ================================================================
+# Imports of Python libraries
+
+import os
+import collections
+import multiprocessing
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Compile as RCo
+import RIFFL_Check   as RC
+import RIFFL_Registry as RR
+
+# ================================================================
+
+hart_overrides_fname = "Hart_overrides"
+
+# Split 'feature_dict' into (base feature dict, hart overrides), where
+# the overrides are a list of (hartid, dict of overridden features), in
+# order of hartid.
+# Hart ids may also be strings of digits (e.g., from JSON).
+
+def split_hart_overrides (feature_dict):
+    if hart_overrides_fname not in feature_dict:
+        return (feature_dict, [])
+
+    base = dict (feature_dict)
+    overrides = base.pop (hart_overrides_fname)
+    if overrides == None:
+        overrides = {}
+    if type (overrides) != dict:
+        raise RCo.Check_error ("ERROR: {0} must map hart ids to features\n".format (hart_overrides_fname),
+                               overrides)
+    hart_overrides = {}
+    for (hartid, features) in overrides.items ():
+        if (type (hartid) == str) and hartid.isdigit ():
+            hartid = int (hartid)
+        if (type (hartid) != int) or (hartid in hart_overrides):
+            raise RCo.Check_error ("ERROR: {0}: bad or duplicate hart id {1}\n".format (hart_overrides_fname,
+                                                                                      repr (hartid)))
+        if features == None:
+            features = {}
+        if type (features) != dict:
+            raise RCo.Check_error ("ERROR: {0}: overrides for hart {1} must map features to values\n".
+                                   format (hart_overrides_fname, hartid), features)
+        if "Hartids" in features:
+            raise RCo.Check_error ("ERROR: {0}: Hartids cannot be overridden per hart (hart {1})\n".
+                                   format (hart_overrides_fname, hartid))
+        hart_overrides [hartid] = features
+    return (base, sorted (hart_overrides.items ()))
+
+# ================================================================
+# Outcome of checking one hart
+#     'n_rechecked': number of fdecls rechecked (None: checked in full)
+#     'failing':     names of failing fdecls, in fdecl order
+#     'diagnostics': diagnostics of the rechecked fdecls, in fdecl order
+#     'unknown':     overridden features that are not declared
+
+Hart_result = collections.namedtuple ("Hart_result", ["hartid", "all_pass", "n_checked", "n_rechecked",
+                                                      "failing", "diagnostics", "unknown"])
+
+# Checks harts against the base feature list 'base_dict', whose
+# Check_state is 'state' (checked here if None).
+#     'decls': (fdecls, fdecl_index) for all harts (e.g., an Engine's own
+#              decls); None: the decls each hart needs (see RIFFL_Registry)
+
+class Hart_checker:
+    def __init__ (self, verbosity, base_dict, state = None, decls = None):
+        self.verbosity = verbosity
+        self.base_dict = base_dict
+        self.decls     = decls
+        if state == None:
+            (fdecls, fdecl_index) = self.decls_for (base_dict)
+            known = [(fname, fval) for (fname, fval) in base_dict.items () if fname in fdecl_index]
+            state = RC.Check_state (verbosity, fdecls, known, fdecl_index, quiet = True)
+        # Build the dependency graph once, for all forks
+        state.init_deps ()
+        self.state     = state
+
+    def decls_for (self, features):
+        if self.decls != None:
+            return self.decls
+        return RR.decls_for (features)
+
+    def check_hart (self, hartid, overrides):
+        features = collections.ChainMap (overrides, self.base_dict)
+        (fdecls, fdecl_index) = self.decls_for (features)
+        unknown = [fname for fname in overrides if fname not in fdecl_index]
+
+        if fdecls is self.state.fdecls:
+            # Same decls as the base (RR.decls_for is memoized): recheck a fork
+            state = self.state.fork ()
+            state.quiet       = True
+            state.errors_fail = True
+            changes = [(fname, fval) for (fname, fval) in overrides.items () if fname in fdecl_index]
+            rechecked = set (state.recheck_features (changes))
+            n_rechecked = len (rechecked)
+        else:
+            known = [(fname, fval) for (fname, fval) in features.items ()
+                     if (fname in fdecl_index) and (fval != None)]
+            state = RC.Check_state (self.verbosity, fdecls, known, fdecl_index, self.state.env.metrics,
+                                    quiet = True, errors_fail = True)
+            rechecked = state.outcomes
+            n_rechecked = None
+
+        diagnostics = [d for d in state.diagnostics_list () if d.fname in rechecked]
+        return Hart_result (hartid, state.all_pass (), state.n_checked (), n_rechecked,
+                            state.failing_names (), diagnostics, unknown)
+
+# ================================================================
+# Check harts 'hart_overrides' (as from 'split_hart_overrides') with
+# 'checker' (a Hart_checker), using a pool of 'n_jobs' workers (default
+# 1: in this process; 0: one per CPU).  Returns a list of Hart_results,
+# in order of hartid.
+
+# Hart ids must be in the base's Hartids (if that is valid).
+
+# Harts are checked in this process if there are fewer than
+# 'min_harts_per_job' per worker (a recheck takes far less time than
+# starting a worker), if collecting metrics or tracing, or if this is
+# already a worker (e.g., of RIFFL_Batch).
+
+min_harts_per_job = 16
+
+def check_harts (checker, hart_overrides, n_jobs = 1):
+    (ok, feature_out) = checker.state.outcomes.get ("Hartids", (False, None))
+    if ok and (feature_out != None):
+        hartids = feature_out [1]
+        for (hartid, overrides) in hart_overrides:
+            if hartid not in hartids:
+                raise RCo.Check_error ("ERROR: {0}: hart {1} is not in Hartids {2}\n".
+                                       format (hart_overrides_fname, hartid, hartids))
+
+    if n_jobs <= 0:
+        n_jobs = os.cpu_count () or 1
+    n_jobs = min (n_jobs, len (hart_overrides) // min_harts_per_job)
+    if ((n_jobs <= 1) or
+        (checker.verbosity > 0) or (checker.state.env.metrics != None) or
+        multiprocessing.current_process ().daemon):
+        return [checker.check_hart (hartid, overrides) for (hartid, overrides) in hart_overrides]
+
+    global worker_checker
+    chunksize = max (1, len (hart_overrides) // (n_jobs * 4))
+    # Workers forked from this process inherit 'checker'; others make their own
+    worker_checker = checker
+    try:
+        with multiprocessing.Pool (processes = n_jobs, initializer = init_worker,
+                                   initargs = (checker.verbosity, checker.base_dict, checker.decls)) as pool:
+            return pool.map (check_hart_job, hart_overrides, chunksize)
+    finally:
+        worker_checker = None
+
+worker_checker = None
+
+def init_worker (verbosity, base_dict, decls):
+    global worker_checker
+    if worker_checker == None:
+        worker_checker = Hart_checker (verbosity, base_dict, None, decls)
+
+def check_hart_job (job):
+    (hartid, overrides) = job
+    return worker_checker.check_hart (hartid, overrides)
+
+# ================================================================
+
+def print_hart_results (stream, hart_results):
+    for result in hart_results:
+        if result.n_rechecked == None:
+            how = "checked all {0} constraints (needs other decl families than the base)".format (result.n_checked)
+        else:
+            how = "rechecked {0} of {1} constraints".format (result.n_rechecked, result.n_checked)
+        stream.write ("Hart {0}: {1}; fail {2}\n".format (result.hartid, how, len (result.failing)))
+        for diagnostic in result.diagnostics:
+            RC.print_diagnostic (stream, diagnostic)
+        if len (result.unknown) > 0:
+            stream.write ("  Unknown features in overrides: {0}\n".format (", ".join (result.unknown)))
+    n_pass = len ([result for result in hart_results if result.all_pass])
+    stream.write ("Num harts with overrides {0}; pass {1}; fail {2}\n".format (len (hart_results), n_pass,
+                                                                            len (hart_results) - n_pass))
+
+# ================================================================
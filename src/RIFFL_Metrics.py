@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Per-fdecl metrics for a check run: wall time spent evaluating each
+# fdecl's value, preconditions and constraint, the number of expression
+# nodes evaluated, '$FOO' lookups, and applications of each op.
+
+# Pass a 'Metrics' object to RIFFL_Check.check_all_constraints (or
+# Check_state) to collect them; decls are then compiled with counting
+# wrappers (see RIFFL_Compile).  Work done while resolving another
+# feature's value (e.g., its default) is charged to the fdecl being
+# checked at the time.
+
+# ================================================================
+# Imports of Python libraries
+
+import json
+
+# ================================================================
+
+class Fdecl_metrics:
+    def __init__ (self, name):
+        self.name            = name
+        self.value_time      = 0.0
+        self.precond_time    = 0.0
+        self.constraint_time = 0.0
+        self.n_eval          = 0
+        self.n_lookups       = 0
+        self.n_apply         = {}
+
+    def total_time (self):
+        return self.value_time + self.precond_time + self.constraint_time
+
+    def to_dict (self):
+        return {"name":            self.name,
+                "total_time":      self.total_time (),
+                "value_time":      self.value_time,
+                "precond_time":    self.precond_time,
+                "constraint_time": self.constraint_time,
+                "n_eval":          self.n_eval,
+                "n_lookups":       self.n_lookups,
+                "n_apply":         dict (sorted (self.n_apply.items ()))}
+
+class Metrics:
+    def __init__ (self):
+        self.fdecls  = {}
+        # Work done outside any fdecl check is charged here
+        self.current = Fdecl_metrics ("<none>")
+
+    # Start charging work to fdecl 'name' (accumulating, if it is checked again)
+    def start_fdecl (self, name):
+        rec = self.fdecls.get (name)
+        if rec == None:
+            rec = Fdecl_metrics (name)
+            self.fdecls [name] = rec
+        self.current = rec
+        return rec
+
+    def totals (self):
+        totals = Fdecl_metrics ("<total>")
+        for rec in self.fdecls.values ():
+            totals.value_time      += rec.value_time
+            totals.precond_time    += rec.precond_time
+            totals.constraint_time += rec.constraint_time
+            totals.n_eval          += rec.n_eval
+            totals.n_lookups       += rec.n_lookups
+            for (op, n) in rec.n_apply.items ():
+                totals.n_apply [op] = totals.n_apply.get (op, 0) + n
+        return totals
+
+    # Fdecl records, most expensive first, by 'key' (a Fdecl_metrics.to_dict key)
+    def sorted_records (self, key = "total_time"):
+        return sorted (self.fdecls.values (),
+                       key = lambda rec: rec.to_dict () [key],
+                       reverse = True)
+
+    def to_json (self):
+        return {"totals": self.totals ().to_dict (),
+                "fdecls": [rec.to_dict () for rec in self.sorted_records ()]}
+
+    def write_json (self, stream):
+        json.dump (self.to_json (), stream, indent = 2)
+        stream.write ("\n")
+
+    # Table of the 'n' most expensive fdecls
+    def print_top (self, stream, n = 20, key = "total_time"):
+        stream.write ("{0:<32}  {1:>10}  {2:>10}  {3:>10}  {4:>10}  {5:>8}  {6:>8}\n".format (
+            "Fdecl", "Total us", "Value us", "Precond us", "Constr us", "Evals", "Lookups"))
+        for rec in self.sorted_records (key) [:n]:
+            stream.write ("{0:<32}  {1:>10.1f}  {2:>10.1f}  {3:>10.1f}  {4:>10.1f}  {5:>8}  {6:>8}\n".format (
+                rec.name,
+                rec.total_time ()      * 1.0e6,
+                rec.value_time         * 1.0e6,
+                rec.precond_time       * 1.0e6,
+                rec.constraint_time    * 1.0e6,
+                rec.n_eval,
+                rec.n_lookups))
+
+        totals = self.totals ()
+        stream.write ("Total: {0:.1f} us; {1} evals; {2} lookups; applies:".format (totals.total_time () * 1.0e6,
+                                                                                   totals.n_eval,
+                                                                                   totals.n_lookups))
+        for (op, n) in sorted (totals.n_apply.items (), key = lambda x: - x [1]):
+            stream.write (" {0}:{1}".format (op, n))
+        stream.write ("\n")
+
+# ================================================================
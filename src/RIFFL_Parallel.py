@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Checking large decl sets on a pool of worker processes.
+
+# The fdecls are partitioned into connected components of their
+# '$FOO' reference graph (see RIFFL_Deps.fdecl_components), and the
+# components are packed into chunks of about equal size, which workers
+# check concurrently.  A component larger than a chunk (typically, all
+# the fdecls that depend on XLEN) is split into consecutive slices;
+# each worker evaluates the features it needs itself, so a feature
+# shared by slices is just evaluated once per worker.
+
+# Outcomes are merged in fdecl order, and diagnostics are printed then,
+# so the output is the same as checking sequentially.  An error while
+# checking (unless the Check_state has 'errors_fail') is raised for the
+# first fdecl (in fdecl order) that has one, after recording the
+# outcomes before it, as when checking sequentially.
+
+# Used by RIFFL_Check.Check_state.
+
+# ================================================================
+# Imports of Python libraries
+
+import os
+import heapq
+import collections
+import multiprocessing
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Deps    as RDp
+import RIFFL_Check   as RC
+
+# ================================================================
+# Number of workers for checking Check_state 'state' (1: check in
+# this process), given 'n_jobs' requested (0: one per CPU).
+
+# Pools are only worth starting for at least 'min_fdecls_per_job'
+# fdecls per worker (starting a worker and sending it the feature list
+# costs about as much as checking a few thousand fdecls).  Checks that
+# trace or collect metrics, and checks in workers of other pools (e.g.,
+# RIFFL_Batch), are done in this process.
+
+min_fdecls_per_job = 4000
+
+def n_jobs_for (state, n_jobs):
+    if n_jobs == 1:
+        return 1
+    if n_jobs <= 0:
+        n_jobs = os.cpu_count () or 1
+    n_jobs = min (n_jobs, len (state.fdecls) // min_fdecls_per_job)
+    if ((n_jobs <= 1) or
+        (state.verbosity > 0) or (state.env.metrics != None) or
+        multiprocessing.current_process ().daemon):
+        return 1
+    return n_jobs
+
+# ================================================================
+# Check all fdecls of 'state' on 'n_jobs' workers, recording their outcomes in 'state'
+
+chunks_per_job = 4
+
+def check_in_parallel (state, n_jobs):
+    chunks = mk_chunks (RDp.fdecl_components (state.fdecls, state.env.fval_index), n_jobs * chunks_per_job)
+
+    features = state.env.fval_index
+    if not isinstance (features, collections.ChainMap):
+        features = list (features.items ())
+    worker_args = (state.fdecls, features, state.fdecl_index, state.errors_fail)
+
+    # Workers forked from this process inherit the worker state; others make their own
+    init_worker (*worker_args)
+    try:
+        with multiprocessing.Pool (processes = n_jobs, initializer = init_worker,
+                                   initargs = worker_args) as pool:
+            results = pool.map (check_chunk, chunks)
+    finally:
+        clear_worker ()
+
+    outcomes = []
+    errors   = []
+    for (chunk_outcomes, error) in results:
+        outcomes.extend (chunk_outcomes)
+        if error != None:
+            errors.append (error)
+    outcomes.sort (key = lambda x: x [0])
+    first_error = min (errors, key = lambda x: x [0], default = None)
+
+    for (j, ok, feature_out, diagnostic) in outcomes:
+        if (first_error != None) and (j > first_error [0]):
+            break
+        state.record_outcome (RC.fdecl_name (state.fdecls [j]), ok, feature_out, diagnostic)
+    if first_error != None:
+        raise first_error [1]
+
+# Pack 'components' (lists of positions) into about 'n_chunks' chunks
+# of about equal size, largest components first.  Each chunk is a sorted
+# list of positions.
+
+def mk_chunks (components, n_chunks):
+    n_fdecls   = sum ([len (component) for component in components])
+    chunk_size = max (1, -(- n_fdecls // n_chunks))
+    pieces = []
+    for component in components:
+        for j in range (0, len (component), chunk_size):
+            pieces.append (component [j : j + chunk_size])
+    pieces.sort (key = lambda piece: (- len (piece), piece [0]))
+
+    # Heap of (size, chunk number)
+    heap   = [(0, k) for k in range (min (n_chunks, len (pieces)))]
+    chunks = [[] for (size, k) in heap]
+    for piece in pieces:
+        (size, k) = heapq.heappop (heap)
+        chunks [k].extend (piece)
+        heapq.heappush (heap, (size + len (piece), k))
+    return [sorted (chunk) for chunk in chunks if len (chunk) > 0]
+
+# ================================================================
+# Workers
+
+# A quiet Check_state for the feature list, with no fdecls checked
+# yet, and the fdecls (whose positions are in the chunks)
+
+worker_state  = None
+worker_fdecls = None
+
+def init_worker (fdecls, features, fdecl_index, errors_fail):
+    global worker_state, worker_fdecls
+    if worker_state == None:
+        worker_state  = RC.Check_state (0, [], features, fdecl_index, quiet = True, errors_fail = errors_fail)
+        worker_fdecls = fdecls
+
+def clear_worker ():
+    global worker_state, worker_fdecls
+    worker_state  = None
+    worker_fdecls = None
+
+# Check the fdecls at positions 'chunk'.  Feature values evaluated for
+# earlier chunks are reused (they are the same for every fdecl).
+# Returns (list of (position, ok, feature_out, diagnostic), error), where
+# 'error' is None or (position, exception) for the first position whose
+# check raised an exception (and ends the chunk).
+
+def check_chunk (chunk):
+    outcomes = []
+    for j in chunk:
+        fdecl = worker_fdecls [j]
+        fname = RC.fdecl_name (fdecl)
+        try:
+            worker_state.check_fdecl (fdecl)
+        except RC.evaluation_errors as exc:
+            return (outcomes, (j, exc))
+        (ok, feature_out) = worker_state.outcomes [fname]
+        outcomes.append ((j, ok, feature_out, worker_state.diagnostics.get (fname)))
+    return (outcomes, None)
+
+# ================================================================
@@ -0,0 +1,319 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Registry of feature decl families.
+
+# The core decls (RIFFL_Decls.fdecls) are always loaded.  Other decls
+# are grouped into families, each in its own module (which defines
+# 'fdecls', in the same form as RIFFL_Decls).  A family's module is
+# imported only when a feature list needs it, i.e., when
+#     - the feature list gives (or refers to) one of its features, or
+#     - one of its gates is enabled: a gating feature given, or
+#       defaulted in RIFFL_Decls, with a value other than False or 0,
+#       or, for a gate (feature, value), with that value, or
+#     - a family that is loaded refers to one of its features.
+# So startup time and memory scale with the feature list, not with
+# all the decls there are.
+
+# A family's gates must cover the preconditions of all its features
+# (including defaults of other features of the family that they refer
+# to): if no gate is enabled and none of its features is given, none
+# of its features may be relevant, so leaving it out only changes the
+# number of constraints checked.
+
+# An indexed family's module defines template fdecls instead, each
+# declaring one feature per index n in the family's 'indices' (see
+# RIFFL_Compile.instantiate_fdecl).  Only the instances that a feature
+# list needs are made:
+#     - the n's of its features that the feature list gives (or refers to)
+#     - n < the value of the family's 'count_gate' feature, if any
+#     - the n's in 'always'
+#     - the n's of its features that other loaded decls refer to
+# All instances of a template share its compiled form.
+
+# A family's decls are placed, in fdecl order (which is also the order
+# of checking and of output), right after the core decl named by its
+# 'after' (None: after all core decls); an indexed family's instances
+# are in order of n.
+
+# Extensions (e.g., vendor-specific features) are added by calling
+# 'register_family' or 'register_indexed_family' before checking,
+# instead of editing RIFFL_Decls.
+
+# ================================================================
+# Imports of Python libraries
+
+import re
+import collections
+import importlib
+import importlib.util
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Decls   as RD
+import RIFFL_Compile as RCo
+import RIFFL_Deps    as RDp
+import RIFFL_Fdecl   as RF
+
+# ================================================================
+# A family of decls
+#     'name':       for messages
+#     'module':     name of the module defining its 'fdecls'
+#     'fnames':     names of the features it declares (templates, for an
+#                   indexed family), known without importing 'module';
+#                   checked when it is imported
+#     'gates':      core features that enable it: names, or (name, value)
+#     'after':      name of the core decl it follows in fdecl order (None: last)
+#     'indices':    for an indexed family, the range of n (else None)
+#     'count_gate': for an indexed family, optional name of the core feature
+#                   giving the number of instances
+#     'always':     for an indexed family, the n's that are always made
+
+Family = collections.namedtuple ("Family", ["name", "module", "fnames", "gates", "after",
+                                            "indices", "count_gate", "always"])
+
+families = []
+
+# Feature name -> Family
+family_of_fname = {}
+
+# (regular expression matching the instance names, Family) for indexed families
+indexed_fname_patterns = []
+
+def register_family (name, module, fnames, gates = [], after = None):
+    family = Family (name, module, frozenset (fnames), list (gates), after, None, None, [])
+    add_family (family)
+    for fname in fnames:
+        family_of_fname [fname] = family
+    return family
+
+def register_indexed_family (name, module, fname_templates, indices, count_gate = None,
+                             always = [], after = None):
+    family = Family (name, module, frozenset (fname_templates), [], after,
+                     indices, count_gate, list (always))
+    add_family (family)
+    pattern = "|".join ([re.escape (template).replace (re.escape (RCo.index_placeholder), "([0-9]+)")
+                         for template in fname_templates])
+    indexed_fname_patterns.append ((re.compile ("(?:" + pattern + ")$"), family))
+    return family
+
+def add_family (family):
+    for fname in family.fnames:
+        if (fname in RD.fdecl_index) or (lookup_fname (fname) != None):
+            raise RCo.Check_error ("ERROR: decl family {0}: feature {1} is already declared\n".
+                                   format (family.name, fname))
+    if (family.after != None) and (family.after not in RD.fdecl_index):
+        raise RCo.Check_error ("ERROR: decl family {0}: 'after' is not a core feature: {1}\n".
+                               format (family.name, family.after))
+    families.append (family)
+    decls_memo.clear ()
+
+# The family declaring feature 'fname', and its index: (family, n), with
+# n None for a family that is not indexed; None if no family declares it
+# (e.g., for a feature list key that is not a string, such as YAML '1: 2')
+
+def lookup_fname (fname):
+    if type (fname) != str:
+        return None
+    family = family_of_fname.get (fname)
+    if family != None:
+        return (family, None)
+    for (regexp, family) in indexed_fname_patterns:
+        m = regexp.match (fname)
+        if m != None:
+            digits = [g for g in m.groups () if g != None][0]
+            n = int (digits)
+            if (n in family.indices) and (str (n) == digits):
+                return (family, n)
+    return None
+
+# ================================================================
+# Decls (templates, for an indexed family) of a family, importing its
+# module the first time
+
+family_fdecls_memo = {}
+
+def load_family (family):
+    fdecls = family_fdecls_memo.get (family.name)
+    if fdecls == None:
+        module = importlib.import_module (family.module)
+        fdecls = RF.mk_fdecls (module.fdecls)
+        fnames = set ([fdecl [0] for fdecl in fdecls])
+        if fnames != family.fnames:
+            raise RCo.Check_error ("ERROR: decl family {0}: module {1} declares {2}, registered as {3}\n".
+                                   format (family.name, family.module, sorted (fnames), sorted (family.fnames)))
+        family_fdecls_memo [family.name] = fdecls
+    return fdecls
+
+# Instances for index 'n' of an indexed family, made the first time
+
+family_instances_memo = {}
+
+def instance_fdecls (family, n):
+    instances = family_instances_memo.setdefault (family.name, {})
+    fdecls = instances.get (n)
+    if fdecls == None:
+        fdecls = [RCo.instantiate_fdecl (template, n) for template in load_family (family)]
+        instances [n] = fdecls
+    return fdecls
+
+# Source file of a family's module, without importing it (for cache keys)
+
+def family_source_file (family):
+    spec = importlib.util.find_spec (family.module)
+    if spec == None:
+        return None
+    return spec.origin
+
+# ================================================================
+# Families needed for 'feature_dict' (name -> value), in registration
+# order: list of (family, indices), where 'indices' is a sorted tuple
+# of the n's needed for an indexed family, else None
+
+def families_for (feature_dict):
+    needed = {}
+    fnames = set (feature_dict.keys ())
+    for fval in feature_dict.values ():
+        fnames.update (RDp.expr_refs (fval, None))
+
+    todo = [x for x in [lookup_fname (fname) for fname in fnames] if x != None]
+    for family in families:
+        if family.indices == None:
+            if any ([gate_enabled (feature_dict, gate) for gate in family.gates]):
+                todo.append ((family, None))
+        else:
+            todo.extend ([(family, n) for n in family.always])
+            todo.extend ([(family, n) for n in gated_indices (feature_dict, family)])
+
+    while len (todo) > 0:
+        (family, n) = todo.pop ()
+        if family.indices == None:
+            if family.name in needed:
+                continue
+            needed [family.name] = None
+            fdecls = load_family (family)
+        else:
+            indices = needed.setdefault (family.name, set ())
+            if n in indices:
+                continue
+            indices.add (n)
+            fdecls = instance_fdecls (family, n)
+        for fdecl in fdecls:
+            for fname in RDp.fdecl_refs (fdecl):
+                x = lookup_fname (fname)
+                if x != None:
+                    todo.append (x)
+
+    result = []
+    for family in families:
+        if family.name in needed:
+            indices = needed [family.name]
+            if indices != None:
+                indices = tuple (sorted (indices))
+            result.append ((family, indices))
+    return result
+
+# Is gate 'gate' (a feature name, or (name, value)) enabled in 'feature_dict'?
+# Values that are expressions are not known until checked, so count as enabled.
+
+def gate_enabled (feature_dict, gate):
+    if type (gate) == tuple:
+        (gate, gate_v) = gate
+        fval = gate_value (feature_dict, gate)
+        return (type (fval) == list) or (fval == gate_v)
+    fval = gate_value (feature_dict, gate)
+    if type (fval) == list:
+        return True
+    return fval not in [None, False, "False"]
+
+# Indices n < the value of the count gate of indexed 'family' (all of
+# them if the value is an expression)
+
+def gated_indices (feature_dict, family):
+    if family.count_gate == None:
+        return []
+    fval = gate_value (feature_dict, family.count_gate)
+    if type (fval) == list:
+        return family.indices
+    if type (fval) != int:
+        return []
+    return [n for n in family.indices if n < fval]
+
+def gate_value (feature_dict, gate):
+    if gate in feature_dict:
+        return feature_dict [gate]
+    fdecl = RD.fdecl_index.get (gate)
+    if fdecl == None:
+        return None
+    return fdecl [2]
+
+# ================================================================
+# Decls for checking 'feature_dict': (fdecls, fdecl_index), with the
+# core decls and the families it needs.
+# Memoized per set of families (and indices), so repeated checks share
+# the same fdecls (and their compiled forms, see RIFFL_Compile).
+
+decls_memo = {}
+
+def decls_for (feature_dict):
+    return decls_of_families (families_for (feature_dict))
+
+def all_decls ():
+    return decls_of_families ([(family, family.indices) for family in families])
+
+# 'fams': list of (family, indices), as from 'families_for'
+
+def decls_of_families (fams):
+    key = tuple ([(family.name, indices) for (family, indices) in fams])
+    decls = decls_memo.get (key)
+    if decls != None:
+        return decls
+
+    if len (fams) == 0:
+        decls = (RD.fdecls, RD.fdecl_index)
+    else:
+        following = collections.defaultdict (list)
+        for (family, indices) in fams:
+            if indices == None:
+                following [family.after].extend (load_family (family))
+            else:
+                for n in indices:
+                    following [family.after].extend (instance_fdecls (family, n))
+        fdecls = []
+        for fdecl in RD.fdecls:
+            fdecls.append (fdecl)
+            fdecls.extend (following [fdecl [0]])
+        fdecls.extend (following [None])
+        decls = (fdecls, RD.mk_fdecl_index (fdecls))
+    decls_memo [key] = decls
+    return decls
+
+# ================================================================
+# Families of the standard decls
+
+register_indexed_family ("HPM", "RIFFL_Decls_HPM",
+                         ["MHPM{n}_exists", "MHPMEVENT{n}_WARL_fn"],
+                         range (3, 32),
+                         # HPMs 3 and 4 were declared individually before
+                         # the family existed, so always appear in output
+                         always = [3, 4],
+                         after = "UTVEC_MODE_WARL_fn")
+
+register_family ("VM", "RIFFL_Decls_VM",
+                 ["SATP_MODE_WARL_fn", "SATP_ASID_WARL_fn", "SATP_PPN_WARL_fn",
+                  "Sv32", "Sv39", "Sv48", "PTE_A_trap", "PTE_D_trap"],
+                 # Sv48 is relevant on RV64 without S (its default
+                 # depends on Sv39's, which does not)
+                 gates = ["MISA_S", ("XLEN", 64)],
+                 after = "MCAUSE_on_NMI")
+
+register_indexed_family ("PMP", "RIFFL_Decls_PMP",
+                         ["PMPCFG{n}", "PMPADDR{n}"],
+                         range (0, 64),
+                         count_gate = "Num_PMP_registers",
+                         after = "Num_PMP_registers")
+
+# ================================================================
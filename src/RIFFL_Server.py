@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+
+usage_line = \
+"Usage:    CMD    (--socket <path> | --port <port>)  [--host <host>]\n"
+
+help_lines = \
+"  Runs a long-lived checker server, so clients need not start a\n" \
+"  RIFFL_Check.py process (and load the feature decls) per check.\n" \
+"  Feature decls are loaded and compiled once, at startup.\n" \
+"  Listens on Unix domain socket <path>, or on TCP <host>:<port>\n" \
+"    (default host: 127.0.0.1, i.e., local clients only).\n" \
+"  Protocol: one JSON request per line; one JSON response per line.\n" \
+"    Request:  {\"id\": any, \"features\": {...}}   feature list as a JSON object\n" \
+"          or  {\"id\": any, \"yaml\": \"...\"}       feature list as YAML text\n" \
+"          or  {\"id\": any, \"file\": \"foo.yaml\"}  YAML file, read by the server\n" \
+"              (only when listening on a Unix socket or a loopback host)\n" \
+"    Response: {\"id\": any, \"ok\": true, \"result\": {...}}\n" \
+"          or  {\"id\": any, \"ok\": false, \"error\": \"...\"}\n" \
+"    where 'result' has all_pass, n_checked, features (resolved), defaults,\n" \
+"    unknown, failing, diagnostics and harts (the results of checking the\n" \
+"    feature list's Hart_overrides; see RIFFL_Engine.Check_result).\n"
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import os
+import stat
+import json
+import ipaddress
+import collections.abc
+import yaml
+import asyncio
+import argparse
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Compile as RCo
+import RIFFL_Engine  as RE
+import RIFFL_YAML    as RY
+
+# ================================================================
+
+def main (argv = None):
+    parser = argparse.ArgumentParser (prog = argv [0], add_help = False)
+    parser.add_argument ("-h", "--help", action = "store_true")
+    parser.add_argument ("--socket")
+    parser.add_argument ("--port", type = int)
+    parser.add_argument ("--host", default = "127.0.0.1")
+    args = parser.parse_args (argv [1:])
+
+    if args.help or ((args.socket == None) == (args.port == None)):
+        sys.stdout.write (usage_line.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        sys.stdout.write (help_lines.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        return 0
+
+    engine = RE.Engine ()
+    try:
+        asyncio.run (serve (engine, args.socket, args.host, args.port))
+    except RCo.Check_error as exc:
+        exc.write (sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+# ================================================================
+# Serve clients until cancelled.
+# Checks run on the event loop itself: each takes on the order of
+# milliseconds, and is CPU-bound, so threads would not help; clients
+# are served concurrently between requests.
+
+# "file" requests read files on the server, so they are only served to
+# local clients: on a Unix socket, or a TCP port on a loopback host.
+
+# Feature lists may be large, so request lines may be too
+max_request_bytes = 64 * 1024 * 1024
+
+async def serve (engine, socket_path, host, port):
+    allow_files = (socket_path != None) or is_loopback (host)
+    def client_connected (reader, writer):
+        return handle_client (engine, reader, writer, allow_files)
+
+    if socket_path != None:
+        # Remove a socket left by an earlier server, but nothing else
+        if os.path.lexists (socket_path):
+            if not stat.S_ISSOCK (os.lstat (socket_path).st_mode):
+                raise RCo.Check_error ("ERROR: {0} exists and is not a socket\n".format (socket_path))
+            os.remove (socket_path)
+        server = await asyncio.start_unix_server (client_connected, path = socket_path,
+                                                  limit = max_request_bytes)
+        sys.stdout.write ("Serving on Unix socket '{0}'\n".format (socket_path))
+    else:
+        server = await asyncio.start_server (client_connected, host = host, port = port,
+                                             limit = max_request_bytes)
+        sys.stdout.write ("Serving on {0}:{1}\n".format (host, port))
+        if not allow_files:
+            sys.stdout.write ("Not serving 'file' requests: {0} is not a loopback host\n".format (host))
+    sys.stdout.flush ()
+
+    async with server:
+        await server.serve_forever ()
+
+def is_loopback (host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address (host).is_loopback
+    except ValueError:
+        return False
+
+async def handle_client (engine, reader, writer, allow_files):
+    try:
+        while True:
+            try:
+                line = await reader.readline ()
+            except ValueError:
+                # Request longer than 'max_request_bytes'
+                response = {"ok": False, "error": "ERROR: request too long"}
+                writer.write (encode_response (response))
+                break
+            if len (line) == 0:
+                break
+            if line.strip () == b"":
+                continue
+            writer.write (encode_response (handle_request (engine, line, allow_files)))
+            await writer.drain ()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close ()
+
+def encode_response (response):
+    return (json.dumps (response, default = repr) + "\n").encode ("utf-8")
+
+# ================================================================
+# One request (a line of JSON) -> response (a dict)
+#     'allow_files': whether "file" requests are served
+
+def handle_request (engine, line, allow_files):
+    try:
+        request = json.loads (line)
+    except ValueError as exc:
+        return {"ok": False, "error": "ERROR: request is not JSON: {0}".format (exc)}
+    if not isinstance (request, dict):
+        return {"ok": False, "error": "ERROR: request is not a JSON object"}
+
+    response = {}
+    if "id" in request:
+        response ["id"] = request ["id"]
+    try:
+        if "features" in request:
+            features = request ["features"]
+        elif "yaml" in request:
+            features = yaml.load (request ["yaml"], Loader = RY.Loader)
+        elif "file" in request:
+            if not allow_files:
+                raise RCo.Check_error ("ERROR: 'file' requests are only served to local clients\n")
+            features = RY.load_feature_list (request ["file"])
+        else:
+            raise RCo.Check_error ("ERROR: request has no 'features', 'yaml' or 'file'\n")
+        if not isinstance (features, collections.abc.Mapping):
+            raise RCo.Check_error ("ERROR: feature list is not a mapping\n")
+        result = engine.check (features).to_json ()
+
+    except (RCo.Check_error, yaml.YAMLError, OSError) as exc:
+        response ["ok"]    = False
+        response ["error"] = str (exc)
+        return response
+    except Exception as exc:
+        # Unexpected errors are reported for this request, so the client's session goes on
+        response ["ok"]    = False
+        response ["error"] = "ERROR: {0}: {1}".format (type (exc).__name__, exc)
+        return response
+
+    response ["ok"]     = True
+    response ["result"] = result
+    return response
+
+# ****************************************************************
+# ****************************************************************
+# ****************************************************************
+
+# For non-interactive invocations, call main() and use its return value
+# as the exit code.
+if __name__ == '__main__':
+  sys.exit (main (sys.argv))
@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Executable WARL functions.
+
+# In a checked feature list, a feature whose value has the form
+#     ["WARL_fn", e]
+# (e.g., MTVEC_BASE_WARL_fn, MSTATUS_SXL) describes what is actually
+# written to a CSR field when "$writeval" is attempted to be written.
+# 'mk_WARL_fns' compiles each such 'e' into a callable 'f (writeval)'
+# bound to the feature list: all other feature references in 'e' are
+# replaced by their values and folded at compile time (see
+# RIFFL_Compile), so typically only the operations on "$writeval" remain.
+
+# 'f.apply_batch (writevals)' applies a WARL function to a whole batch of
+# write values (e.g., a NumPy array, when replaying a trace) in one call.
+
+# For narrow fields (see RD.WARL_field_widths), 'mk_WARL_tables'
+# precomputes the result for every possible write value, so a
+# simulator can use a table lookup instead.
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+import array
+import struct
+
+# NumPy is optional; without it, batches are plain Python sequences.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Decls   as RD
+import RIFFL_Compile as RCo
+
+# ================================================================
+# Compile all WARL functions in a checked feature list.
+#     'features': checked feature list (dict, or list of (name, value) pairs,
+#                 e.g., from RIFFL_Check.Check_state.features_out ())
+#     'cache':    if True, each function caches its results per write value
+# Returns a dict: CSR field name (feature name less any '_WARL_fn' suffix) -> WARL_fn
+
+def mk_WARL_fns (features, cache = False):
+    features  = dict (features)
+    warl_fns  = {}
+    for (fname, fval) in features.items ():
+        if is_WARL_fn_value (fval):
+            field = fname
+            if field.endswith ("_WARL_fn"):
+                field = field [: - len ("_WARL_fn")]
+            warl_fns [field] = WARL_fn (fname, fval [1], features, cache)
+    return warl_fns
+
+def is_WARL_fn_value (fval):
+    return (type (fval) == list) and (len (fval) == 2) and (fval [0] == "WARL_fn")
+
+# ================================================================
+# Environment for executing WARL functions: feature values come from
+# the checked feature list, and "$writeval" is the current write value
+
+class WARL_env (RCo.Env):
+    def __init__ (self, features):
+        RCo.Env.__init__ (self, 0, {}, features)
+        self.cur_writeval = None
+
+    def writeval (self):
+        return self.cur_writeval
+
+# ================================================================
+# An executable WARL function
+#     'fname':    feature name (e.g., "MTVEC_BASE_WARL_fn")
+#     'body':     'e' in ["WARL_fn", e]
+#     'features': checked feature list (dict)
+#     'cache':    if True, cache results per write value
+
+class WARL_fn:
+    def __init__ (self, fname, body, features, cache = False):
+        self.fname         = fname
+        self.body          = body
+        self.f             = RCo.compile_expr (body, fname, None, features)
+        self.env           = WARL_env (features)
+        self.vectorizable  = is_vectorizable (body)
+        self.cache         = None
+        if cache:
+            self.cache = {}
+
+    # Apply to one write value
+    def __call__ (self, writeval):
+        cache = self.cache
+        if cache != None:
+            result = cache.get (writeval)
+            if result != None:
+                return result
+
+        env = self.env
+        env.cur_writeval = writeval
+        result = self.f (env)
+
+        if cache != None:
+            cache [writeval] = result
+        return result
+
+    # Apply to a batch of write values in one call.
+    # With a NumPy array, returns a NumPy array of the same dtype;
+    # otherwise returns a list.
+    def apply_batch (self, writevals):
+        if (np == None) or (not isinstance (writevals, np.ndarray)):
+            return [self (x) for x in writevals]
+
+        # Bit-wise combinations of "$writeval" and constants are applied
+        # to the whole array at once
+        if self.vectorizable:
+            env = self.env
+            env.cur_writeval = writevals
+            result = self.f (env)
+            env.cur_writeval = None
+            if isinstance (result, np.ndarray):
+                return result.astype (writevals.dtype, copy = False)
+            # Result does not depend on $writeval
+            return np.full (writevals.shape, result, dtype = writevals.dtype)
+
+        # Otherwise, apply once per distinct write value
+        (uniques, inverse) = np.unique (writevals, return_inverse = True)
+        results = np.array ([self (x.item ()) for x in uniques], dtype = writevals.dtype)
+        return results [inverse].reshape (writevals.shape)
+
+# ----------------------------------------------------------------
+# Can 'body' be applied elementwise to an array of write values?
+# True if "$writeval" only occurs under the bit-wise ops '&', '|', '^',
+# where array and integer semantics agree; everything else must be
+# independent of "$writeval" (and is therefore folded to a constant).
+
+def is_vectorizable (body):
+    stack = [body]
+    while len (stack) > 0:
+        e = stack.pop ()
+        if not mentions_writeval (e):
+            continue
+        if e == "$writeval":
+            continue
+        if (type (e) == list) and (len (e) > 0) and (e [0] in ["&", "|", "^"]):
+            stack.extend (e [1:])
+            continue
+        return False
+    return True
+
+def mentions_writeval (e):
+    stack = [e]
+    while len (stack) > 0:
+        e = stack.pop ()
+        if e == "$writeval":
+            return True
+        if type (e) == list:
+            stack.extend (e)
+    return False
+
+# ================================================================
+# WARL lookup tables for narrow fields
+
+#     'features':  checked feature list (dict, or list of (name, value) pairs)
+#     'warl_fns':  optional result of 'mk_WARL_fns (features)'
+#     'max_bits':  widest field for which a table is built (2^max_bits entries)
+
+# Returns (tables, wide), where
+#     'tables': dict field -> array.array ('Q') of 2^width results, indexed
+#               by the write value (masked to the field's width)
+#     'wide':   dict field -> WARL_fn, for the remaining fields (wider than
+#               'max_bits', of unknown width, or with results that are not
+#               unsigned 64-bit integers), to be applied as expressions
+
+def mk_WARL_tables (features, warl_fns = None, max_bits = 16):
+    features = dict (features)
+    if warl_fns == None:
+        warl_fns = mk_WARL_fns (features)
+
+    tables = {}
+    wide   = {}
+    for (field, warl_fn) in warl_fns.items ():
+        width = WARL_field_width (field, features)
+        table = None
+        if (width != None) and (width <= max_bits):
+            table = mk_WARL_table (warl_fn, width)
+        if table != None:
+            tables [field] = table
+        else:
+            wide [field] = warl_fn
+    return (tables, wide)
+
+# Width of CSR 'field' for this feature list, or None if unknown
+
+def WARL_field_width (field, features):
+    width_expr = RD.WARL_field_widths.get (field)
+    if width_expr == None:
+        return None
+    width = RCo.compile_expr (width_expr, field, None, features) (WARL_env (features))
+    if type (width) != int:
+        return None
+    return width
+
+# Results of 'warl_fn' for all write values 0 .. 2^width-1, or None if
+# some result is not an unsigned 64-bit integer.
+# Results are checked before they are stored in the table, so they are
+# computed as Python values: with NumPy, on an array of Python ints
+# (dtype object), since converting to uint64 would reject negative
+# results and silently turn strings and bools into integers.
+
+def mk_WARL_table (warl_fn, width):
+    n = 1 << width
+    if (np != None) and warl_fn.vectorizable:
+        results = warl_fn.apply_batch (np.arange (n, dtype = object)).tolist ()
+    else:
+        results = [warl_fn (x) for x in range (n)]
+
+    for result in results:
+        if (type (result) != int) or (result < 0) or (result >= (1 << 64)):
+            return None
+    return array.array ('Q', results)
+
+# ----------------------------------------------------------------
+# Binary file of WARL tables (all integers little-endian):
+#     magic  b"RIFFLWT1"
+#     u32    number of tables
+#     for each table:
+#         u16    length of field name, then the field name (UTF-8)
+#         u8     width
+#         u64 x 2^width   results
+
+def write_WARL_tables (stream, tables):
+    stream.write (b"RIFFLWT1")
+    stream.write (struct.pack ("<I", len (tables)))
+    for field in sorted (tables.keys ()):
+        table = tables [field]
+        name  = field.encode ("utf-8")
+        width = len (table).bit_length () - 1
+        stream.write (struct.pack ("<H", len (name)))
+        stream.write (name)
+        stream.write (struct.pack ("<B", width))
+        table_le = array.array ('Q', table)
+        if sys.byteorder != "little":
+            table_le.byteswap ()
+        stream.write (table_le.tobytes ())
+
+def read_WARL_tables (stream):
+    if stream.read (8) != b"RIFFLWT1":
+        raise ValueError ("not a RIFFL WARL table file")
+    (n_tables,) = struct.unpack ("<I", stream.read (4))
+    tables = {}
+    for j in range (n_tables):
+        (name_len,) = struct.unpack ("<H", stream.read (2))
+        field       = stream.read (name_len).decode ("utf-8")
+        (width,)    = struct.unpack ("<B", stream.read (1))
+        table       = array.array ('Q')
+        table.frombytes (stream.read (8 << width))
+        if sys.byteorder != "little":
+            table.byteswap ()
+        tables [field] = table
+    return tables
+
+# ================================================================
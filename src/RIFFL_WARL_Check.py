@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+
+usage_line = \
+"Usage:    CMD\n"
+
+help_lines = \
+"  Regression check for WARL lookup tables (see RIFFL_WARL): checks that\n" \
+"  'mk_WARL_tables' gives the same tables, and the same fields left to be\n" \
+"  applied as expressions, with and without NumPy, for WARL functions\n" \
+"  with good results and with results that are not unsigned 64-bit\n" \
+"  integers (negative, strings, bools).\n" \
+"  Exit code is 1 if any result differs.\n"
+
+# ================================================================
+# Imports of Python libraries
+
+import sys
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_WARL    as RW
+
+# ================================================================
+
+def main (argv = None):
+    if (len (argv) > 1) and ((argv [1] == "--help") or (argv [1] == "-h")):
+        sys.stdout.write (usage_line.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        sys.stdout.write (help_lines.replace ("CMD", argv [0]))
+        sys.stdout.write ("\n")
+        return 0
+
+    if RW.np == None:
+        sys.stdout.write ("NumPy is not installed; only checking without it\n")
+
+    n_mismatches = 0
+    for body in bodies:
+        features = {"XLEN": 64, "MTVEC_MODE_WARL_fn": ["WARL_fn", body]}
+        (result_np, result_no_np) = (WARL_table_result (features, RW.np),
+                                     WARL_table_result (features, None))
+        if result_np != result_no_np:
+            n_mismatches += 1
+            sys.stdout.write ("MISMATCH: {0}: {1} with NumPy, {2} without\n".format (body, result_np, result_no_np))
+    sys.stdout.write ("Checked {0} WARL functions; {1} mismatches\n".format (len (bodies), n_mismatches))
+    return (1 if n_mismatches > 0 else 0)
+
+# ================================================================
+# WARL function bodies for MTVEC_MODE (a 2-bit field)
+
+bodies = [# Unsigned 64-bit results: a table
+          "$writeval",
+          3,
+          ["&", "$writeval", 1],
+          ["|", "$writeval", 2],
+          ["&", "$writeval", -1],
+          ["If", ["==", "$writeval", 3], 1, "$writeval"],
+          # Other results: applied as expressions
+          -1,
+          ["-", "$writeval", 1],
+          ["&", "$writeval", -4],
+          "abc",
+          "True",
+          ["==", "$writeval", 1]]
+
+# ('table', results) or ('wide',) for the MTVEC_MODE WARL function in
+# 'features', from 'mk_WARL_tables' using NumPy module 'np' (None: without NumPy);
+# exceptions are results too
+
+def WARL_table_result (features, np):
+    saved_np = RW.np
+    RW.np    = np
+    try:
+        (tables, wide) = RW.mk_WARL_tables (features)
+    except Exception as exc:
+        return ("exception", repr (exc))
+    finally:
+        RW.np = saved_np
+    if "MTVEC_MODE" in tables:
+        return ("table", list (tables ["MTVEC_MODE"]))
+    return ("wide",)
+
+# ****************************************************************
+# ****************************************************************
+# ****************************************************************
+
+# For non-interactive invocations, call main() and use its return value
+# as the exit code.
+
+if __name__ == '__main__':
+  sys.exit (main (sys.argv))
@@ -0,0 +1,314 @@
+#!/usr/bin/python3
+
+# Copyright (c) 2018 Rishiyur S. Nikhil
+
+# ================================================================
+# Reading and writing feature-list YAML files.
+
+# Uses libyaml's C safe loader and emitter when PyYAML was built with
+# them (else the pure-Python ones).
+
+# If environment variable RIFFL_CACHE_DIR names a directory, parsed
+# feature dicts are also cached there, keyed by a hash of the file
+# contents, so unchanged inputs are not re-parsed on later runs
+# (see RIFFL_Cache).
+
+# ================================================================
+# Imports of Python libraries
+
+import os
+import json
+import collections
+import yaml
+import yaml.events
+import yaml.nodes
+import yaml.resolver
+import yaml.representer
+
+# ================================================================
+# Imports of project files
+
+import RIFFL_Cache as RCa
+
+# ================================================================
+
+try:
+    Loader = yaml.CSafeLoader
+    Dumper = yaml.CSafeDumper
+except AttributeError:
+    Loader = yaml.SafeLoader
+    Dumper = yaml.SafeDumper
+
+# ================================================================
+# Read the feature dict in YAML file 'filename'.
+# Raises yaml.YAMLError if it cannot be parsed.
+
+def load_feature_file (filename):
+    with open (filename, 'rb') as stream:
+        text = stream.read ()
+
+    if RCa.cache_dir () == None:
+        return yaml.load (text, Loader = Loader)
+
+    key = content_hash (text)
+    cache_filename = RCa.cache_filename ("parsed", key)
+    feature_dict   = RCa.read_cache_entry (cache_filename)
+    if feature_dict == None:
+        feature_dict = yaml.load (text, Loader = Loader)
+        RCa.write_cache_entry (cache_filename, feature_dict)
+    return feature_dict
+
+def content_hash (text):
+    h = RCa.mk_hash ("parsed YAML " + yaml.__version__)
+    h.update (text)
+    return h.hexdigest ()
+
+# ================================================================
+# Layered feature lists.
+
+# A feature list file can extend one or more base files, giving only
+# the features it adds or changes:
+
+#     extends: platform_base.yaml        # or a list: [base1.yaml, base2.yaml]
+#     MISA_S: True
+
+# Paths are relative to the extending file.  Features of the extending
+# file override those of its bases, and later bases override earlier
+# ones; bases may themselves extend other files.
+
+# The result is a ChainMap of the layers (the file's own features
+# first), so lookups go through the layers instead of a merged copy.
+# Each base file is parsed once per process (and re-parsed only if it
+# changes on disk), so a batch of variants of one base shares it.
+# Layers are shared: do not modify them.
+
+extends_fname = "extends"
+
+class Layer_error (yaml.YAMLError):
+    pass
+
+# Read the feature list in file 'filename': a dict if it extends no
+# other file, else a ChainMap of its layers.
+# Raises yaml.YAMLError if it (or a base) cannot be parsed, or the
+# layers are malformed.
+
+def load_feature_list (filename):
+    feature_dict = load_feature_file (filename)
+    if (type (feature_dict) != dict) or (extends_fname not in feature_dict):
+        return feature_dict
+    layers = []
+    add_layers (layers, filename, split_layer (filename, feature_dict), [])
+    return collections.ChainMap (*layers)
+
+# Append the layers of file 'filename' to 'layers', highest first.
+#     'layer':     (its own features, filenames of its bases)
+#     'extending': files extending it (to detect cycles)
+
+def add_layers (layers, filename, layer, extending):
+    (own, base_filenames) = layer
+    layers.append (own)
+    extending = extending + [os.path.abspath (filename)]
+    d = os.path.dirname (filename)
+    for base_filename in reversed (base_filenames):
+        base_filename = os.path.join (d, base_filename)
+        if os.path.abspath (base_filename) in extending:
+            raise Layer_error ("{0}: cyclic '{1}': {2}".format (filename, extends_fname,
+                                                               " -> ".join (extending + [os.path.abspath (base_filename)])))
+        try:
+            layer = base_layer (base_filename)
+        except OSError as exc:
+            raise Layer_error ("{0}: cannot read base file: {1}".format (filename, exc))
+        add_layers (layers, base_filename, layer, extending)
+
+# (features of 'feature_dict' other than 'extends', filenames it extends)
+
+def split_layer (filename, feature_dict):
+    if type (feature_dict) != dict:
+        raise Layer_error ("{0}: not a feature list".format (filename))
+    base_filenames = feature_dict.get (extends_fname)
+    if base_filenames == None:
+        return (feature_dict, [])
+    if type (base_filenames) == str:
+        base_filenames = [base_filenames]
+    if (type (base_filenames) != list) or any ([type (x) != str for x in base_filenames]):
+        raise Layer_error ("{0}: '{1}' must be a filename or a list of filenames".format (filename,
+                                                                                          extends_fname))
+    own = dict (feature_dict)
+    del own [extends_fname]
+    return (own, base_filenames)
+
+# Layer of base file 'filename', memoized while the file is unchanged
+
+base_layer_memo = {}
+
+def base_layer (filename):
+    st    = os.stat (filename)
+    key   = os.path.abspath (filename)
+    stamp = (st.st_mtime_ns, st.st_size)
+    entry = base_layer_memo.get (key)
+    if (entry == None) or (entry [0] != stamp):
+        entry = (stamp, split_layer (filename, load_feature_file (filename)))
+        base_layer_memo [key] = entry
+    return entry [1]
+
+# ================================================================
+# Writing checked feature lists, as typed YAML or JSON.
+
+# Values keep their types (ints, bools, lists, ...), so the output can
+# be read back as a feature list.  Features are written in the order
+# given, one at a time, straight to 'stream': for YAML, as a stream of
+# events to one emitter per section (so large values, e.g., address maps
+# with many regions, are never built into a document in memory); for
+# JSON, with each top-level list written an element at a time.  Address
+# maps are written one region per line; other lists in flow style.
+
+#     writer = Feature_writer (stream, "yaml")
+#     writer.write_section ("Known features", [(name, value), ...])
+#     ...
+#     writer.close ()
+
+# YAML sections are introduced by a comment with their title, and
+# together form one mapping.  JSON has no comments, so JSON output is one
+# object with the features of all sections.
+
+class Feature_writer:
+    #     'fmt': "yaml" or "json"
+    def __init__ (self, stream, fmt = "yaml"):
+        self.stream     = stream
+        self.fmt        = fmt
+        self.n_features = 0
+
+    def write_section (self, title, features):
+        if self.fmt == "json":
+            self.write_json_features (features)
+            return
+        self.stream.write ("\n\n# ---------------- {0} ----------------\n\n".format (title))
+        if len (features) > 0:
+            yaml.emit (section_events (features), self.stream, Dumper = Dumper,
+                       width = yaml_line_width, allow_unicode = True)
+
+    def write_json_features (self, features):
+        write = self.stream.write
+        for (name, val) in features:
+            write ("{\n  " if self.n_features == 0 else ",\n  ")
+            write (json.dumps (name))
+            write (": ")
+            if (type (val) == list) and (len (val) > 0):
+                write ("[\n    ")
+                for (j, x) in enumerate (val):
+                    if j > 0:
+                        write (",\n    ")
+                    write (json.dumps (x, ensure_ascii = False, default = str))
+                write ("\n  ]")
+            else:
+                write (json.dumps (val, ensure_ascii = False, default = str))
+            self.n_features += 1
+
+    def close (self):
+        if self.fmt == "json":
+            self.stream.write ("{}\n" if self.n_features == 0 else "\n}\n")
+
+# Output format for output file 'filename'
+
+def output_format (filename):
+    if filename.lower ().endswith (".json"):
+        return "json"
+    return "yaml"
+
+# Long lines are not folded (folding would only make values harder to grep)
+
+yaml_line_width = 1 << 30
+
+# ----------------------------------------------------------------
+# YAML events for one section: a mapping of the features
+
+def section_events (features):
+    yield yaml.events.StreamStartEvent ()
+    yield yaml.events.DocumentStartEvent (explicit = False)
+    yield yaml.events.MappingStartEvent (None, None, True, flow_style = False)
+    for (name, val) in features:
+        yield scalar_event (name)
+        yield from value_events (val)
+    yield yaml.events.MappingEndEvent ()
+    yield yaml.events.DocumentEndEvent (explicit = False)
+    yield yaml.events.StreamEndEvent ()
+
+# Events for value 'val', walked with an explicit stack (values may be
+# deeply nested expressions)
+
+seq_end = object ()
+map_end = object ()
+
+def value_events (val):
+    # Address maps in block style (one region per line), other lists in flow style
+    is_address_map = (type (val) == list) and (len (val) > 0) and (val [0] == "Address_map")
+    if is_address_map:
+        yield yaml.events.SequenceStartEvent (None, None, True, flow_style = False)
+        stack = list (reversed (val))
+    else:
+        stack = [val]
+    while len (stack) > 0:
+        x = stack.pop ()
+        if x is seq_end:
+            yield yaml.events.SequenceEndEvent ()
+        elif x is map_end:
+            yield yaml.events.MappingEndEvent ()
+        elif (type (x) == list) or (type (x) == tuple):
+            yield yaml.events.SequenceStartEvent (None, None, True, flow_style = True)
+            if is_flat (x):
+                # e.g., address map regions: no need for the stack
+                for y in x:
+                    yield scalar_event (y)
+                yield yaml.events.SequenceEndEvent ()
+            else:
+                stack.append (seq_end)
+                stack.extend (reversed (x))
+        elif type (x) == dict:
+            yield yaml.events.MappingStartEvent (None, None, True, flow_style = True)
+            stack.append (map_end)
+            for (k, v) in reversed (list (x.items ())):
+                stack.append (v)
+                stack.append (k)
+        else:
+            yield scalar_event (x)
+    if is_address_map:
+        yield yaml.events.SequenceEndEvent ()
+
+def is_flat (xs):
+    for x in xs:
+        if type (x) in container_types:
+            return False
+    return True
+
+container_types = set ([list, tuple, dict])
+
+# Event for a scalar.  It is written plain only if it would be read back
+# with the same type (e.g., the string 'True' is quoted, the bool is not).
+
+resolver    = yaml.resolver.Resolver ()
+representer = yaml.representer.SafeRepresenter ()
+
+str_tag = "tag:yaml.org,2002:str"
+
+def scalar_event (x):
+    if type (x) == bool:
+        return yaml.events.ScalarEvent (None, None, (True, False), "true" if x else "false")
+    if type (x) == int:
+        return yaml.events.ScalarEvent (None, None, (True, False), str (x))
+    if x == None:
+        return yaml.events.ScalarEvent (None, None, (True, False), "null")
+    if type (x) == str:
+        (tag, text) = (str_tag, x)
+    else:
+        try:
+            node = representer.represent_data (x)
+        except yaml.representer.RepresenterError:
+            node = None
+        if isinstance (node, yaml.nodes.ScalarNode):
+            (tag, text) = (node.tag, node.value)
+        else:
+            (tag, text) = (str_tag, str (x))
+    plain = (resolver.resolve (yaml.nodes.ScalarNode, text, (True, False)) == tag)
+    return yaml.events.ScalarEvent (None, tag, (plain, tag == str_tag), text)
+
+# ================================================================